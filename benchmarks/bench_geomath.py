@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Distances between stops and points compared with a pure-Python loop.
+
+Computes the distance from a point to every stop of the network and the
+distances between a set of bus positions and every stop, with ``math`` in a
+loop and with the vectorized functions of ``geomath``.
+
+Usage::
+
+    python benchmarks/bench_geomath.py [nodes_lines.json.gz]
+"""
+
+import math
+import sys
+
+import fixtures
+from pyemtmad import geomath
+from pyemtmad import types as emtype
+from pyemtmad import util
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points with ``math``."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2)
+         * math.sin((lon2 - lon1) / 2) ** 2)
+
+    return 2 * geomath.EARTH_RADIUS * math.asin(math.sqrt(a))
+
+def main(path=None, positions=200):
+    if path:
+        values = util.response_list(
+            fixtures.load_response(path), 'resultValues')
+
+    else:
+        values = fixtures.nodes_values()
+
+    stops = [emtype.NodeLinesItem.from_json(v) for v in values]
+    buses = stops[::max(1, len(stops) // int(positions))]
+    latitude, longitude = 40.4168, -3.7038
+
+    print('%d stops, %d bus positions' % (len(stops), len(buses)))
+
+    fixtures.report(
+        'one-to-many loop',
+        fixtures.best_time(lambda: [
+            haversine(latitude, longitude, s.latitude, s.longitude)
+            for s in stops
+        ], 5))
+    fixtures.report(
+        'one-to-many distance_to()',
+        fixtures.best_time(
+            lambda: geomath.distance_to(stops, latitude, longitude), 5))
+
+    lats, lons = geomath.coordinates(stops)
+    fixtures.report(
+        '  (arrays only)',
+        fixtures.best_time(
+            lambda: geomath.haversine(latitude, longitude, lats, lons), 5))
+
+    fixtures.report(
+        'pairwise loop',
+        fixtures.best_time(lambda: [
+            [haversine(b.latitude, b.longitude, s.latitude, s.longitude)
+             for s in stops]
+            for b in buses
+        ], 1))
+    fixtures.report(
+        'pairwise()',
+        fixtures.best_time(lambda: geomath.pairwise(buses, stops), 3))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
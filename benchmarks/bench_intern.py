@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Memory used by a full-network ``get_route_lines`` response.
+
+Measures with ``tracemalloc`` the memory retained by the decoded response
+as returned by ``json.loads``, after ``util.intern_values()``, and by the
+parsed objects and the columnar table built from it.
+
+Usage::
+
+    python benchmarks/bench_intern.py [route_lines.json.gz]
+"""
+
+import gc
+import gzip
+import json
+import sys
+import tracemalloc
+
+import fixtures
+from pyemtmad import types as emtype
+from pyemtmad import util
+from pyemtmad.table import RouteTable
+
+
+def measure(name, build):
+    """Print the memory retained by the result of a function."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print('%-40s %10.1f MB' % (name, size / 1e6))
+    return result
+
+def main(path=None):
+    if path:
+        opener = gzip.open if path.endswith('.gz') else open
+
+        with opener(path, 'rb') as f:
+            text = f.read().decode('utf-8')
+
+    else:
+        text = fixtures.response_text(fixtures.route_values())
+
+    def values():
+        return util.response_list(json.loads(text), 'resultValues')
+
+    print('%d items, %.1f MB of JSON' % (len(values()), len(text) / 1e6))
+
+    measure('json.loads', values)
+    measure('json.loads + intern_values',
+            lambda: util.intern_values(values()))
+    measure('RouteLinesItem objects', lambda: [
+        emtype.RouteLinesItem.from_json(v)
+        for v in util.intern_values(values())
+    ])
+    measure('RouteTable (columns + response)',
+            lambda: RouteTable.from_values(util.intern_values(values())))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
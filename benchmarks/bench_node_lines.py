@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Decoding of the line strings of a ``get_nodes_lines`` response.
+
+Compares parsing every ``NodeLinesItem`` with ``table.decode_node_lines()``.
+
+Usage::
+
+    python benchmarks/bench_node_lines.py [nodes_lines.json.gz]
+"""
+
+import sys
+
+import fixtures
+from pyemtmad import types as emtype
+from pyemtmad import util
+from pyemtmad.table import decode_node_lines
+
+
+def main(path=None):
+    if path:
+        values = util.response_list(
+            fixtures.load_response(path), 'resultValues')
+
+    else:
+        values = fixtures.nodes_values()
+
+    count = sum(len(v.get('lines') or []) for v in values)
+    print('%d nodes, %d line strings' % (len(values), count))
+
+    fixtures.report(
+        'NodeLinesItem per object',
+        fixtures.best_time(
+            lambda: [emtype.NodeLinesItem.from_json(v) for v in values], 5))
+    fixtures.report(
+        'decode_node_lines()',
+        fixtures.best_time(lambda: decode_node_lines(values), 5))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
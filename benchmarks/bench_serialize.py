@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Serialization of parsed items compared with pickle.
+
+Usage::
+
+    python benchmarks/bench_serialize.py [route_lines.json.gz]
+"""
+
+import pickle
+import sys
+
+import fixtures
+from pyemtmad import serialize
+from pyemtmad import types as emtype
+from pyemtmad import util
+
+
+def pickle_dumps(items):
+    return pickle.dumps(items, pickle.HIGHEST_PROTOCOL)
+
+def main(path=None):
+    if path:
+        values = util.response_list(
+            fixtures.load_response(path), 'resultValues')
+
+    else:
+        values = fixtures.route_values()
+
+    items = [emtype.RouteLinesItem.from_json(v) for v in values]
+    print('%d RouteLinesItem objects' % len(items))
+
+    for name, dumps, loads in (
+            ('pickle', pickle_dumps, pickle.loads),
+            ('serialize', serialize.dumps, serialize.loads)):
+        data = dumps(items)
+
+        print('%s: %.2f MB' % (name, len(data) / 1e6))
+        fixtures.report(
+            '  dumps', fixtures.best_time(lambda: dumps(items), 10))
+        fixtures.report(
+            '  loads', fixtures.best_time(lambda: loads(data), 10))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains the inputs of the benchmarks.
+
+Benchmarks run on a response recorded with ``record.py`` when its path is
+given. Otherwise they use synthetic responses with the shape and size of
+the whole Madrid network, generated with a fixed seed so that runs can be
+compared.
+"""
+
+import gzip
+import json
+import random
+import timeit
+
+# Bounding box of the synthetic network
+_LATITUDE = (40.31, 40.56)
+_LONGITUDE = (-3.83, -3.53)
+
+
+def load_response(path):
+    """Load a response saved by ``record.py``.
+
+    Args:
+        path (str): Path of a ``.json`` or ``.json.gz`` file.
+
+    Returns:
+        dict: Decoded response.
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+
+    with opener(path, 'rb') as f:
+        return json.loads(f.read().decode('utf-8'))
+
+def response_text(values):
+    """Encode response items as the JSON text of an openbus response."""
+    return json.dumps({
+        'resultCode': 0,
+        'resultDescription': 'OK',
+        'resultValues': values
+    })
+
+def nodes_values(count=8000, lines_per_node=30, seed=1):
+    """Generate the ``resultValues`` of a ``get_nodes_lines`` response.
+
+    Args:
+        count (int): Number of nodes.
+        lines_per_node (int): Average number of line strings of each node.
+        seed (int): Seed of the generator.
+
+    Returns:
+        list[dict]: Response items.
+    """
+    rng = random.Random(seed)
+    values = []
+
+    for node in range(1, count + 1):
+        lines = [
+            '%d\\/%d' % (rng.randint(1, 600), rng.randint(1, 2))
+            for _ in range(rng.randint(1, 2 * lines_per_node - 1))
+        ]
+
+        values.append({
+            'node': node,
+            'name': 'Stop %d' % node,
+            'latitude': rng.uniform(*_LATITUDE),
+            'longitude': rng.uniform(*_LONGITUDE),
+            'lines': lines
+        })
+
+    return values
+
+def route_values(lines=220, stops=4600, stops_per_route=140, seed=1):
+    """Generate the ``resultValues`` of a ``get_route_lines`` response.
+
+    Each line has a forward and a backward route over stops drawn from a
+    shared pool, so stop names repeat across lines as in the real network.
+
+    Args:
+        lines (int): Number of lines.
+        stops (int): Number of distinct stops.
+        stops_per_route (int): Stops of each route.
+        seed (int): Seed of the generator.
+
+    Returns:
+        list[dict]: Response items.
+    """
+    rng = random.Random(seed)
+    pool = [
+        (stop, 'Stop name %d' % stop, rng.uniform(*_LATITUDE),
+         rng.uniform(*_LONGITUDE))
+        for stop in range(1, stops + 1)
+    ]
+    values = []
+
+    for line in range(1, lines + 1):
+        route = rng.sample(pool, stops_per_route)
+
+        for sec_detail, nodes in ((10, route), (20, route[::-1])):
+            distance = 0
+
+            for order, (node, name, latitude, longitude) in \
+                    enumerate(nodes):
+                step = rng.randint(150, 600) if order else 0
+                distance += step
+
+                values.append({
+                    'line': '%03d' % line,
+                    'secDetail': sec_detail,
+                    'orderDetail': order + 1,
+                    'node': node,
+                    'distance': distance,
+                    'distancePreviousStop': step,
+                    'name': name,
+                    'latitude': latitude,
+                    'longitude': longitude
+                })
+
+    return values
+
+def best_time(function, repeat=20):
+    """Obtain the best time (in milliseconds) of several calls."""
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1e3
+
+def report(name, milliseconds):
+    """Print a timing line."""
+    print('%-40s %10.2f ms' % (name, milliseconds))
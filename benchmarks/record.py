@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Record full-network responses to use as benchmark inputs.
+
+The raw responses of ``get_nodes_lines`` and ``get_route_lines`` for all
+the lines are saved as gzipped JSON in the given directory. Credentials are
+read from the ``EMT_ID`` and ``EMT_PASS`` environment variables.
+
+Usage::
+
+    python benchmarks/record.py DIRECTORY [DD/MM/YYYY]
+"""
+
+import datetime
+import gzip
+import json
+import os
+import sys
+
+from pyemtmad import Wrapper
+from pyemtmad import util
+
+
+def save(path, response):
+    with gzip.open(path, 'wb') as f:
+        f.write(json.dumps(response).encode('utf-8'))
+
+    print('%s: %d items' % (
+        path, len(util.response_list(response, 'resultValues'))))
+
+def main(directory, date=None):
+    if date:
+        day, month, year = [int(v) for v in date.split('/')]
+
+    else:
+        today = datetime.date.today()
+        day, month, year = today.day, today.month, today.year
+
+    wrapper = Wrapper(os.environ['EMT_ID'], os.environ['EMT_PASS'])
+
+    save(os.path.join(directory, 'nodes_lines.json.gz'),
+         wrapper.request_openbus('bus', 'get_nodes_lines', Nodes=''))
+
+    save(os.path.join(directory, 'route_lines.json.gz'),
+         wrapper.request_openbus(
+             'bus', 'get_route_lines', Lines='',
+             SelectDate=util.date_string(day, month, year)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -23,6 +23,7 @@ See http://opendata.emtmadrid.es/Servicios-web/BUS
 
 from pyemtmad import types as emtype
 from pyemtmad import util
+from pyemtmad.table import RouteTable, StopTable
 
 class BusApi(object):
     """Metaclass that contains the API methods for the bus endpoints."""
@@ -35,6 +36,7 @@ class BusApi(object):
         """
         self._wrapper = wrapper
         self.make_request = self._wrapper.request_openbus
+        self.parse_values = self._wrapper.parse_values
 
     def get_calendar(self, **kwargs):
         """Obtain EMT calendar for a range of dates.
@@ -78,7 +80,7 @@ class BusApi(object):
 
         # Parse
         values = util.response_list(result, 'resultValues')
-        return True, [emtype.CalendarItem(**a) for a in values]
+        return True, self.parse_values(emtype.CalendarItem, values)
 
     def get_groups(self, **kwargs):
         """Obtain line types and details.
@@ -101,7 +103,7 @@ class BusApi(object):
 
         # Parse
         values = util.response_list(result, 'resultValues')
-        return True, [emtype.BusGroupItem(**a) for a in values]
+        return True, self.parse_values(emtype.BusGroupItem, values)
 
     def get_list_lines(self, **kwargs):
         """Obtain lines with description and group.
@@ -139,7 +141,7 @@ class BusApi(object):
 
         # Parse
         values = util.response_list(result, 'resultValues')
-        return True, [emtype.ListLineInfo(**a) for a in values]
+        return True, self.parse_values(emtype.ListLineInfo, values)
 
     def get_nodes_lines(self, **kwargs):
         """Obtain stop IDs, coordinates and line information.
@@ -147,10 +149,12 @@ class BusApi(object):
         Args:
             nodes (list[int] | int): nodes to query, may be empty to get
                 all nodes.
+            columnar (bool): Optional, obtain a ``StopTable`` instead of a
+                list of objects.
 
         Returns:
-            Status boolean and parsed response (list[NodeLinesItem]), or message
-            string in case of error.
+            Status boolean and parsed response (list[NodeLinesItem] or
+            StopTable), or message string in case of error.
         """
         # Endpoint parameters
         params = {'Nodes': util.ints_to_string(kwargs.get('nodes', []))}
@@ -162,8 +166,12 @@ class BusApi(object):
             return False, result.get('resultDescription', 'UNKNOWN ERROR')
 
         # Parse
-        values = util.response_list(result, 'resultValues')
-        return True, [emtype.NodeLinesItem(**a) for a in values]
+        values = util.intern_values(
+            util.response_list(result, 'resultValues'))
+        if kwargs.get('columnar'):
+            return True, StopTable.from_nodes(values)
+
+        return True, self.parse_values(emtype.NodeLinesItem, values)
 
     def get_route_lines(self, **kwargs):
         """Obtain itinerary for one or more lines in the given date.
@@ -176,10 +184,12 @@ class BusApi(object):
             year (int): Year number in format YYYY.
             lines (list[int] | int): Lines to query, may be empty to get
                 all the lines.
+            columnar (bool): Optional, obtain a ``RouteTable`` instead of a
+                list of objects.
 
         Returns:
-            Status boolean and parsed response (list[RouteLinesItem]), or message
-            string in case of error.
+            Status boolean and parsed response (list[RouteLinesItem] or
+            RouteTable), or message string in case of error.
         """
         # Endpoint parameters
         select_date = util.date_string(
@@ -199,8 +209,12 @@ class BusApi(object):
             return False, result.get('resultDescription', 'UNKNOWN ERROR')
 
         # Parse
-        values = util.response_list(result, 'resultValues')
-        return True, [emtype.RouteLinesItem(**a) for a in values]
+        values = util.intern_values(
+            util.response_list(result, 'resultValues'))
+        if kwargs.get('columnar'):
+            return True, RouteTable.from_values(values)
+
+        return True, self.parse_values(emtype.RouteLinesItem, values)
 
 
 
@@ -215,10 +229,12 @@ class BusApi(object):
             year (int): Year number in format YYYY.
             lines (list[int] | int): Lines to query, may be empty to get
                 all the lines.
+            columnar (bool): Optional, obtain a ``RouteTable`` instead of a
+                list of objects.
 
         Returns:
-            Status boolean and parsed response (list[RouteLinesItem]), or message
-            string in case of error.
+            Status boolean and parsed response (list[RouteLinesItem] or
+            RouteTable), or message string in case of error.
         """
         # Endpoint parameters
         select_date = util.date_string(
@@ -238,8 +254,12 @@ class BusApi(object):
             return False, result.get('resultDescription', 'UNKNOWN ERROR')
 
         # Parse
-        values = util.response_list(result, 'resultValues')
-        return True, [emtype.RouteLinesItem(**a) for a in values]
+        values = util.intern_values(
+            util.response_list(result, 'resultValues'))
+        if kwargs.get('columnar'):
+            return True, RouteTable.from_values(values)
+
+        return True, self.parse_values(emtype.RouteLinesItem, values)
 
     def get_times_lines(self, **kwargs):
         """Obtain current line times for the given lines.
@@ -276,7 +296,7 @@ class BusApi(object):
 
         # Parse
         values = util.response_list(result, 'resultValues')
-        return True, [emtype.TimesLinesItem(**a) for a in values]
+        return True, self.parse_values(emtype.TimesLinesItem, values)
 
     def get_timetable_lines(self, **kwargs):
         """Obtain information on lines for a travel.
@@ -312,4 +332,4 @@ class BusApi(object):
 
         # Parse
         values = util.response_list(result, 'resultValues')
-        return True, [emtype.TimetableLinesItem(**a) for a in values]
+        return True, self.parse_values(emtype.TimetableLinesItem, values)
@@ -23,6 +23,16 @@ See http://opendata.emtmadrid.es/Servicios-web/GEO
 
 from pyemtmad import types as emtype
 from pyemtmad import util
+from pyemtmad.geocache import query_near
+from pyemtmad.table import RouteTable, StopTable
+
+def _position(value):
+    """Obtain the coordinates of a response item."""
+    return value['latitude'], value['longitude']
+
+def _attributes_position(value):
+    """Obtain the coordinates of a response item with nested attributes."""
+    return value['attributes']['latitude'], value['attributes']['longitude']
 
 class GeoApi(object):
     """Metaclass that contains the API methods for the geo endpoints."""
@@ -35,6 +45,11 @@ class GeoApi(object):
         """
         self._wrapper = wrapper
         self.make_request = self._wrapper.request_openbus
+        self.parse_values = self._wrapper.parse_values
+
+        # Optional indexes used instead of the search endpoints
+        self.stop_index = None
+        self.poi_index = None
 
     def get_arrive_stop(self, **kwargs):
         """Obtain bus arrival info in target stop.
@@ -62,7 +77,7 @@ class GeoApi(object):
 
         # Parse
         values = util.response_list(result, 'arrives')
-        return True, [emtype.Arrival(**a) for a in values]
+        return True, self.parse_values(emtype.Arrival, values)
 
     def get_groups(self, **kwargs):
         """Obtain line types and details.
@@ -87,7 +102,7 @@ class GeoApi(object):
 
         # Parse
         values = util.response_list(result, 'resultValues')
-        return True, [emtype.GeoGroupItem(**a) for a in values]
+        return True, self.parse_values(emtype.GeoGroupItem, values)
 
     def get_info_line(self, **kwargs):
         """Obtain basic information on a bus line on a given date.
@@ -128,7 +143,7 @@ class GeoApi(object):
 
         # Parse
         values = util.response_list(result, 'Line')
-        return True, [emtype.Line(**a) for a in values]
+        return True, self.parse_values(emtype.Line, values)
 
     def get_info_line_extended(self, **kwargs):
         """Obtain extended information on a bus line on a given date.
@@ -169,11 +184,15 @@ class GeoApi(object):
 
         # Parse
         values = util.response_list(result, 'Line')
-        return True, [emtype.Line(**a) for a in values]
+        return True, self.parse_values(emtype.Line, values)
 
     def get_poi(self, **kwargs):
         """Obtain a list of POI in the given radius.
 
+        If ``poi_index`` is set and covers the search (see
+        ``PoiIndex.covers()``), the search is performed locally without any
+        request and the POIs are sorted by distance.
+
         Args:
             latitude (double): Latitude in decimal degrees.
             longitude (double): Longitude in decimal degrees.
@@ -185,25 +204,49 @@ class GeoApi(object):
             Status boolean and parsed response (list[Poi]), or message string
             in case of error.
         """
-        # Endpoint parameters
-        params = {
-            'coordinateX': kwargs.get('longitude'),
-            'coordinateY': kwargs.get('latitude'),
-            'tipos': util.ints_to_string(kwargs.get('types')),
-            'Radius': kwargs.get('radius'),
-            'cultureInfo': util.language_code(kwargs.get('lang'))
-        }
+        # Local search
+        if self.poi_index is not None and kwargs.get('radius') is not None:
+            latitude = float(kwargs.get('latitude'))
+            longitude = float(kwargs.get('longitude'))
+            radius = float(kwargs['radius'])
 
-        # Request
-        result = self.make_request('geo', 'get_poi', **params)
+            if self.poi_index.covers(latitude, longitude, radius,
+                                     kwargs.get('types'), kwargs.get('lang')):
+                pois = self.poi_index.within(
+                    latitude, longitude, radius, kwargs.get('types'))
 
-        # Funny endpoint, no status code
-        if not util.check_result(result, 'poiList'):
+                return True, self._local_result(emtype.Poi, pois)
+
+        types = util.ints_to_string(kwargs.get('types'))
+        lang = util.language_code(kwargs.get('lang'))
+
+        def fetch(latitude, longitude, radius):
+            # Endpoint parameters
+            params = {
+                'coordinateX': longitude,
+                'coordinateY': latitude,
+                'tipos': types,
+                'Radius': radius,
+                'cultureInfo': lang
+            }
+
+            # Request
+            result = self.make_request('geo', 'get_poi', **params)
+
+            # Funny endpoint, no status code
+            if not util.check_result(result, 'poiList'):
+                return None
+
+            return util.response_list(result, 'poiList')
+
+        values = self._query_near(
+            ('get_poi', types, lang), kwargs, fetch, _attributes_position)
+
+        if values is None:
             return False, 'UNKNOWN ERROR'
 
         # Parse
-        values = util.response_list(result, 'poiList')
-        return True, [emtype.Poi(**a) for a in values]
+        return True, self.parse_values(emtype.Poi, values)
 
     def get_poi_types(self, **kwargs):
         """Obtain POI types.
@@ -225,7 +268,7 @@ class GeoApi(object):
 
         # Parse
         values = result.get('types', [])
-        return True, [emtype.PoiType(**a) for a in values]
+        return True, self.parse_values(emtype.PoiType, values)
 
     def get_route_lines_route(self, **kwargs):
         """Obtain itinerary for one or more lines in the given date.
@@ -238,10 +281,12 @@ class GeoApi(object):
             year (int): Year number in format YYYY.
             lines (list[int] | int): Lines to query, may be empty to get
                 all the lines.
+            columnar (bool): Optional, obtain a ``RouteTable`` instead of a
+                list of objects.
 
         Returns:
-            Status boolean and parsed response (list[RouteLinesItem]), or message
-            string in case of error.
+            Status boolean and parsed response (list[RouteLinesItem] or
+            RouteTable), or message string in case of error.
         """
         # Endpoint parameters
         select_date = '%02d/%02d/%d' % (
@@ -262,21 +307,44 @@ class GeoApi(object):
             return False, result.get('resultDescription', 'UNKNOWN ERROR')
 
         # Parse
-        values = util.response_list(result, 'resultValues')
-        return True, [emtype.RouteLinesItem(**a) for a in values]
+        values = util.intern_values(
+            util.response_list(result, 'resultValues'))
+        if kwargs.get('columnar'):
+            return True, RouteTable.from_values(values)
+
+        return True, self.parse_values(emtype.RouteLinesItem, values)
 
     def get_stops_from_stop(self, **kwargs):
         """Obtain a list of stops within the given radius of the specified stop.
 
+        If ``stop_index`` is set and contains the stop, and no language is
+        given, the search is performed locally without any request. Stops
+        obtained from the index have no address (see
+        ``StopIndex.from_nodes()``).
+
         Args:
             stop_number (int): Number of the stop to query.
             radius (int): Radius (in meters) of the search.
             lang (str): Language code (*es* or *en*).
+            columnar (bool): Optional, obtain a ``StopTable`` instead of a
+                list of objects.
 
         Returns:
-            Status boolean and parsed response (list[Stop]), or message string
-            in case of error.
+            Status boolean and parsed response (list[Stop] or StopTable),
+            or message string in case of error.
         """
+        # Local search if the stop is indexed
+        if self._local_search(kwargs):
+            stop = self.stop_index.get(kwargs.get('stop_number'))
+
+            if stop is not None:
+                stops = self.stop_index.within(
+                    float(stop.latitude), float(stop.longitude),
+                    float(kwargs['radius']))
+
+                return True, self._local_result(
+                    emtype.Stop, stops, kwargs.get('columnar'))
+
         # Endpoint parameters
         params = {
             'idStop': kwargs.get('stop_number'),
@@ -293,40 +361,72 @@ class GeoApi(object):
 
         # Parse
         values = util.response_list(result, 'stops')
-        return True, [emtype.Stop(**a) for a in values]
+        if kwargs.get('columnar'):
+            return True, StopTable.from_values(values)
+
+        return True, self.parse_values(emtype.Stop, values)
 
     def get_stops_from_xy(self, **kwargs):
         """Obtain a list of stops around the given point.
 
+        If ``stop_index`` is set and no language is given, the search is
+        performed locally without any request. Stops obtained from the index
+        have no address (see ``StopIndex.from_nodes()``).
+
         Arguments:
             latitude (double): Latitude in decimal degrees.
             longitude (double): Longitude in decimal degrees.
             radius (int): Radius (in meters) of the search.
             lang (str): Language code (*es* or *en*).
+            columnar (bool): Optional, obtain a ``StopTable`` instead of a
+                list of objects.
 
         Returns:
-            Status boolean and parsed response (list[Stop]), or message string
-            in case of error.
+            Status boolean and parsed response (list[Stop] or StopTable),
+            or message string in case of error.
         """
-        # Endpoint parameters
-        params = {
-            'latitude': kwargs.get('latitude'),
-            'longitude': kwargs.get('longitude'),
-            'Radius': kwargs.get('radius'),
-            'cultureInfo': util.language_code(kwargs.get('lang'))
-        }
+        # Local search
+        if self._local_search(kwargs):
+            stops = self.stop_index.within(
+                float(kwargs.get('latitude')), float(kwargs.get('longitude')),
+                float(kwargs['radius']))
 
-        # Request
-        result = self.make_request('geo', 'get_stops_from_xy', **params)
+            return True, self._local_result(
+                emtype.Stop, stops, kwargs.get('columnar'))
 
-        # Funny endpoint, no status code
-        # No stop attribute could mean there are no stops in the zone specified
-        if not util.check_result(result, 'stop'):
+        lang = util.language_code(kwargs.get('lang'))
+
+        def fetch(latitude, longitude, radius):
+            # Endpoint parameters
+            params = {
+                'latitude': latitude,
+                'longitude': longitude,
+                'Radius': radius,
+                'cultureInfo': lang
+            }
+
+            # Request
+            result = self.make_request('geo', 'get_stops_from_xy', **params)
+
+            # Funny endpoint, no status code
+            # No stop attribute could mean there are no stops in the zone
+            # specified
+            if not util.check_result(result, 'stop'):
+                return None
+
+            return util.response_list(result, 'stop')
+
+        values = self._query_near(
+            ('get_stops_from_xy', lang), kwargs, fetch, _position)
+
+        if values is None:
             return False, 'UNKNOWN ERROR'
 
         # Parse
-        values = util.response_list(result, 'stop')
-        return True, [emtype.Stop(**a) for a in values]
+        if kwargs.get('columnar'):
+            return True, StopTable.from_values(values)
+
+        return True, self.parse_values(emtype.Stop, values)
 
     def get_stops_line(self, **kwargs):
         """Obtain information on the stops of the given lines.
@@ -336,10 +436,12 @@ class GeoApi(object):
                 all the lines.
             direction (str): Optional, either *forward* or *backward*.
             lang (str): Language code (*es* or *en*).
+            columnar (bool): Optional, obtain a ``StopTable`` instead of a
+                list of objects.
 
         Returns:
-            Status boolean and parsed response (list[Stop]), or message string
-            in case of error.
+            Status boolean and parsed response (list[Stop] or StopTable),
+            or message string in case of error.
         """
         # Endpoint parameters
         params = {
@@ -357,8 +459,12 @@ class GeoApi(object):
             return False, 'UNKNOWN ERROR'
 
         # Parse
-        values = util.response_list(result, 'stop')
-        return True, [emtype.Stop(**a) for a in values]
+        values = util.intern_values(
+            util.response_list(result, 'stop'))
+        if kwargs.get('columnar'):
+            return True, StopTable.from_values(values)
+
+        return True, self.parse_values(emtype.Stop, values)
 
     def get_street(self, **kwargs):
         """Obtain a list of nodes related to a location within a given radius.
@@ -394,7 +500,7 @@ class GeoApi(object):
 
         # Parse
         values = util.response_list(result, 'site')
-        return True, [emtype.Site(**a) for a in values]
+        return True, self.parse_values(emtype.Site, values)
 
     def get_street_from_xy(self, **kwargs):
         """Obtain a list of streets around the specified point.
@@ -409,21 +515,56 @@ class GeoApi(object):
             Status boolean and parsed response (list[Street]), or message string
             in case of error.
         """
-        # Endpoint parameters
-        params = {
-            'coordinateX': kwargs.get('longitude'),
-            'coordinateY': kwargs.get('latitude'),
-            'Radius': kwargs.get('radius'),
-            'cultureInfo': util.language_code(kwargs.get('lang'))
-        }
+        lang = util.language_code(kwargs.get('lang'))
 
-        # Request
-        result = self.make_request('geo', 'get_street_from_xy', **params)
+        def fetch(latitude, longitude, radius):
+            # Endpoint parameters
+            params = {
+                'coordinateX': longitude,
+                'coordinateY': latitude,
+                'Radius': radius,
+                'cultureInfo': lang
+            }
 
-        # Funny endpoint, no status code
-        if not util.check_result(result, 'site'):
+            # Request
+            result = self.make_request('geo', 'get_street_from_xy', **params)
+
+            # Funny endpoint, no status code
+            if not util.check_result(result, 'site'):
+                return None
+
+            return util.response_list(result, 'site')
+
+        values = self._query_near(
+            ('get_street_from_xy', lang), kwargs, fetch, _attributes_position)
+
+        if values is None:
             return False, 'UNKNOWN ERROR'
 
         # Parse
-        values = util.response_list(result, 'site')
-        return True, [emtype.Street(**a) for a in values]
+        return True, self.parse_values(emtype.Street, values)
+
+    def _query_near(self, key, kwargs, fetch, position):
+        """Perform a search around a point through the wrapper cache."""
+        return query_near(
+            self._wrapper.geo_cache, key, kwargs.get('latitude'),
+            kwargs.get('longitude'), kwargs.get('radius'), fetch, position)
+
+    def _local_search(self, kwargs):
+        """Check whether a stop search can use ``stop_index``.
+
+        The index has no localized information, so a request is performed
+        when a language is given.
+        """
+        return self.stop_index is not None \
+            and kwargs.get('radius') is not None and not kwargs.get('lang')
+
+    def _local_result(self, item_type, items, columnar=False):
+        """Convert the items found in an index to the requested result."""
+        if columnar:
+            return StopTable.from_values([i._json for i in items])
+
+        if self._wrapper.result_mode == 'objects':
+            return items
+
+        return self.parse_values(item_type, [i._json for i in items])
@@ -21,8 +21,11 @@
 See https://servicios.emtmadrid.es:8443/InfoParking/InfoParking.svc/json/help
 """
 
+import json
+
 from pyemtmad import types as emtype
 from pyemtmad import util
+from pyemtmad.geocache import query_near
 
 class ParkingApi(object):
     """Metaclass that contains the API methods for the parking endpoints."""
@@ -35,6 +38,7 @@ class ParkingApi(object):
         """
         self._wrapper = wrapper
         self.make_request = self._wrapper.request_parking
+        self.parse_values = self._wrapper.parse_values
 
     def detail_parking(self, **kwargs):
         """Obtain detailed info of a given parking.
@@ -82,7 +86,7 @@ class ParkingApi(object):
 
         # Parse
         values = util.response_list(result, 'Data')
-        return True, [emtype.ParkingDetails(**a) for a in values]
+        return True, self.parse_values(emtype.ParkingDetails, values)
 
     def detail_poi(self, **kwargs):
         """Obtain detailed info of a given POI.
@@ -114,7 +118,7 @@ class ParkingApi(object):
 
         # Parse
         values = util.response_list(result, 'Data')
-        return True, [emtype.PoiDetails(**a) for a in values]
+        return True, self.parse_values(emtype.PoiDetails, values)
 
     def icon_description(self, **kwargs):
         """Obtain a list of elements that have an associated icon.
@@ -137,7 +141,7 @@ class ParkingApi(object):
 
         # Parse
         values = util.response_list(result, 'Data')
-        return True, [emtype.IconDescription(**a) for a in values]
+        return True, self.parse_values(emtype.IconDescription, values)
 
     def info_parking_poi(self, **kwargs):
         """Obtain generic information on POIs and parkings.
@@ -198,14 +202,10 @@ class ParkingApi(object):
                 'nameField': element[1]
             })
 
-        params = {
+        base_params = {
             'TFamilyTTypeTCategory': {
                 'lstFamilyTypeCategory': family_categories
             },
-            'coordinate': {
-                'latitude': str(kwargs.get('latitude', '0.0')),
-                'longitude': str(kwargs.get('longitude', '0.0'))
-            },
             'dateTimeUse': date,
             'language': util.language_code(kwargs.get('lang')),
             'minimumPlacesAvailable': {
@@ -213,19 +213,40 @@ class ParkingApi(object):
             },
             'nameFieldCodes': {
                 'lstNameFieldCodes': field_codes
-            },
-            'radius': str(kwargs.get('radius', '0'))
+            }
         }
 
-        # Request
-        result = self.make_request('info_parking_poi', {}, **params)
+        errors = []
 
-        if not util.check_result(result):
-            return False, result.get('message', 'UNKNOWN ERROR')
+        def fetch(latitude, longitude, radius):
+            params = dict(base_params)
+            params['coordinate'] = {
+                'latitude': str(latitude),
+                'longitude': str(longitude)
+            }
+            params['radius'] = str(radius)
+
+            # Request
+            result = self.make_request('info_parking_poi', {}, **params)
+
+            if not util.check_result(result):
+                errors.append(result.get('message', 'UNKNOWN ERROR'))
+                return None
+
+            return util.response_list(result, 'Data')
+
+        values = query_near(
+            self._wrapper.geo_cache,
+            ('info_parking_poi', json.dumps(base_params, sort_keys=True)),
+            kwargs.get('latitude', '0.0'), kwargs.get('longitude', '0.0'),
+            kwargs.get('radius', '0'), fetch,
+            lambda v: (v['latitude'], v['longitude']))
+
+        if values is None:
+            return False, errors[-1] if errors else 'UNKNOWN ERROR'
 
         # Parse
-        values = util.response_list(result, 'Data')
-        return True, [emtype.InfoParkingPoi(**a) for a in values]
+        return True, self.parse_values(emtype.InfoParkingPoi, values)
 
     def list_features(self, **kwargs):
         """Obtain a list of parkings.
@@ -251,7 +272,7 @@ class ParkingApi(object):
 
         # Parse
         values = util.response_list(result, 'Data')
-        return True, [emtype.ParkingFeature(**a) for a in values]
+        return True, self.parse_values(emtype.ParkingFeature, values)
 
     def list_parking(self, **kwargs):
         """Obtain a list of parkings.
@@ -274,7 +295,7 @@ class ParkingApi(object):
 
         # Parse
         values = util.response_list(result, 'Data')
-        return True, [emtype.Parking(**a) for a in values]
+        return True, self.parse_values(emtype.Parking, values)
 
     def list_street_poi_parking(self, **kwargs):
         """Obtain a list of addresses and POIs.
@@ -303,7 +324,7 @@ class ParkingApi(object):
 
         # Parse
         values = util.response_list(result, 'Data')
-        return True, [emtype.ParkingPoi(**a) for a in values]
+        return True, self.parse_values(emtype.ParkingPoi, values)
 
     def list_types_poi(self, **kwargs):
         """Obtain a list of families, types and categories of POI.
@@ -326,4 +347,4 @@ class ParkingApi(object):
 
         # Parse
         values = util.response_list(result, 'Data')
-        return True, [emtype.ParkingPoiType(**a) for a in values]
+        return True, self.parse_values(emtype.ParkingPoiType, values)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains change detection for the arrivals of a stop.
+
+Successive ``get_arrive_stop`` results of a stop are compared bus by bus and
+only the differences are reported: new buses, buses that are no longer listed
+and buses whose time left or position changed noticeably. Clients that keep
+the previous state can apply the deltas instead of receiving every arrival.
+"""
+
+from pyemtmad.geomath import point_distance
+from pyemtmad.watcher import TIME_LEFT_SENTINEL
+
+# Attribute and response key of each compared value
+_FIELDS = (
+    ('line_id', 'lineId'),
+    ('bus_id', 'busId'),
+    ('time_left', 'busTimeLeft'),
+    ('distance', 'busDistance'),
+    ('latitude', 'latitude'),
+    ('longitude', 'longitude')
+)
+
+
+def _values(arrival):
+    """Obtain the compared values of an arrival as a dict."""
+    if isinstance(arrival, dict):
+        return dict((name, arrival.get(key)) for name, key in _FIELDS)
+
+    return dict((name, getattr(arrival, name, None)) for name, _ in _FIELDS)
+
+def _number(value):
+    """Convert a response value to float, or None."""
+    try:
+        return float(value)
+
+    except (TypeError, ValueError):
+        return None
+
+def _moved(old, new):
+    """Distance (in meters) between two positions, or None if unknown."""
+    lat1, lon1 = _number(old['latitude']), _number(old['longitude'])
+    lat2, lon2 = _number(new['latitude']), _number(new['longitude'])
+
+    if None in (lat1, lon1, lat2, lon2):
+        return None
+
+    return point_distance(lat1, lon1, lat2, lon2)
+
+
+class ArrivalDelta(object):
+    """Differences between two results of a stop.
+
+    Attributes:
+        stop_id (int): ID of the stop.
+        added (list): Arrivals (as given to the differ) of new buses.
+        removed (list[tuple]): ``(line_id, bus_id)`` of the buses that are no
+            longer listed.
+        changed (list[dict]): Key of each bus that changed (``line_id`` and
+            ``bus_id``) and its new values of ``time_left`` and/or
+            ``latitude``, ``longitude`` and ``distance``.
+    """
+
+    def __init__(self, stop_id, added, removed, changed):
+        self.stop_id = stop_id
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return '<ArrivalDelta %s +%d -%d ~%d>' % (
+            self.stop_id, len(self.added), len(self.removed),
+            len(self.changed))
+
+    def to_json(self):
+        """Obtain a compact representation of the delta.
+
+        Empty lists are omitted.
+
+        Returns:
+            dict: Stop ID and the ``added`` (original response items),
+            ``removed`` and ``changed`` entries.
+        """
+        result = {'stop': self.stop_id}
+
+        if self.added:
+            result['added'] = [getattr(a, '_json', a) for a in self.added]
+
+        if self.removed:
+            result['removed'] = [list(key) for key in self.removed]
+
+        if self.changed:
+            result['changed'] = self.changed
+
+        return result
+
+
+class ArrivalDiffer(object):
+    """Change detector for the arrivals of several stops.
+
+    Buses are identified by ``(line_id, bus_id)``. Small variations are not
+    reported, and they are compared against the last reported values so that
+    slow drifts are eventually reported.
+
+    Attributes:
+        eta_threshold (int): Minimum change (in seconds) of the time left.
+        distance_threshold (double): Minimum movement (in meters) of the bus.
+    """
+
+    def __init__(self, eta_threshold=30, distance_threshold=50):
+        self.eta_threshold = eta_threshold
+        self.distance_threshold = distance_threshold
+
+        # Last reported values of each bus of each stop
+        self._state = {}
+
+    def __len__(self):
+        """Number of stops with a known state."""
+        return len(self._state)
+
+    def reset(self, stop_id=None):
+        """Forget the state of a stop, or of all of them.
+
+        The next result of the stop is reported as new arrivals.
+        """
+        if stop_id is None:
+            self._state.clear()
+
+        else:
+            self._state.pop(int(stop_id), None)
+
+    def diff(self, stop_id, arrivals):
+        """Compare a result of a stop with the previous one.
+
+        Args:
+            stop_id (int): ID of the stop.
+            arrivals (list): ``Arrival`` objects or raw response items.
+
+        Returns:
+            ArrivalDelta: Changes since the previous result.
+        """
+        stop_id = int(stop_id)
+        previous = self._state.get(stop_id, {})
+        current = {}
+        added = []
+        changed = []
+
+        for arrival in arrivals:
+            values = _values(arrival)
+            key = (values['line_id'], values['bus_id'])
+
+            # Buses without ID may share the key
+            while key in current:
+                key += (len(key),)
+
+            old = previous.get(key)
+
+            if old is None:
+                current[key] = values
+                added.append(arrival)
+                continue
+
+            change = self._compare(old, values)
+
+            if change:
+                change['line_id'], change['bus_id'] = key[:2]
+                changed.append(change)
+
+                old = dict(old)
+                old.update(change)
+
+            current[key] = old
+
+        removed = [key[:2] for key in previous if key not in current]
+        self._state[stop_id] = current
+
+        return ArrivalDelta(stop_id, added, removed, changed)
+
+    def diff_update(self, update):
+        """Compare the result of a ``StopUpdate`` of a ``StopWatcher``.
+
+        Args:
+            update (StopUpdate): Result of a poll.
+
+        Returns:
+            ArrivalDelta: Changes since the previous result, or None if the
+            request failed.
+        """
+        if update.arrivals is None:
+            return None
+
+        return self.diff(update.stop_id, update.arrivals)
+
+    def attach(self, watcher, callback):
+        """Send the deltas of the updates of a ``StopWatcher`` to a function.
+
+        Args:
+            watcher (StopWatcher): Watcher of the stops.
+            callback: Function that receives each non-empty ``ArrivalDelta``.
+
+        Returns:
+            Function registered in the watcher, which can be passed to
+            ``watcher.remove_callback()``.
+        """
+        def on_update(update):
+            delta = self.diff_update(update)
+
+            if delta:
+                callback(delta)
+
+        watcher.add_callback(on_update)
+        return on_update
+
+    def _compare(self, old, new):
+        """Obtain the values of a bus that changed beyond the thresholds."""
+        change = {}
+        far = TIME_LEFT_SENTINEL
+
+        old_eta = _number(old['time_left'])
+        new_eta = _number(new['time_left'])
+
+        if old_eta is None or new_eta is None:
+            if old_eta != new_eta:
+                change['time_left'] = new['time_left']
+
+        elif (old_eta >= far) != (new_eta >= far):
+            # Bus entering or leaving the 20+ minutes range
+            change['time_left'] = new['time_left']
+
+        elif new_eta < far and abs(new_eta - old_eta) >= self.eta_threshold:
+            change['time_left'] = new['time_left']
+
+        moved = _moved(old, new)
+
+        if moved is not None and moved >= self.distance_threshold:
+            change['latitude'] = new['latitude']
+            change['longitude'] = new['longitude']
+            change['distance'] = new['distance']
+
+        return change
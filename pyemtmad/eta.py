@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains a predictor of arrival times from recent observations.
+
+Each observation of a bus gives an estimate of the moment in which it will
+reach the stop (the time of the observation plus the time left). The
+predictor averages those estimates, giving more weight to recent ones and to
+real positions, and combines the result with the approach speed obtained
+from the distance of the bus to the stop. All the buses are computed at once
+with grouped NumPy operations. NumPy is required.
+"""
+
+from pyemtmad.history import FIELDS, POSITION_CODES
+from pyemtmad.util import np, require_numpy
+from pyemtmad.watcher import TIME_LEFT_SENTINEL
+
+
+class EtaEstimates(object):
+    """Predicted arrivals of the tracked buses.
+
+    All the attributes are parallel arrays with one element per bus and stop.
+
+    Attributes:
+        stop_id (numpy.ndarray): ID of the stop.
+        line_id (numpy.ndarray): Line of the bus.
+        bus_id (numpy.ndarray): ID of the bus.
+        eta (numpy.ndarray): Predicted seconds left (from ``now``).
+        spread (numpy.ndarray): Uncertainty of the prediction in seconds
+            (weighted standard deviation of the estimates).
+        count (numpy.ndarray): Number of observations used.
+        speed (numpy.ndarray): Approach speed in meters per second, NaN if it
+            could not be obtained.
+        now (double): Timestamp of the prediction.
+    """
+
+    columns = ('stop_id', 'line_id', 'bus_id', 'eta', 'spread', 'count',
+               'speed')
+
+    def __init__(self, now, **columns):
+        self.now = now
+
+        for name in self.columns:
+            setattr(self, name, columns[name])
+
+    def __len__(self):
+        return len(self.bus_id)
+
+    def filter(self, mask):
+        """Obtain the estimates selected by a boolean mask or positions."""
+        return EtaEstimates(
+            self.now,
+            **dict((name, getattr(self, name)[mask]) for name in self.columns))
+
+    def for_stop(self, stop_id):
+        """Obtain the estimates of a stop, sorted by ETA."""
+        selected = self.filter(self.stop_id == int(stop_id))
+        return selected.filter(np.argsort(selected.eta, kind='mergesort'))
+
+    def get(self, stop_id, bus_id):
+        """Obtain the ``(eta, spread)`` of a bus at a stop, or None."""
+        found = np.flatnonzero(
+            (self.stop_id == int(stop_id)) & (self.bus_id == int(bus_id)))
+
+        if not len(found):
+            return None
+
+        return float(self.eta[found[0]]), float(self.spread[found[0]])
+
+
+class EtaPredictor(object):
+    """Smoothed arrival times from an ``ArrivalHistory``.
+
+    The estimates of a bus are weighted by ``exp(-age / tau)``, multiplied by
+    ``estimate_weight`` for estimated positions. When the distance to the
+    stop decreases at a plausible speed, the time needed to cover the last
+    known distance at that speed is averaged with the observed estimates.
+
+    Predictions can be obtained at any moment, which interpolates between
+    polls.
+
+    Attributes:
+        history (ArrivalHistory): Source of observations.
+        horizon (double): Seconds of history used.
+        tau (double): Decay (in seconds) of the weight of old observations.
+        estimate_weight (double): Relative weight of estimated positions (0
+            to ignore them).
+        min_speed (double): Minimum plausible speed in meters per second.
+        max_speed (double): Maximum plausible speed in meters per second.
+    """
+
+    def __init__(self, history, horizon=600, tau=120, estimate_weight=0.3,
+                 min_speed=1.0, max_speed=20.0):
+        require_numpy('the ETA predictor')
+
+        if estimate_weight < 0:
+            raise ValueError('estimate_weight must not be negative')
+
+        self.history = history
+        self.horizon = horizon
+        self.tau = tau
+        self.estimate_weight = estimate_weight
+        self.min_speed = min_speed
+        self.max_speed = max_speed
+
+    def predict(self, now, stop_id=None, line_id=None):
+        """Predict the arrivals of the buses observed recently.
+
+        Args:
+            now (double): Timestamp of the prediction. Only observations
+                until this moment are used.
+            stop_id (int): Optional, only predict the arrivals at this stop.
+            line_id (string): Optional, only predict the arrivals of this
+                line.
+
+        Returns:
+            EtaEstimates: One prediction per bus and stop.
+        """
+        keys = [
+            k for k in self.history.keys()
+            if (stop_id is None or k[0] == int(stop_id))
+            and (line_id is None or k[1] == str(line_id))
+        ]
+
+        parts = [
+            self.history.window(
+                k[0], k[1], now - self.horizon, np.nextafter(now, np.inf))
+            for k in keys
+        ]
+        sizes = [len(p) for p in parts]
+
+        rows = np.concatenate(parts) if parts \
+            else np.zeros(0, dtype=np.dtype(list(FIELDS)))
+        key_index = np.repeat(np.arange(len(keys)), sizes)
+
+        age = now - rows['timestamp']
+        weight = np.exp(-age / float(self.tau))
+        weight[rows['position_type'] == POSITION_CODES['estimate']] *= \
+            self.estimate_weight
+
+        # Observations without weight would leave groups with a zero sum
+        valid = (rows['time_left'] >= 0) \
+            & (rows['time_left'] < TIME_LEFT_SENTINEL) \
+            & (rows['bus_id'] >= 0) & (weight > 0)
+        rows = rows[valid]
+        key_index = key_index[valid]
+        weight = weight[valid]
+
+        if not len(rows):
+            empty = np.zeros(0)
+            return EtaEstimates(
+                now, stop_id=empty.astype(np.int64),
+                line_id=empty.astype(np.str_), bus_id=empty.astype(np.int32),
+                eta=empty, spread=empty, count=empty.astype(np.int64),
+                speed=empty)
+
+        # One group per stop, line and bus
+        combined = key_index.astype(np.int64) << 32 | rows['bus_id']
+        groups, first, inverse = np.unique(
+            combined, return_index=True, return_inverse=True)
+        count = len(groups)
+
+        def total(values):
+            return np.bincount(inverse, values, minlength=count)
+
+        # Weighted mean and variance of the estimated passing moments
+        passing = rows['timestamp'] + rows['time_left']
+        weights = total(weight)
+        mean = total(weight * passing) / weights
+        variance = total(weight * (passing - mean[inverse]) ** 2) / weights
+
+        speed, distance_passing = self._approach(
+            rows, inverse, weight, count, now)
+        use_speed = ~np.isnan(distance_passing)
+
+        predicted = np.where(
+            use_speed, (mean + distance_passing) / 2, mean)
+        spread = np.sqrt(variance + np.where(
+            use_speed, (mean - distance_passing) ** 2 / 4, 0))
+
+        group_keys = key_index[first]
+
+        return EtaEstimates(
+            now,
+            stop_id=np.array([keys[k][0] for k in group_keys],
+                             dtype=np.int64),
+            line_id=np.array([keys[k][1] for k in group_keys],
+                             dtype=np.str_),
+            bus_id=(groups & 0xFFFFFFFF).astype(np.int32),
+            eta=np.maximum(predicted - now, 0),
+            spread=spread,
+            count=np.bincount(inverse, minlength=count),
+            speed=speed)
+
+    def _approach(self, rows, inverse, weight, count, now):
+        """Fit the distance to the stop over time for each group.
+
+        Returns:
+            tuple: Approach speed of each group and the moment in which the
+            latest known distance would be covered at that speed (NaN if the
+            speed is not plausible).
+        """
+        distance = rows['distance'].astype(np.float64)
+        known = ~np.isnan(distance)
+        w = np.where(known, weight, 0)
+        x = rows['timestamp'] - now
+        y = np.where(known, distance, 0)
+
+        def total(values):
+            return np.bincount(inverse, values, minlength=count)
+
+        # Weighted least squares of distance = a + b * time
+        sw = total(w)
+        sx = total(w * x)
+        sy = total(w * y)
+        sxx = total(w * x * x)
+        sxy = total(w * x * y)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            speed = -(sw * sxy - sx * sy) / (sw * sxx - sx * sx)
+
+        plausible = (speed >= self.min_speed) & (speed <= self.max_speed) \
+            & (total(known.astype(np.float64)) >= 2)
+        speed = np.where(plausible, speed, np.nan)
+
+        # Latest known distance of each group
+        order = np.lexsort((rows['timestamp'], known, inverse))
+        sorted_groups = inverse[order]
+        ends = np.flatnonzero(np.append(
+            sorted_groups[1:] != sorted_groups[:-1], True))
+        last = order[ends]
+
+        with np.errstate(invalid='ignore'):
+            passing = rows['timestamp'][last] + distance[last] / speed
+
+        return speed, passing
@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains an exporter of the bus network to Apache Arrow.
+
+The exporter requests the endpoints directly and converts each response to a
+record batch without building the objects in ``pyemtmad.types``. Lines are
+requested in chunks and each batch is written as soon as it is obtained, so
+the whole network is never held in memory. PyArrow and NumPy are required.
+"""
+
+import os
+
+from pyemtmad import table
+from pyemtmad import types as emtype
+from pyemtmad import util
+from pyemtmad.util import np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Columns of each table: (name, response key or function, kind). Columns
+# without source are converted beforehand (see ``node_arrays()``)
+ROUTE_COLUMNS = (
+    ('line', 'line', 'int32'),
+    ('node', 'node', 'int32'),
+    ('sec_detail', 'secDetail', 'int8'),
+    ('distance_orig', 'distance', 'float64'),
+    ('distance_prev', 'distancePreviousStop', 'float64'),
+    ('name', 'name', 'dictionary'),
+    ('latitude', 'latitude', 'float64'),
+    ('longitude', 'longitude', 'float64')
+)
+
+NODE_COLUMNS = (
+    ('node', 'node', 'int32'),
+    ('name', 'name', 'dictionary'),
+    ('latitude', 'latitude', 'float64'),
+    ('longitude', 'longitude', 'float64'),
+    ('lines', None, 'int32_list'),
+    ('directions', None, 'int8_list')
+)
+
+STOP_COLUMNS = (
+    ('line', 'line', 'int32'),
+    ('direction', 'direction', 'int8'),
+    ('position', 'position', 'int32'),
+    ('stop', 'stopId', 'int32'),
+    ('name', 'name', 'dictionary'),
+    ('address', 'postalAddress', 'dictionary'),
+    ('latitude', 'latitude', 'float64'),
+    ('longitude', 'longitude', 'float64')
+)
+
+TIMETABLE_COLUMNS = (
+    ('date', lambda v: util.parse_date(v.get('date')), 'date'),
+    ('line', 'line', 'int32'),
+    ('day_type', lambda v: emtype.DAY_TYPES.get(v.get('typeDay')),
+        'dictionary'),
+    ('direction', 'direction', 'int8'),
+    ('start_time', lambda v: util.parse_time(v.get('timeFirst')),
+        'duration'),
+    ('end_time', lambda v: util.parse_time(v.get('timeEnd')), 'duration')
+)
+
+
+def _require_pyarrow():
+    """Raise an error if PyArrow is not available."""
+    if pa is None:
+        raise ImportError('PyArrow is required to export the network')
+
+def _arrow_type(kind):
+    """Obtain the Arrow type of a column kind."""
+    return {
+        'int8': pa.int8(),
+        'int32': pa.int32(),
+        'float64': pa.float64(),
+        'dictionary': pa.dictionary(pa.int32(), pa.string()),
+        'date': pa.date32(),
+        'duration': pa.duration('s'),
+        'int8_list': pa.list_(pa.int8()),
+        'int32_list': pa.list_(pa.int32())
+    }[kind]
+
+def _number(value, kind):
+    """Convert a response value to a number, or None if it is empty."""
+    if value is None or value == '':
+        return None
+
+    return float(value) if kind == 'float64' else int(value)
+
+def node_arrays(values):
+    """Convert the ``lines`` of the items of a nodes response.
+
+    Args:
+        values (list[dict]): ``resultValues`` of a ``get_nodes_lines``
+            response.
+
+    Returns:
+        dict: ``pyarrow.ListArray`` of the line numbers (``lines``) and the
+        direction codes (``directions``) of each node.
+
+    Raises:
+        ValueError: If any of the line strings is malformed.
+    """
+    _require_pyarrow()
+    node, lines, directions = table.decode_node_lines(values)
+    offsets = pa.array(
+        np.searchsorted(node, np.arange(len(values) + 1)), type=pa.int32())
+
+    return {
+        'lines': pa.ListArray.from_arrays(offsets, pa.array(lines)),
+        'directions': pa.ListArray.from_arrays(offsets, pa.array(directions))
+    }
+
+def schema(columns):
+    """Build the Arrow schema for a list of columns.
+
+    Args:
+        columns (tuple): Column definitions, such as ``ROUTE_COLUMNS``.
+
+    Returns:
+        pyarrow.Schema: Schema of the table.
+    """
+    _require_pyarrow()
+    return pa.schema([(c[0], _arrow_type(c[2])) for c in columns])
+
+def record_batch(values, columns, converted=None):
+    """Convert response items to an Arrow record batch.
+
+    Args:
+        values (list[dict]): Response items.
+        columns (tuple): Column definitions, such as ``ROUTE_COLUMNS``.
+        converted (dict): Arrow arrays of the columns without source, such
+            as the result of ``node_arrays()``.
+
+    Returns:
+        pyarrow.RecordBatch: Converted items.
+    """
+    _require_pyarrow()
+    arrays = []
+
+    for name, source, kind in columns:
+        if source is None:
+            arrays.append(converted[name])
+            continue
+
+        if callable(source):
+            data = [source(v) for v in values]
+
+        else:
+            data = [v.get(source) for v in values]
+
+        if kind in ('int8', 'int32', 'float64'):
+            data = [_number(d, kind) for d in data]
+
+        if kind == 'dictionary':
+            array = pa.array(data, type=pa.string()).dictionary_encode()
+
+        else:
+            array = pa.array(data, type=_arrow_type(kind))
+
+        arrays.append(array)
+
+    return pa.RecordBatch.from_arrays(arrays, schema=schema(columns))
+
+def write_parquet(path, columns, batches):
+    """Write a stream of record batches to a Parquet file.
+
+    Args:
+        path (str): Path of the file to write.
+        columns (tuple): Column definitions, such as ``ROUTE_COLUMNS``.
+        batches: Iterable of ``pyarrow.RecordBatch``.
+
+    Returns:
+        int: Number of rows written.
+    """
+    _require_pyarrow()
+    rows = 0
+
+    with pq.ParquetWriter(path, schema(columns)) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+
+    return rows
+
+
+class NetworkExporter(object):
+    """Streams the bus network endpoints to Arrow and Parquet."""
+
+    def __init__(self, wrapper, chunk_size=20, batch_size=5000):
+        """Initialize the exporter.
+
+        Args:
+            wrapper (Wrapper): Object that performs the requests to endpoints.
+            chunk_size (int): Number of lines to request at once.
+            batch_size (int): Maximum number of rows of each batch for
+                endpoints that cannot be requested in chunks.
+        """
+        _require_pyarrow()
+        util.require_numpy('the network exporter')
+
+        self._wrapper = wrapper
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+
+    def export(self, directory, day, month, year, lines=None):
+        """Export the network of the given date to Parquet files.
+
+        The files *route_lines*, *nodes_lines*, *stops_line* and
+        *timetable_lines* (with ``.parquet`` extension) are written to the
+        directory.
+
+        Args:
+            directory (str): Directory in which to write the files.
+            day (int): Day of the month.
+            month (int): Month number.
+            year (int): Year number.
+            lines (list[int]): Lines to export, or None to export all the
+                lines in service on that date.
+
+        Returns:
+            dict: Number of rows written to each file.
+        """
+        if lines is None:
+            lines = self.list_lines(day, month, year)
+
+        tables = (
+            ('route_lines', ROUTE_COLUMNS,
+                self.route_lines(day, month, year, lines)),
+            ('nodes_lines', NODE_COLUMNS, self.nodes_lines()),
+            ('stops_line', STOP_COLUMNS, self.stops_line(lines)),
+            ('timetable_lines', TIMETABLE_COLUMNS,
+                self.timetable_lines(day, month, year, lines))
+        )
+
+        rows = {}
+        for name, columns, batches in tables:
+            path = os.path.join(directory, name + '.parquet')
+            rows[name] = write_parquet(path, columns, batches)
+
+        return rows
+
+    def list_lines(self, day, month, year):
+        """Obtain the numbers of the lines in service on a date.
+
+        Args:
+            day (int): Day of the month.
+            month (int): Month number.
+            year (int): Year number.
+
+        Returns:
+            list[int]: Line numbers.
+        """
+        values = self._request(
+            'get_list_lines',
+            SelectDate=util.date_string(day, month, year),
+            Lines='')
+
+        return sorted(set(int(v.get('line', 0)) for v in values))
+
+    def route_lines(self, day, month, year, lines):
+        """Stream the itinerary of the lines as record batches.
+
+        Args:
+            day (int): Day of the month.
+            month (int): Month number.
+            year (int): Year number.
+            lines (list[int]): Lines to request.
+
+        Yields:
+            pyarrow.RecordBatch: One batch per chunk of lines.
+        """
+        for chunk in self._chunks(lines):
+            values = self._request(
+                'get_route_lines',
+                SelectDate=util.date_string(day, month, year),
+                Lines=util.ints_to_string(chunk))
+
+            yield record_batch(values, ROUTE_COLUMNS)
+
+    def nodes_lines(self):
+        """Stream all the nodes and their lines as record batches.
+
+        Yields:
+            pyarrow.RecordBatch: Batches of at most ``batch_size`` rows.
+        """
+        values = self._request('get_nodes_lines', Nodes='')
+
+        for start in range(0, len(values), self.batch_size):
+            batch = values[start:start + self.batch_size]
+            yield record_batch(batch, NODE_COLUMNS, node_arrays(batch))
+
+    def stops_line(self, lines):
+        """Stream the ordered stops of each line and direction.
+
+        Args:
+            lines (list[int]): Lines to request.
+
+        Yields:
+            pyarrow.RecordBatch: One batch per line and direction.
+
+        Raises:
+            RuntimeError: If the API returned an error.
+        """
+        for line in lines:
+            for direction in ('forward', 'backward'):
+                code = util.direction_code(direction)
+                result = self._wrapper.request_openbus(
+                    'geo', 'get_stops_line',
+                    line=util.ints_to_string(line),
+                    direction=code,
+                    cultureInfo=util.language_code(''))
+
+                if not util.check_result(result, 'stop'):
+                    raise RuntimeError('get_stops_line %s/%s: %s' % (
+                        line, code, result.get('resultDescription',
+                                               'UNKNOWN ERROR')))
+
+                values = util.response_list(result, 'stop')
+                rows = [
+                    dict(v, line=line, direction=code, position=position)
+                    for position, v in enumerate(values)
+                ]
+
+                yield record_batch(rows, STOP_COLUMNS)
+
+    def timetable_lines(self, day, month, year, lines):
+        """Stream the timetables of the lines as record batches.
+
+        Args:
+            day (int): Day of the month.
+            month (int): Month number.
+            year (int): Year number.
+            lines (list[int]): Lines to request.
+
+        Yields:
+            pyarrow.RecordBatch: One batch per chunk of lines.
+        """
+        for chunk in self._chunks(lines):
+            values = self._request(
+                'get_timetable_lines',
+                SelectDate=util.date_string(day, month, year),
+                Lines=util.ints_to_string(chunk))
+
+            yield record_batch(values, TIMETABLE_COLUMNS)
+
+    def _chunks(self, lines):
+        """Split the list of lines in chunks of ``chunk_size``."""
+        for start in range(0, len(lines), self.chunk_size):
+            yield list(lines[start:start + self.chunk_size])
+
+    def _request(self, endpoint, **params):
+        """Request a bus endpoint and obtain its raw result values.
+
+        Raises:
+            RuntimeError: If the API returned an error.
+        """
+        result = self._wrapper.request_openbus('bus', endpoint, **params)
+
+        if not util.check_result(result):
+            raise RuntimeError('%s: %s' % (
+                endpoint, result.get('resultDescription', 'UNKNOWN ERROR')))
+
+        return util.response_list(result, 'resultValues') or []
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains a cache for the endpoints that search around a point.
+
+Queries are snapped to geohash cells whose size depends on the radius. The
+first query in a cell requests a circle that covers any query of that radius
+from any point of the cell, and the response is filtered locally to the
+exact circle of each query. Nearby queries therefore share the same request.
+"""
+
+import collections
+import math
+import threading
+import time
+
+from pyemtmad.geomath import METERS_PER_DEGREE, point_distance
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Smallest radius bucket in meters, larger buckets double its size
+_MIN_BUCKET = 50
+
+
+def _copy(value):
+    """Copy a response item so that changes to it do not reach the cache."""
+    if isinstance(value, dict):
+        return dict((k, _copy(v)) for k, v in value.items())
+
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+
+    return value
+
+def geohash(latitude, longitude, precision):
+    """Encode a point as a geohash.
+
+    Args:
+        latitude (double): Latitude in decimal degrees.
+        longitude (double): Longitude in decimal degrees.
+        precision (int): Number of characters of the code.
+
+    Returns:
+        str: Geohash of the cell that contains the point.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude
+        interval, coordinate = (lon_range, longitude) if even \
+            else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+
+        else:
+            interval[1] = middle
+
+        even = not even
+        bits += 1
+
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+
+    return ''.join(chars)
+
+def geohash_bounds(code):
+    """Obtain the box covered by a geohash.
+
+    Args:
+        code (str): Geohash.
+
+    Returns:
+        tuple: ``(min_latitude, min_longitude, max_latitude, max_longitude)``.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+
+    for char in code:
+        value = _BASE32.index(char)
+
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+
+            if value >> shift & 1:
+                interval[0] = middle
+
+            else:
+                interval[1] = middle
+
+            even = not even
+
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+def _cell_half_diagonal(precision, latitude):
+    """Half the diagonal (in meters) of the geohash cells of a precision."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+
+    height = 180.0 / 2 ** lat_bits * METERS_PER_DEGREE
+    width = 360.0 / 2 ** lon_bits * METERS_PER_DEGREE \
+        * math.cos(math.radians(latitude))
+
+    return math.hypot(width, height) / 2
+
+def query_near(cache, key, latitude, longitude, radius, fetch, position):
+    """Perform a search around a point through a cache, if any.
+
+    Args:
+        cache (GeoCache): Cache to use, or None to request directly.
+        key (tuple): See ``GeoCache.query()``.
+        latitude (double): Latitude in decimal degrees.
+        longitude (double): Longitude in decimal degrees.
+        radius (double): Radius (in meters) of the search.
+        fetch: See ``GeoCache.query()``.
+        position: See ``GeoCache.query()``.
+
+    Returns:
+        list: Items of the search, or None if the request failed.
+    """
+    if cache is None or None in (latitude, longitude, radius):
+        return fetch(latitude, longitude, radius)
+
+    return cache.query(
+        key, float(latitude), float(longitude), float(radius), fetch,
+        position)
+
+
+class GeoCache(object):
+    """Cache of responses of endpoints that search around a point.
+
+    Assign it to the ``geo_cache`` attribute of the ``Wrapper`` to use it in
+    ``get_stops_from_xy``, ``get_street_from_xy``, ``get_poi`` and
+    ``info_parking_poi``.
+
+    Attributes:
+        ttl (int): Seconds during which a response is reused.
+        max_entries (int): Maximum number of responses to keep.
+        hits (int): Number of queries answered from the cache.
+        misses (int): Number of queries that required a request.
+    """
+
+    def __init__(self, ttl=300, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Remove all the cached responses."""
+        with self._lock:
+            self._entries.clear()
+
+    def invalidate(self, endpoint, match=None, points=None):
+        """Remove the cached responses of an endpoint.
+
+        Without ``match`` and ``points`` all the responses of the endpoint
+        are removed.
+
+        Args:
+            endpoint (str): Name of the endpoint (e.g. *get_stops_from_xy*).
+            match: Optional, function that receives a cached item and returns
+                whether the response that contains it must be removed.
+            points (list[tuple]): Optional, ``(latitude, longitude)`` of
+                points. Responses whose request covered any of them are
+                removed, as the point may now be part of them.
+
+        Returns:
+            int: Number of removed responses.
+        """
+        def outdated(entry):
+            if match is None and points is None:
+                return True
+
+            if match is not None and any(match(v) for v in entry[1]):
+                return True
+
+            latitude, longitude, radius = entry[2]
+            return any(
+                point_distance(latitude, longitude, lat, lon) <= radius
+                for lat, lon in points or ())
+
+        with self._lock:
+            keys = [
+                k for k, entry in self._entries.items()
+                if k[0][0] == endpoint and outdated(entry)
+            ]
+
+            for key in keys:
+                del self._entries[key]
+
+        return len(keys)
+
+    @staticmethod
+    def cell(latitude, longitude, radius):
+        """Obtain the cell used for a query.
+
+        The radius is rounded up to a bucket (50 m times a power of two) and
+        the cells are the smallest geohash cells whose half diagonal does not
+        exceed it, so the request of a cell covers at most twice the radius.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            radius (double): Radius (in meters) of the query.
+
+        Returns:
+            tuple: Geohash of the cell, radius bucket and radius (in meters)
+            of the request that covers the cell.
+        """
+        bucket = _MIN_BUCKET
+        while bucket < radius:
+            bucket *= 2
+
+        precision = 1
+        while precision < 12 and \
+                _cell_half_diagonal(precision, latitude) > bucket:
+            precision += 1
+
+        code = geohash(latitude, longitude, precision)
+        min_lat, min_lon, max_lat, max_lon = geohash_bounds(code)
+        center_lat = (min_lat + max_lat) / 2
+        center_lon = (min_lon + max_lon) / 2
+
+        # Farthest corner of the cell from its center
+        reach = max(
+            point_distance(center_lat, center_lon, lat, lon)
+            for lat in (min_lat, max_lat) for lon in (min_lon, max_lon))
+
+        return code, bucket, int(math.ceil(bucket + reach))
+
+    def query(self, key, latitude, longitude, radius, fetch, position):
+        """Obtain the items of a search around a point.
+
+        Args:
+            key (tuple): Endpoint and parameters of the search other than the
+                coordinates and the radius.
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            radius (double): Radius (in meters) of the search.
+            fetch: Function that receives the latitude, longitude and radius
+                of a search, performs the request and returns its items (or
+                None in case of error).
+            position: Function that obtains the ``(latitude, longitude)`` of
+                an item.
+
+        Returns:
+            list: Items within the radius, sorted by distance to the point,
+            or None if the request failed. Items are copies of the cached
+            ones, so they can be modified freely.
+        """
+        code, bucket, reach = self.cell(latitude, longitude, radius)
+        min_lat, min_lon, max_lat, max_lon = geohash_bounds(code)
+        entry_key = (key, code, bucket)
+
+        values = self._get(entry_key)
+
+        if values is None:
+            values = self._fetch(
+                entry_key, fetch,
+                ((min_lat + max_lat) / 2, (min_lon + max_lon) / 2, reach))
+
+            if values is None:
+                return None
+
+        found = []
+        for index, value in enumerate(values):
+            try:
+                lat, lon = position(value)
+                distance = point_distance(
+                    latitude, longitude, float(lat), float(lon))
+
+            except (AttributeError, KeyError, TypeError, ValueError):
+                continue
+
+            if distance <= radius:
+                found.append((distance, index, value))
+
+        found.sort(key=lambda f: f[:2])
+        return [_copy(value) for _, _, value in found]
+
+    def _get(self, entry_key):
+        """Obtain a cached response if it has not expired."""
+        with self._lock:
+            entry = self._entries.get(entry_key)
+
+            if entry is None or time.time() - entry[0] > self.ttl:
+                return None
+
+            # Most recently used entries are kept at the end
+            del self._entries[entry_key]
+            self._entries[entry_key] = entry
+            self.hits += 1
+
+            return entry[1]
+
+    def _fetch(self, entry_key, fetch, circle):
+        """Perform the request of a cell, once for concurrent queries."""
+        with self._lock:
+            pending = self._pending.get(entry_key)
+
+            if pending is None:
+                pending = self._pending[entry_key] = threading.Lock()
+
+        with pending:
+            # Another query may have obtained it while waiting
+            values = self._get(entry_key)
+            if values is not None:
+                return values
+
+            values = None
+
+            try:
+                values = fetch(*circle)
+
+            finally:
+                # Released even if the request raised an exception
+                with self._lock:
+                    self.misses += 1
+                    self._pending.pop(entry_key, None)
+
+                    if values is not None:
+                        self._entries[entry_key] = (
+                            time.time(), values, circle)
+
+                        while len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+
+            return values
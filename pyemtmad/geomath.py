@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains vectorized geodesic functions.
+
+All the functions accept scalars or NumPy arrays of coordinates in decimal
+degrees and follow the NumPy broadcasting rules, so a single point can be
+compared against many at once. Distances are in meters. NumPy is required,
+except for ``point_distance()``, which computes a single distance with the
+``math`` module.
+"""
+
+import math
+
+from pyemtmad.util import np, require_numpy
+
+# Mean Earth radius in meters
+EARTH_RADIUS = 6371008.8
+
+# Meters per degree of latitude
+METERS_PER_DEGREE = EARTH_RADIUS * math.pi / 180
+
+
+def point_distance(lat1, lon1, lat2, lon2):
+    """Compute the great-circle distance between two points without NumPy.
+
+    Args:
+        lat1 (double): Latitude of the first point in decimal degrees.
+        lon1 (double): Longitude of the first point in decimal degrees.
+        lat2 (double): Latitude of the second point in decimal degrees.
+        lon2 (double): Longitude of the second point in decimal degrees.
+
+    Returns:
+        double: Distance in meters.
+    """
+    lat1, lat2 = math.radians(lat1), math.radians(lat2)
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) \
+        * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(min(h, 1.0)))
+
+def coordinates(items):
+    """Obtain the coordinates of a collection as arrays.
+
+    Args:
+        items: List of objects with ``latitude`` and ``longitude`` attributes
+            (such as ``Stop`` or ``Arrival``), list of response items with
+            those keys, or a columnar table.
+
+    Returns:
+        tuple: Two ``numpy.ndarray`` with the latitudes and longitudes. Missing
+        values are NaN.
+    """
+    require_numpy('geodesic functions')
+
+    latitude = getattr(items, 'latitude', None)
+    if isinstance(latitude, np.ndarray):
+        # Columnar table
+        return (
+            np.asarray(latitude, dtype=np.float64),
+            np.asarray(items.longitude, dtype=np.float64)
+        )
+
+    if items and isinstance(items[0], dict):
+        latitudes = [item.get('latitude') for item in items]
+        longitudes = [item.get('longitude') for item in items]
+
+    else:
+        latitudes = [item.latitude for item in items]
+        longitudes = [item.longitude for item in items]
+
+    return float_array(latitudes), float_array(longitudes)
+
+def float_array(values):
+    """Convert a list of response values to an array of floats.
+
+    Args:
+        values (list): Numbers or numeric strings.
+
+    Returns:
+        numpy.ndarray: Converted values, with NaN for missing values.
+    """
+    try:
+        # None is converted to NaN
+        return np.array(values, dtype=np.float64)
+
+    except (TypeError, ValueError):
+        return np.array(
+            [np.nan if v is None or v == '' else v for v in values],
+            dtype=np.float64)
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Compute the great-circle distance between points.
+
+    Args:
+        lat1: Latitudes of the first points.
+        lon1: Longitudes of the first points.
+        lat2: Latitudes of the second points.
+        lon2: Longitudes of the second points.
+
+    Returns:
+        numpy.ndarray: Distances in meters.
+    """
+    require_numpy('geodesic functions')
+
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(lon2) - np.radians(lon1)
+
+    h = np.sin(dlat / 2) ** 2 \
+        + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+def equirectangular(lat1, lon1, lat2, lon2):
+    """Compute the distance between points with a flat projection.
+
+    This is faster than ``haversine()`` and the error is negligible for
+    distances within a city.
+
+    Args:
+        lat1: Latitudes of the first points.
+        lon1: Longitudes of the first points.
+        lat2: Latitudes of the second points.
+        lon2: Longitudes of the second points.
+
+    Returns:
+        numpy.ndarray: Distances in meters.
+    """
+    require_numpy('geodesic functions')
+
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+
+    x = (np.radians(lon2) - np.radians(lon1)) * np.cos((lat1 + lat2) / 2)
+    y = lat2 - lat1
+
+    return EARTH_RADIUS * np.hypot(x, y)
+
+def distance_to(items, latitude, longitude, method=haversine):
+    """Compute the distance from every item of a collection to a point.
+
+    Args:
+        items: Collection accepted by ``coordinates()``.
+        latitude (double): Latitude of the point in decimal degrees.
+        longitude (double): Longitude of the point in decimal degrees.
+        method: Distance function, ``haversine`` or ``equirectangular``.
+
+    Returns:
+        numpy.ndarray: Distances in meters.
+    """
+    lat, lon = coordinates(items)
+    return method(lat, lon, latitude, longitude)
+
+def pairwise(items, others=None, method=haversine):
+    """Compute the distances between all the items of two collections.
+
+    Args:
+        items: Collection accepted by ``coordinates()``.
+        others: Another collection, or None to use ``items``.
+        method: Distance function, ``haversine`` or ``equirectangular``.
+
+    Returns:
+        numpy.ndarray: Matrix in which ``[i, j]`` is the distance between
+        the item ``i`` of ``items`` and the item ``j`` of ``others``.
+    """
+    lat1, lon1 = coordinates(items)
+    lat2, lon2 = (lat1, lon1) if others is None else coordinates(others)
+
+    return method(lat1[:, None], lon1[:, None], lat2[None, :], lon2[None, :])
+
+def bearing(lat1, lon1, lat2, lon2):
+    """Compute the initial bearing from the first to the second points.
+
+    Args:
+        lat1: Latitudes of the first points.
+        lon1: Longitudes of the first points.
+        lat2: Latitudes of the second points.
+        lon2: Longitudes of the second points.
+
+    Returns:
+        numpy.ndarray: Bearings in degrees clockwise from north (0 - 360).
+    """
+    require_numpy('geodesic functions')
+
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlon = np.radians(lon2) - np.radians(lon1)
+
+    y = np.sin(dlon) * np.cos(lat2)
+    x = np.cos(lat1) * np.sin(lat2) \
+        - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+
+    return np.degrees(np.arctan2(y, x)) % 360
+
+def bounding_box(latitude, longitude, radius):
+    """Compute the box that contains a circle around a point.
+
+    Args:
+        latitude (double): Latitude of the center in decimal degrees.
+        longitude (double): Longitude of the center in decimal degrees.
+        radius (double): Radius of the circle in meters.
+
+    Returns:
+        tuple: ``(min_latitude, min_longitude, max_latitude, max_longitude)``.
+    """
+    require_numpy('geodesic functions')
+
+    dlat = np.degrees(radius / EARTH_RADIUS)
+    dlon = dlat / np.cos(np.radians(latitude))
+
+    return (
+        latitude - dlat, longitude - dlon, latitude + dlat, longitude + dlon
+    )
+
+def bounds(items):
+    """Compute the box that contains all the items of a collection.
+
+    Args:
+        items: Collection accepted by ``coordinates()``.
+
+    Returns:
+        tuple: ``(min_latitude, min_longitude, max_latitude, max_longitude)``,
+        ignoring items without coordinates.
+    """
+    lat, lon = coordinates(items)
+
+    return (
+        np.nanmin(lat), np.nanmin(lon), np.nanmax(lat), np.nanmax(lon)
+    )
+
+def in_box(items, box):
+    """Check which items of a collection are inside a box.
+
+    Args:
+        items: Collection accepted by ``coordinates()``.
+        box (tuple): Box as returned by ``bounding_box()``.
+
+    Returns:
+        numpy.ndarray: Boolean mask.
+    """
+    lat, lon = coordinates(items)
+    min_lat, min_lon, max_lat, max_lon = box
+
+    return (lat >= min_lat) & (lat <= max_lat) \
+        & (lon >= min_lon) & (lon <= max_lon)
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains an in-memory graph of the bus network.
+
+Stops and lines are identified by consecutive integers and the relations
+between them are stored in compressed sparse row (CSR) arrays: the elements
+related to item ``i`` are ``values[offsets[i]:offsets[i + 1]]``. This makes
+every lookup a slice of an array. NumPy is required.
+"""
+
+from pyemtmad import geomath
+from pyemtmad.shape import RouteShape
+from pyemtmad.table import decode_node_lines
+from pyemtmad.util import np, require_numpy
+
+# Direction names by code
+DIRECTION_NAMES = {1: 'forward', 2: 'backward'}
+DIRECTION_CODES = {'forward': 1, 'backward': 2}
+
+
+def _csr(rows, count, *columns):
+    """Group the values of several columns by row.
+
+    Args:
+        rows (numpy.ndarray): Row of each value.
+        count (int): Number of rows.
+        *columns: Arrays with the values, parallel to ``rows``.
+
+    Returns:
+        tuple: Offsets of each row followed by the grouped columns. The order
+        of the values within a row is preserved.
+    """
+    order = np.argsort(rows, kind='mergesort')
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=count), out=offsets[1:])
+
+    return (offsets,) + tuple(c[order] for c in columns)
+
+
+class TransitGraph(object):
+    """Stops, lines and routes of the network with local adjacency lookups.
+
+    A route is the ordered sequence of stops of a line in one direction.
+
+    Attributes:
+        stop_ids (numpy.ndarray): Stop ID of each stop index (sorted).
+        stop_latitude (numpy.ndarray): Latitude of each stop.
+        stop_longitude (numpy.ndarray): Longitude of each stop.
+        line_ids (numpy.ndarray): Line number of each line index (sorted).
+        route_line (numpy.ndarray): Line index of each route.
+        route_direction (numpy.ndarray): Direction code of each route
+            (1 = forward, 2 = backward).
+        route_offsets (numpy.ndarray): CSR offsets of ``route_stops``.
+        route_stops (numpy.ndarray): Stop indexes of each route, in order.
+        route_distance (numpy.ndarray): Distance (in meters) from the origin
+            of the route to each stop, parallel to ``route_stops``.
+        stop_route_offsets (numpy.ndarray): CSR offsets of ``stop_routes``.
+        stop_routes (numpy.ndarray): Routes that serve each stop.
+        stop_route_positions (numpy.ndarray): Position of the stop in each of
+            those routes, parallel to ``stop_routes``.
+        stop_line_offsets (numpy.ndarray): CSR offsets of ``stop_lines``.
+        stop_lines (numpy.ndarray): Line indexes that serve each stop.
+        stop_line_directions (numpy.ndarray): Direction code of each of those
+            lines, parallel to ``stop_lines``.
+    """
+
+    def __init__(self, shapes, nodes=None):
+        """Build the graph.
+
+        Args:
+            shapes (dict): Route shapes indexed by ``(line, direction)``, as
+                obtained from ``RouteShape.from_items()``.
+            nodes (list): Optional, ``NodeLinesItem`` objects or raw items of
+                a ``get_nodes_lines`` response. They add the lines of each
+                stop reported by the API and the stops not served by any of
+                the routes.
+
+        Raises:
+            ValueError: If a node has no id or a line string of the nodes is
+                malformed or has a direction code other than 1 or 2.
+        """
+        require_numpy('the transit graph')
+
+        keys = sorted(shapes)
+        nodes = [getattr(n, '_json', n) for n in nodes or []]
+
+        if any(n.get('node') in (None, '') for n in nodes):
+            raise ValueError('Node without id in nodes response')
+
+        node_ids = np.array([int(n['node']) for n in nodes], dtype=np.int64)
+        node_position, node_line, node_direction = decode_node_lines(nodes)
+
+        # The direction is combined with the stop and line below
+        if not np.isin(node_direction, list(DIRECTION_NAMES)).all():
+            raise ValueError('Unknown direction code in nodes response')
+
+        # Stops and lines
+        self.stop_ids = np.unique(np.concatenate(
+            [shapes[k].stop_ids for k in keys] + [node_ids]))
+        self.line_ids = np.unique(np.concatenate(
+            [np.array([k[0] for k in keys], dtype=np.int64),
+             node_line.astype(np.int64)]))
+
+        self._stop_index = dict(
+            (stop, index) for index, stop in enumerate(self.stop_ids.tolist()))
+        self._line_index = dict(
+            (line, index) for index, line in enumerate(self.line_ids.tolist()))
+
+        self._set_coordinates(shapes, keys, nodes, node_ids)
+        self._set_routes(shapes, keys)
+
+        # Lines of each stop, from the routes and the nodes
+        route_lengths = np.diff(self.route_offsets)
+        rows = np.concatenate((
+            self.route_stops,
+            np.searchsorted(self.stop_ids, node_ids[node_position])))
+        lines = np.concatenate((
+            np.repeat(self.route_line, route_lengths),
+            np.searchsorted(self.line_ids, node_line)))
+        directions = np.concatenate((
+            np.repeat(self.route_direction, route_lengths),
+            node_direction)).astype(np.int64)
+
+        # Remove duplicates by combining the three values in a single key
+        # (direction codes are 1 or 2)
+        combined = np.unique(
+            (rows.astype(np.int64) * len(self.line_ids) + lines) * 3
+            + directions)
+        rows, combined = np.divmod(combined, 3 * len(self.line_ids))
+        lines, directions = np.divmod(combined, 3)
+
+        self.stop_line_offsets, self.stop_lines, self.stop_line_directions = \
+            _csr(rows, len(self.stop_ids), lines, directions.astype(np.int8))
+
+    @classmethod
+    def build(cls, route_items, nodes=None):
+        """Build the graph from the responses of the API.
+
+        Args:
+            route_items: List of ``RouteLinesItem`` or a ``RouteTable``, as
+                obtained from ``get_route_lines``.
+            nodes (list): Optional, ``NodeLinesItem`` objects or raw items of
+                a ``get_nodes_lines`` response.
+
+        Returns:
+            TransitGraph: Graph of the network.
+        """
+        return cls(RouteShape.from_items(route_items), nodes)
+
+    def _set_coordinates(self, shapes, keys, nodes, node_ids):
+        """Obtain the coordinates of the stops from the shapes and nodes."""
+        self.stop_latitude = np.full(len(self.stop_ids), np.nan)
+        self.stop_longitude = np.full(len(self.stop_ids), np.nan)
+
+        for key in keys:
+            shape = shapes[key]
+            rows = np.searchsorted(self.stop_ids, shape.stop_ids)
+            self.stop_latitude[rows] = shape.latitude[shape.stop_index]
+            self.stop_longitude[rows] = shape.longitude[shape.stop_index]
+
+        if nodes:
+            rows = np.searchsorted(self.stop_ids, node_ids)
+            latitude, longitude = geomath.coordinates(nodes)
+
+            known = ~np.isnan(latitude)
+            self.stop_latitude[rows[known]] = latitude[known]
+            self.stop_longitude[rows[known]] = longitude[known]
+
+    def _set_routes(self, shapes, keys):
+        """Build the route arrays and the routes of each stop."""
+        self._route_index = dict(
+            (key, index) for index, key in enumerate(keys))
+
+        self.route_line = np.array(
+            [self._line_index[k[0]] for k in keys], dtype=np.int64)
+        self.route_direction = np.array(
+            [DIRECTION_CODES[k[1]] for k in keys], dtype=np.int8)
+
+        lengths = [len(shapes[k].stop_ids) for k in keys]
+        self.route_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.route_offsets[1:])
+
+        if keys:
+            self.route_stops = np.searchsorted(
+                self.stop_ids,
+                np.concatenate([shapes[k].stop_ids for k in keys]))
+            self.route_distance = np.concatenate(
+                [shapes[k].stop_distances() for k in keys])
+
+        else:
+            self.route_stops = np.zeros(0, dtype=np.int64)
+            self.route_distance = np.zeros(0)
+
+        routes = np.repeat(np.arange(len(keys)), lengths)
+        positions = np.arange(len(self.route_stops)) \
+            - np.repeat(self.route_offsets[:-1], lengths)
+
+        (self.stop_route_offsets, self.stop_routes,
+         self.stop_route_positions) = _csr(
+            self.route_stops, len(self.stop_ids), routes, positions)
+
+    @property
+    def stop_count(self):
+        """Number of stops in the graph."""
+        return len(self.stop_ids)
+
+    @property
+    def route_count(self):
+        """Number of routes in the graph."""
+        return len(self.route_line)
+
+    def stop_index(self, stop_id):
+        """Obtain the index of a stop, or None if it is not in the graph."""
+        return self._stop_index.get(int(stop_id))
+
+    def line_index(self, line):
+        """Obtain the index of a line, or None if it is not in the graph."""
+        return self._line_index.get(int(line))
+
+    def route_index(self, line, direction='forward'):
+        """Obtain the index of a route, or None if it is not in the graph.
+
+        Args:
+            line (int): Line number.
+            direction (str): *forward* or *backward*.
+        """
+        return self._route_index.get((int(line), direction))
+
+    def route_stop_indexes(self, route):
+        """Obtain the stop indexes of a route, in order."""
+        return self.route_stops[
+            self.route_offsets[route]:self.route_offsets[route + 1]]
+
+    def stops_of(self, line, direction='forward'):
+        """Obtain the stops of a line in the order in which they are served.
+
+        Args:
+            line (int): Line number.
+            direction (str): *forward* or *backward*.
+
+        Returns:
+            numpy.ndarray: Stop IDs, empty if the route is not in the graph.
+        """
+        route = self.route_index(line, direction)
+
+        if route is None:
+            return np.zeros(0, dtype=self.stop_ids.dtype)
+
+        return self.stop_ids[self.route_stop_indexes(route)]
+
+    def lines_at(self, stop_id):
+        """Obtain the lines that serve a stop.
+
+        Args:
+            stop_id (int): ID of the stop.
+
+        Returns:
+            list[tuple]: Line number and direction (*forward* or *backward*),
+            as in ``NodeLinesItem.lines``.
+        """
+        stop = self.stop_index(stop_id)
+
+        if stop is None:
+            return []
+
+        start, end = self.stop_line_offsets[stop:stop + 2]
+
+        return [
+            (line, DIRECTION_NAMES.get(direction))
+            for line, direction in zip(
+                self.line_ids[self.stop_lines[start:end]].tolist(),
+                self.stop_line_directions[start:end].tolist())
+        ]
+
+    def routes_at(self, stop_id):
+        """Obtain the routes that serve a stop.
+
+        Args:
+            stop_id (int): ID of the stop.
+
+        Returns:
+            tuple: Two ``numpy.ndarray`` with the route indexes and the
+            position of the stop in each route.
+        """
+        stop = self.stop_index(stop_id)
+
+        if stop is None:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+
+        start, end = self.stop_route_offsets[stop:stop + 2]
+        return (
+            self.stop_routes[start:end], self.stop_route_positions[start:end])
@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains a short-term history of the arrivals of stops.
+
+Observations are stored in fixed-size ring buffers, one per stop and line,
+backed by NumPy structured arrays instead of ``Arrival`` objects. Appending
+overwrites the oldest observation once a buffer is full, and queries over a
+time window return arrays. NumPy is required.
+"""
+
+import threading
+import time
+
+from pyemtmad import types as emtype
+from pyemtmad.util import np, require_numpy
+from pyemtmad.watcher import TIME_LEFT_SENTINEL
+
+# Fields of each observation
+FIELDS = (
+    ('timestamp', 'f8'),
+    ('bus_id', 'i4'),
+    ('time_left', 'i4'),
+    ('distance', 'f4'),
+    ('latitude', 'f8'),
+    ('longitude', 'f8'),
+    ('position_type', 'i1')
+)
+
+# Version of the files written by ``ArrivalHistory.save()``, to be increased
+# whenever ``FIELDS`` change
+FORMAT_VERSION = 1
+
+# Codes of the position types (-1 if unknown)
+POSITION_CODES = dict((v, k) for k, v in emtype.POSITION_TYPES.items())
+
+
+def _int(value, default=-1):
+    """Convert a response value to int."""
+    try:
+        return int(float(value))
+
+    except (TypeError, ValueError):
+        return default
+
+def _float(value):
+    """Convert a response value to float, NaN if missing."""
+    try:
+        return float(value)
+
+    except (TypeError, ValueError):
+        return float('nan')
+
+
+class RingBuffer(object):
+    """Fixed-size buffer of observations in order of arrival.
+
+    Observations are expected to be appended in chronological order.
+
+    Attributes:
+        capacity (int): Maximum number of observations.
+    """
+
+    def __init__(self, capacity):
+        require_numpy('the arrival history')
+
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.dtype(list(FIELDS)))
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row):
+        """Add an observation, overwriting the oldest one if full.
+
+        Args:
+            row (tuple): Values in the order of ``FIELDS``.
+        """
+        self._data[self._next] = row
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def extend(self, rows):
+        """Add several observations at once.
+
+        Args:
+            rows (numpy.ndarray): Structured array with the ``FIELDS``.
+        """
+        rows = rows[-self.capacity:]
+        count = len(rows)
+
+        # Positions wrap around the end of the buffer
+        positions = (self._next + np.arange(count)) % self.capacity
+        self._data[positions] = rows
+
+        self._next = (self._next + count) % self.capacity
+        self._size = min(self._size + count, self.capacity)
+
+    def values(self):
+        """Obtain the observations from oldest to newest.
+
+        Returns:
+            numpy.ndarray: Structured array (a copy).
+        """
+        if self._size < self.capacity:
+            return self._data[:self._size].copy()
+
+        return np.concatenate(
+            (self._data[self._next:], self._data[:self._next]))
+
+    def window(self, start=None, end=None):
+        """Obtain the observations within a time window.
+
+        Args:
+            start (double): Optional, minimum timestamp (inclusive).
+            end (double): Optional, maximum timestamp (exclusive).
+
+        Returns:
+            numpy.ndarray: Structured array from oldest to newest.
+        """
+        if self._size < self.capacity:
+            parts = (self._data[:self._size],)
+
+        else:
+            parts = (self._data[self._next:], self._data[:self._next])
+
+        selected = []
+
+        for part in parts:
+            timestamps = part['timestamp']
+            first = 0 if start is None \
+                else np.searchsorted(timestamps, start, 'left')
+            last = len(part) if end is None \
+                else np.searchsorted(timestamps, end, 'left')
+
+            selected.append(part[first:last])
+
+        return np.concatenate(selected)
+
+
+class ArrivalHistory(object):
+    """History of the arrivals of stops, per stop and line.
+
+    Attributes:
+        capacity (int): Observations kept per stop and line.
+    """
+
+    def __init__(self, capacity=720):
+        require_numpy('the arrival history')
+
+        self.capacity = capacity
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of stored observations."""
+        return sum(len(b) for b in self._buffers.values())
+
+    def keys(self):
+        """Obtain the ``(stop_id, line_id)`` pairs with observations."""
+        return sorted(self._buffers)
+
+    def lines(self, stop_id):
+        """Obtain the lines with observations at a stop."""
+        stop_id = int(stop_id)
+        return sorted(line for stop, line in self._buffers if stop == stop_id)
+
+    def record(self, stop_id, arrivals, observed_at=None):
+        """Store the arrivals of a stop.
+
+        Args:
+            stop_id (int): ID of the stop.
+            arrivals (list): ``Arrival`` objects or raw response items.
+            observed_at (double): Optional, timestamp of the response.
+        """
+        stop_id = int(stop_id)
+        now = time.time() if observed_at is None else observed_at
+
+        with self._lock:
+            for arrival in arrivals:
+                if isinstance(arrival, dict):
+                    arrival = emtype.Arrival.from_json(arrival)
+
+                key = (stop_id, str(arrival.line_id))
+                buffer = self._buffers.get(key)
+
+                if buffer is None:
+                    buffer = self._buffers[key] = RingBuffer(self.capacity)
+
+                buffer.append((
+                    now, _int(arrival.bus_id), _int(arrival.time_left),
+                    _float(arrival.distance), _float(arrival.latitude),
+                    _float(arrival.longitude),
+                    POSITION_CODES.get(arrival.position_type, -1)))
+
+    def record_update(self, update):
+        """Store the arrivals of a ``StopUpdate`` of a ``StopWatcher``.
+
+        Failed requests are ignored.
+        """
+        if update.arrivals is not None:
+            self.record(update.stop_id, update.arrivals, update.polled_at)
+
+    def attach(self, watcher):
+        """Store the updates of a ``StopWatcher`` as they are produced.
+
+        Returns:
+            Function registered in the watcher, which can be passed to
+            ``watcher.remove_callback()``.
+        """
+        watcher.add_callback(self.record_update)
+        return self.record_update
+
+    def window(self, stop_id, line_id=None, start=None, end=None):
+        """Obtain the observations of a stop within a time window.
+
+        Args:
+            stop_id (int): ID of the stop.
+            line_id (string): Optional, only the observations of this line.
+            start (double): Optional, minimum timestamp (inclusive).
+            end (double): Optional, maximum timestamp (exclusive).
+
+        Returns:
+            numpy.ndarray: Structured array with the ``FIELDS``, sorted by
+            timestamp.
+        """
+        stop_id = int(stop_id)
+
+        with self._lock:
+            if line_id is not None:
+                buffer = self._buffers.get((stop_id, str(line_id)))
+                buffers = [buffer] if buffer is not None else []
+
+            else:
+                buffers = [
+                    b for (stop, _), b in self._buffers.items()
+                    if stop == stop_id
+                ]
+
+            parts = [b.window(start, end) for b in buffers]
+
+        if not parts:
+            return np.zeros(0, dtype=np.dtype(list(FIELDS)))
+
+        result = np.concatenate(parts)
+
+        if len(parts) > 1:
+            result = result[np.argsort(result['timestamp'], kind='mergesort')]
+
+        return result
+
+    def passages(self, stop_id, line_id, start=None, end=None):
+        """Estimate when each bus of a line passed or will pass a stop.
+
+        The latest observation of each bus is used: its timestamp plus its
+        time left. Observations of 20+ minutes are ignored.
+
+        Args:
+            stop_id (int): ID of the stop.
+            line_id (string): Line ID.
+            start (double): Optional, minimum timestamp of the observations.
+            end (double): Optional, maximum timestamp of the observations.
+
+        Returns:
+            tuple: Two ``numpy.ndarray`` with the bus IDs and their passing
+            timestamps, sorted by time.
+        """
+        rows = self.window(stop_id, line_id, start, end)
+        rows = rows[
+            (rows['time_left'] >= 0)
+            & (rows['time_left'] < TIME_LEFT_SENTINEL)]
+
+        # Last observation of each bus
+        reverse = rows[::-1]
+        buses, first = np.unique(reverse['bus_id'], return_index=True)
+        latest = reverse[first]
+
+        passing = latest['timestamp'] + latest['time_left']
+        order = np.argsort(passing)
+
+        return buses[order], passing[order]
+
+    def headways(self, stop_id, line_id, start=None, end=None):
+        """Obtain the seconds between consecutive buses of a line at a stop.
+
+        The arguments are the same as in ``passages()``.
+
+        Returns:
+            numpy.ndarray: Headways in seconds.
+        """
+        return np.diff(self.passages(stop_id, line_id, start, end)[1])
+
+    def save(self, path):
+        """Save the history to a file.
+
+        Args:
+            path: File name or file object, as accepted by ``numpy.savez``.
+        """
+        with self._lock:
+            keys = sorted(self._buffers)
+            parts = [self._buffers[k].values() for k in keys]
+
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in parts], out=offsets[1:])
+
+        np.savez_compressed(
+            path,
+            rows=np.concatenate(parts) if parts
+            else np.zeros(0, dtype=np.dtype(list(FIELDS))),
+            offsets=offsets,
+            stop_ids=np.array([k[0] for k in keys], dtype=np.int64),
+            line_ids=np.array([k[1] for k in keys], dtype=np.str_),
+            capacity=np.array([self.capacity]),
+            version=np.array([FORMAT_VERSION]))
+
+    @classmethod
+    def load(cls, path, capacity=None):
+        """Load a history saved with ``save()``.
+
+        Args:
+            path: File name or file object, as accepted by ``numpy.load``.
+            capacity (int): Optional, capacity of the buffers (the saved one
+                by default). Only the newest observations are kept if smaller.
+
+        Returns:
+            ArrivalHistory: Loaded history.
+
+        Raises:
+            ValueError: If the file was saved in another format version.
+        """
+        require_numpy('the arrival history')
+
+        with np.load(path) as data:
+            version = int(data['version'][0]) \
+                if 'version' in data.files else None
+
+            if version != FORMAT_VERSION:
+                raise ValueError(
+                    'Unsupported history format version: %s' % version)
+
+            history = cls(
+                int(data['capacity'][0]) if capacity is None else capacity)
+            rows = data['rows']
+            offsets = data['offsets']
+
+            for index, (stop_id, line_id) in enumerate(zip(
+                    data['stop_ids'].tolist(), data['line_ids'].tolist())):
+                buffer = RingBuffer(history.capacity)
+                buffer.extend(rows[offsets[index]:offsets[index + 1]])
+                history._buffers[(stop_id, line_id)] = buffer
+
+        return history
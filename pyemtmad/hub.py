@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains a hub that shares the arrival polls among subscribers.
+
+Any number of subscribers can listen to the arrivals of a stop while a
+single ``StopWatcher`` polls it once. Stops are watched while they have
+subscribers and dropped when the last one leaves. Asynchronous subscribers
+that consume updates slower than they are produced only keep the latest
+update of each stop. Callbacks have no such buffer: they run in the polling
+thread and delay every poll while they run.
+"""
+
+import collections
+import threading
+
+from pyemtmad.watcher import StopWatcher
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+# Marks the end of a subscription
+_END = object()
+
+
+class Subscription(object):
+    """Updates of a set of stops for one subscriber.
+
+    Updates are sent to the callback of the subscription, if any. Otherwise
+    the subscription is an asynchronous iterator of ``StopUpdate`` objects::
+
+        async for update in subscription:
+            ...
+
+    Attributes:
+        stops (frozenset): IDs of the subscribed stops.
+        dropped (int): Number of updates replaced by a newer one of the same
+            stop before being consumed.
+    """
+
+    def __init__(self, hub, stops, callback=None, loop=None):
+        self.stops = frozenset(stops)
+        self.dropped = 0
+
+        self._hub = hub
+        self._callback = callback
+        self._loop = loop
+
+        # Latest unconsumed update of each stop, in order of arrival
+        self._pending = collections.OrderedDict()
+        self._waiter = None
+        self._ended = False
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        future = self._loop.create_future()
+
+        if self._pending:
+            self._resolve(future, self._pending.popitem(last=False)[1])
+
+        elif self._ended:
+            self._resolve(future, _END)
+
+        else:
+            self._waiter = future
+
+        return future
+
+    def close(self):
+        """Unsubscribe from the hub."""
+        self._hub.unsubscribe(self)
+
+    def _push(self, update):
+        """Deliver an update from any thread (``_END`` closes it)."""
+        if self._callback is not None:
+            if update is not _END:
+                self._callback(update)
+
+        else:
+            self._loop.call_soon_threadsafe(self._receive, update)
+
+    def _receive(self, update):
+        waiter, self._waiter = self._waiter, None
+
+        if waiter is not None and not waiter.done():
+            self._resolve(waiter, update)
+
+        elif update is _END:
+            self._ended = True
+
+        else:
+            # Drop the older update of the same stop
+            if self._pending.pop(update.stop_id, None) is not None:
+                self.dropped += 1
+
+            self._pending[update.stop_id] = update
+
+    def _resolve(self, future, update):
+        if update is _END:
+            self._ended = True
+            future.set_exception(StopAsyncIteration())
+
+        else:
+            future.set_result(update)
+
+
+class ArrivalHub(object):
+    """Single poller of the arrivals of stops for many subscribers.
+
+    New subscribers of a stop that is already watched immediately receive
+    its latest update.
+
+    Callbacks are called one after the other in the polling thread, so a
+    slow callback delays the updates of the other subscribers and the next
+    polls. Consumers that may fall behind should iterate the subscription
+    asynchronously (keeping only the latest update of each stop) or hand
+    the updates to their own queue. An exception raised by a callback is
+    stored in ``last_error`` and does not affect the other subscribers.
+
+    Attributes:
+        watcher (StopWatcher): Poller of the subscribed stops.
+        last_error (Exception): Last exception raised when delivering an
+            update to a subscriber, or None.
+    """
+
+    def __init__(self, wrapper=None, watcher=None, **options):
+        """Create the hub.
+
+        Args:
+            wrapper (Wrapper): Wrapper used to perform the requests, if no
+                watcher is given.
+            watcher (StopWatcher): Optional, poller to use. Its stops are
+                managed by the hub.
+            **options: Arguments of the ``StopWatcher`` created otherwise.
+        """
+        self.watcher = watcher or StopWatcher(wrapper, **options)
+        self.watcher.add_callback(self._dispatch)
+
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._latest = {}
+
+    @property
+    def stop_count(self):
+        """Number of stops with subscribers."""
+        return len(self._subscribers)
+
+    @property
+    def subscriber_count(self):
+        """Number of subscriptions."""
+        with self._lock:
+            return len(set().union(*self._subscribers.values())) \
+                if self._subscribers else 0
+
+    def subscribe(self, stops, callback=None, loop=None):
+        """Subscribe to the arrivals of some stops.
+
+        Args:
+            stops (list[int] | int): IDs of the stops.
+            callback: Optional, function that receives each ``StopUpdate``.
+                It is called from the polling thread and blocks it, so it
+                should return quickly (e.g. by queueing the update).
+            loop: Event loop of the consumer when no callback is given (the
+                current one by default).
+
+        Returns:
+            Subscription: Subscription, which can be iterated asynchronously
+            when no callback is given.
+        """
+        if isinstance(stops, int):
+            stops = [stops]
+
+        if callback is None:
+            if asyncio is None:
+                raise ImportError(
+                    'asyncio is required for asynchronous subscriptions')
+
+            loop = loop or asyncio.get_event_loop()
+
+        subscription = Subscription(
+            self, [int(s) for s in stops], callback, loop)
+        latest = []
+
+        # The watcher is updated under the lock, so that a concurrent
+        # unsubscribe() cannot unwatch a stop that was just subscribed
+        with self._lock:
+            for stop in subscription.stops:
+                subscribers = self._subscribers.get(stop)
+
+                if subscribers is None:
+                    subscribers = self._subscribers[stop] = set()
+                    self.watcher.watch(stop)
+
+                elif stop in self._latest:
+                    latest.append(self._latest[stop])
+
+                subscribers.add(subscription)
+
+        for update in latest:
+            self._push(subscription, update)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Cancel a subscription.
+
+        Stops without other subscribers are no longer polled.
+        """
+        with self._lock:
+            for stop in subscription.stops:
+                subscribers = self._subscribers.get(stop)
+
+                if subscribers is None:
+                    continue
+
+                subscribers.discard(subscription)
+
+                if not subscribers:
+                    del self._subscribers[stop]
+                    self._latest.pop(stop, None)
+                    self.watcher.unwatch(stop)
+
+        self._push(subscription, _END)
+
+    def start(self):
+        """Start polling in a background thread."""
+        self.watcher.start()
+
+    def stop(self):
+        """Stop polling and end all the subscriptions."""
+        self.watcher.stop()
+
+        with self._lock:
+            subscriptions = set().union(*self._subscribers.values()) \
+                if self._subscribers else set()
+
+        for subscription in subscriptions:
+            self.unsubscribe(subscription)
+
+    def _dispatch(self, update):
+        """Send an update of the watcher to the subscribers of its stop."""
+        with self._lock:
+            subscribers = self._subscribers.get(update.stop_id)
+
+            if not subscribers:
+                return
+
+            if update.arrivals is not None:
+                self._latest[update.stop_id] = update
+
+            subscribers = list(subscribers)
+
+        for subscription in subscribers:
+            self._push(subscription, update)
+
+    def _push(self, subscription, update):
+        """Deliver an update to a subscriber, isolating its errors."""
+        try:
+            subscription._push(update)
+
+        except Exception as error:
+            # Failing callback or closed event loop
+            self.last_error = error
@@ -0,0 +1,969 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains in-memory spatial indexes of the network.
+
+Points are projected to meters around the mean latitude of the indexed items
+and stored in a uniform grid, so radius and nearest neighbour queries only
+look at the cells around the queried point. The error of the projection is
+negligible at the scale of a city.
+"""
+
+import datetime
+import heapq
+import math
+import threading
+import time
+
+from pyemtmad import types as emtype
+from pyemtmad import util
+from pyemtmad.geomath import METERS_PER_DEGREE, point_distance
+
+
+def _coordinates(item):
+    """Obtain the coordinates of an item, or None if they are not valid."""
+    try:
+        latitude = float(item.latitude)
+        longitude = float(item.longitude)
+
+    except (TypeError, ValueError):
+        return None
+
+    if math.isnan(latitude) or math.isnan(longitude):
+        return None
+
+    return latitude, longitude
+
+
+class _Grid(object):
+    """Uniform grid of points projected to meters.
+
+    Queries return the positions of the points in the list used to build the
+    grid, along with their distance to the queried point.
+    """
+
+    def __init__(self, points, cell_size):
+        self.cell_size = float(cell_size)
+
+        if points:
+            self._lat0 = sum(p[0] for p in points) / len(points)
+            self._lon0 = sum(p[1] for p in points) / len(points)
+
+        else:
+            self._lat0 = self._lon0 = 0.0
+
+        self._ky = METERS_PER_DEGREE
+        self._kx = METERS_PER_DEGREE * math.cos(math.radians(self._lat0))
+
+        self._x = []
+        self._y = []
+        self._cells = {}
+
+        for position, (latitude, longitude) in enumerate(points):
+            x, y = self.project(latitude, longitude)
+            self._x.append(x)
+            self._y.append(y)
+            self._cells.setdefault(self._cell(x, y), []).append(position)
+
+        if self._cells:
+            self._min_cx = min(c[0] for c in self._cells)
+            self._max_cx = max(c[0] for c in self._cells)
+            self._min_cy = min(c[1] for c in self._cells)
+            self._max_cy = max(c[1] for c in self._cells)
+
+    def project(self, latitude, longitude):
+        """Project a point to meters relative to the center of the grid."""
+        return (
+            (longitude - self._lon0) * self._kx,
+            (latitude - self._lat0) * self._ky
+        )
+
+    def _cell(self, x, y):
+        return (
+            int(math.floor(x / self.cell_size)),
+            int(math.floor(y / self.cell_size))
+        )
+
+    def within(self, latitude, longitude, radius, accept=None):
+        """Obtain the points within a radius, sorted by distance.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            radius (double): Radius (in meters) of the search.
+            accept: Optional function that receives a position and returns
+                whether the point may be included in the result.
+
+        Returns:
+            list[tuple]: ``(distance, position)`` pairs.
+        """
+        if not self._cells:
+            return []
+
+        x, y = self.project(latitude, longitude)
+        min_cx, min_cy = self._cell(x - radius, y - radius)
+        max_cx, max_cy = self._cell(x + radius, y + radius)
+
+        xs, ys, cells = self._x, self._y, self._cells
+        result = []
+
+        for cx in range(max(min_cx, self._min_cx),
+                        min(max_cx, self._max_cx) + 1):
+            for cy in range(max(min_cy, self._min_cy),
+                            min(max_cy, self._max_cy) + 1):
+                for position in cells.get((cx, cy), ()):
+                    distance = math.hypot(xs[position] - x, ys[position] - y)
+
+                    if distance <= radius and \
+                            (accept is None or accept(position)):
+                        result.append((distance, position))
+
+        result.sort()
+        return result
+
+    def nearest(self, latitude, longitude, count, accept=None):
+        """Obtain the points closest to a location, sorted by distance.
+
+        Cells are visited in rings of increasing size around the location
+        until no unvisited cell can contain a closer point.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            count (int): Maximum number of points to obtain.
+            accept: Optional function that receives a position and returns
+                whether the point may be included in the result.
+
+        Returns:
+            list[tuple]: ``(distance, position)`` pairs.
+        """
+        if not self._cells or count < 1:
+            return []
+
+        x, y = self.project(latitude, longitude)
+        cx, cy = self._cell(x, y)
+
+        max_ring = max(
+            cx - self._min_cx, self._max_cx - cx,
+            cy - self._min_cy, self._max_cy - cy)
+
+        xs, ys, cells = self._x, self._y, self._cells
+
+        # Max-heap of the best candidates so far
+        heap = []
+        ring = 0
+
+        while ring <= max_ring:
+            for cell in self._ring(cx, cy, ring):
+                for position in cells.get(cell, ()):
+                    if accept is not None and not accept(position):
+                        continue
+
+                    distance = math.hypot(xs[position] - x, ys[position] - y)
+
+                    if len(heap) < count:
+                        heapq.heappush(heap, (-distance, position))
+
+                    elif distance < -heap[0][0]:
+                        heapq.heapreplace(heap, (-distance, position))
+
+            # Points beyond this ring are at least this far away
+            if len(heap) == count and -heap[0][0] <= ring * self.cell_size:
+                break
+
+            ring += 1
+
+        return sorted((-d, position) for d, position in heap)
+
+    @staticmethod
+    def _ring(cx, cy, ring):
+        """Obtain the cells at a given Chebyshev distance of a cell."""
+        if ring == 0:
+            yield (cx, cy)
+            return
+
+        for dx in range(-ring, ring + 1):
+            yield (cx + dx, cy - ring)
+            yield (cx + dx, cy + ring)
+
+        for dy in range(-ring + 1, ring):
+            yield (cx - ring, cy + dy)
+            yield (cx + ring, cy + dy)
+
+
+class StopIndex(object):
+    """Spatial index of the stops of the network.
+
+    Answers the same questions as ``get_stops_from_xy`` and
+    ``get_stops_from_stop`` without performing any request. An index can be
+    assigned to the ``stop_index`` attribute of ``GeoApi`` for these methods
+    to use it.
+    """
+
+    def __init__(self, stops, cell_size=250):
+        """Build the index.
+
+        Args:
+            stops (list[Stop]): Stops to index. If a stop appears more than
+                once (e.g. in the responses of several lines), only the
+                first one is kept. Stops without coordinates are ignored.
+            cell_size (int): Size (in meters) of the cells of the grid.
+        """
+        self._stops = []
+        self._by_id = {}
+        points = []
+
+        for stop in stops:
+            point = _coordinates(stop)
+
+            if point is None or stop.id in self._by_id:
+                continue
+
+            self._by_id[stop.id] = stop
+            self._stops.append(stop)
+            points.append(point)
+
+        self._grid = _Grid(points, cell_size)
+
+    def __len__(self):
+        return len(self._stops)
+
+    def __contains__(self, stop_id):
+        return self.get(stop_id) is not None
+
+    @classmethod
+    def from_nodes(cls, nodes, cell_size=250):
+        """Build the index from the nodes of the network.
+
+        The ``Stop`` objects obtained have no address, as it is not included
+        in the nodes response, and their ``lines`` only have the line number
+        and direction.
+
+        Args:
+            nodes (list): ``NodeLinesItem`` objects or raw items of a
+                ``get_nodes_lines`` response.
+            cell_size (int): Size (in meters) of the cells of the grid.
+
+        Returns:
+            StopIndex: Index of the nodes.
+        """
+        stops = []
+        headers = dict((v, k) for k, v in emtype.HEADER_DIRECTIONS.items())
+
+        for node in nodes:
+            if not isinstance(node, emtype.NodeLinesItem):
+                node = emtype.NodeLinesItem.from_json(node)
+
+            value = node._json
+            stops.append(emtype.Stop.from_json({
+                'stopId': value.get('node'),
+                'name': value.get('name'),
+                'latitude': value.get('latitude'),
+                'longitude': value.get('longitude'),
+                'line': [
+                    {'name': line, 'direction': headers[direction]}
+                    for line, direction in node.lines
+                ]
+            }))
+
+        return cls(stops, cell_size)
+
+    @classmethod
+    def load(cls, wrapper, cell_size=250):
+        """Build the index of all the stops of the network.
+
+        This performs a single ``get_nodes_lines`` request.
+
+        Args:
+            wrapper (Wrapper): Object that performs the requests to endpoints.
+            cell_size (int): Size (in meters) of the cells of the grid.
+
+        Returns:
+            StopIndex: Index of the stops.
+
+        Raises:
+            RuntimeError: If the API returned an error.
+        """
+        result = wrapper.request_openbus('bus', 'get_nodes_lines', Nodes='')
+
+        if not util.check_result(result):
+            raise RuntimeError('get_nodes_lines: %s' % (
+                result.get('resultDescription', 'UNKNOWN ERROR')))
+
+        values = util.response_list(result, 'resultValues') or []
+        return cls.from_nodes(values, cell_size)
+
+    def get(self, stop_id):
+        """Obtain a stop by its ID.
+
+        Args:
+            stop_id (int): ID of the stop.
+
+        Returns:
+            Stop: The stop, or None if it is not indexed.
+        """
+        try:
+            return self._by_id.get(int(stop_id))
+
+        except (TypeError, ValueError):
+            return None
+
+    def within(self, latitude, longitude, radius):
+        """Obtain the stops within a radius of a point.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            radius (int): Radius (in meters) of the search.
+
+        Returns:
+            list[Stop]: Stops sorted by distance to the point.
+        """
+        return [
+            self._stops[p]
+            for _, p in self._grid.within(latitude, longitude, radius)
+        ]
+
+    def nearest(self, latitude, longitude, count=1):
+        """Obtain the stops closest to a point.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            count (int): Number of stops to obtain.
+
+        Returns:
+            list[Stop]: Stops sorted by distance to the point.
+        """
+        return [
+            self._stops[p]
+            for _, p in self._grid.nearest(latitude, longitude, count)
+        ]
+
+
+class PoiIndex(object):
+    """Spatial index of points of interest, grouped by type.
+
+    The index can be bulk-loaded from wide-radius ``get_poi`` requests (one
+    per type) with ``load()``. Such an index remembers how it was loaded and,
+    if ``max_age`` is set, starts a background re-sync when a query finds its
+    data stale. Queries keep using the previous data until the new data is
+    ready, and the previous data is kept if the re-sync fails.
+
+    An index can be assigned to the ``poi_index`` attribute of ``GeoApi`` for
+    ``get_poi`` to use it.
+
+    Attributes:
+        max_age (int): Seconds after which the data is considered stale, or
+            None to never re-sync automatically.
+        loaded_at (float): Timestamp of the last successful load.
+        last_error (Exception): Error of the last failed background re-sync,
+            if any.
+    """
+
+    def __init__(self, pois=(), cell_size=250, max_age=None):
+        """Build the index.
+
+        Args:
+            pois (list[Poi]): POIs to index. Duplicates (same type and ID) and
+                POIs without coordinates are ignored.
+            cell_size (int): Size (in meters) of the cells of the grid.
+            max_age (int): Seconds after which the data is considered stale.
+        """
+        self.cell_size = cell_size
+        self.max_age = max_age
+        self.last_error = None
+
+        self._source = None
+        self._sync_thread = None
+        self._lock = threading.Lock()
+
+        self._set(pois)
+
+    def __len__(self):
+        return len(self._state[0])
+
+    @classmethod
+    def load(cls, wrapper, latitude, longitude, radius, types=None,
+             lang='', cell_size=250, max_age=3600):
+        """Build the index with the POIs around a point.
+
+        A ``get_poi`` request is performed for each type.
+
+        Args:
+            wrapper (Wrapper): Object that performs the requests to endpoints.
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            radius (int): Radius (in meters) of the area to load.
+            types (list[int]): POI types to load (see ``POI_TYPES``), or None
+                to load all of them.
+            lang (str): Language code (*es* or *en*).
+            cell_size (int): Size (in meters) of the cells of the grid.
+            max_age (int): Seconds after which the data is re-synced in the
+                background, or None to disable it.
+
+        Returns:
+            PoiIndex: Index of the POIs.
+
+        Raises:
+            RuntimeError: If the API returned an error.
+        """
+        index = cls(cell_size=cell_size, max_age=max_age)
+
+        if types is None:
+            types = sorted(emtype.POI_TYPES)
+
+        index._source = (
+            wrapper, latitude, longitude, radius, list(types), lang)
+        index.sync()
+
+        return index
+
+    def sync(self):
+        """Load the POIs again with the requests used in ``load()``.
+
+        Raises:
+            RuntimeError: If the API returned an error.
+            ValueError: If the index was not built with ``load()``.
+        """
+        if self._source is None:
+            raise ValueError('The index was not built with load()')
+
+        wrapper, latitude, longitude, radius, types, lang = self._source
+        pois = []
+
+        for poi_type in types:
+            result = wrapper.request_openbus(
+                'geo', 'get_poi',
+                coordinateX=longitude,
+                coordinateY=latitude,
+                tipos=util.ints_to_string(poi_type),
+                Radius=radius,
+                cultureInfo=util.language_code(lang))
+
+            # No status code, as in GeoApi.get_poi()
+            if not util.check_result(result, 'poiList'):
+                raise RuntimeError('get_poi: UNKNOWN ERROR')
+
+            values = util.response_list(result, 'poiList') or []
+            pois.extend(emtype.Poi.from_json(v) for v in values)
+
+        self._set(pois)
+
+    def is_stale(self):
+        """Check whether the data is older than ``max_age``."""
+        return self.max_age is not None \
+            and time.time() - self.loaded_at > self.max_age
+
+    def covers(self, latitude, longitude, radius, types=None, lang=''):
+        """Check whether a search can be answered with the loaded data.
+
+        An index built with ``load()`` covers the searches whose circle is
+        inside the loaded one, in the loaded language and for loaded types.
+        An index built from a list of POIs covers any search.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            radius (int): Radius (in meters) of the search.
+            types (list[int] | int): POI types of the search, or None (or an
+                empty list) for all of them.
+            lang (str): Language code (*es* or *en*).
+
+        Returns:
+            bool: Whether or not the index has all the POIs of the search.
+        """
+        if self._source is None:
+            return True
+
+        _, loaded_lat, loaded_lon, loaded_radius, loaded_types, loaded_lang = \
+            self._source
+
+        if util.language_code(lang) != util.language_code(loaded_lang):
+            return False
+
+        if not types:
+            types = emtype.POI_TYPES
+
+        elif not isinstance(types, (list, tuple, set)):
+            types = [types]
+
+        if not set(int(t) for t in types).issubset(loaded_types):
+            return False
+
+        return point_distance(latitude, longitude, loaded_lat, loaded_lon) \
+            + radius <= loaded_radius
+
+    def within(self, latitude, longitude, radius, types=None):
+        """Obtain the POIs within a radius of a point.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            radius (int): Radius (in meters) of the search.
+            types (list[int] | int): POI types to include, or None (or an
+                empty list) to include all of them.
+
+        Returns:
+            list[Poi]: POIs sorted by distance to the point.
+        """
+        return self._query(
+            lambda grid: grid.within(latitude, longitude, radius), types)
+
+    def nearest(self, latitude, longitude, count=1, types=None):
+        """Obtain the POIs closest to a point.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            count (int): Number of POIs to obtain.
+            types (list[int] | int): POI types to include, or None (or an
+                empty list) to include all of them.
+
+        Returns:
+            list[Poi]: POIs sorted by distance to the point.
+        """
+        return self._query(
+            lambda grid: grid.nearest(latitude, longitude, count),
+            types)[:count]
+
+    def _query(self, search, types):
+        """Perform a search in the grid of each of the requested types."""
+        self._check_freshness()
+        pois, grid, by_type = self._state
+
+        if not types:
+            return [pois[p] for _, p in search(grid)]
+
+        if not isinstance(types, (list, tuple, set)):
+            types = [types]
+
+        found = []
+        for poi_type in set(int(t) for t in types):
+            if poi_type in by_type:
+                type_pois, type_grid = by_type[poi_type]
+                found.extend(
+                    (d, type_pois[p]) for d, p in search(type_grid))
+
+        found.sort(key=lambda f: f[0])
+        return [poi for _, poi in found]
+
+    def _set(self, pois):
+        """Replace the indexed POIs."""
+        indexed = []
+        seen = set()
+        points = []
+        grouped = {}
+
+        for poi in pois:
+            point = _coordinates(poi)
+            key = (poi.type_id, poi.id)
+
+            if point is None or key in seen:
+                continue
+
+            seen.add(key)
+            indexed.append(poi)
+            points.append(point)
+            grouped.setdefault(poi.type_id, ([], []))
+            grouped[poi.type_id][0].append(poi)
+            grouped[poi.type_id][1].append(point)
+
+        by_type = dict(
+            (poi_type, (type_pois, _Grid(type_points, self.cell_size)))
+            for poi_type, (type_pois, type_points) in grouped.items())
+
+        # Replaced at once, so that queries never see a partial update
+        self._state = (indexed, _Grid(points, self.cell_size), by_type)
+        self.loaded_at = time.time()
+
+    def _check_freshness(self):
+        """Start a background re-sync if the data is stale."""
+        if self._source is None or not self.is_stale():
+            return
+
+        with self._lock:
+            if self._sync_thread is not None and self._sync_thread.is_alive():
+                return
+
+            self._sync_thread = threading.Thread(target=self._background_sync)
+            self._sync_thread.daemon = True
+            self._sync_thread.start()
+
+    def _background_sync(self):
+        try:
+            self.sync()
+            self.last_error = None
+
+        except Exception as error:
+            # Keep the previous data, retry after max_age
+            self.last_error = error
+            self.loaded_at = time.time()
+
+
+class ParkingIndex(object):
+    """Spatial index of parkings and their free spaces.
+
+    Parkings are indexed once (e.g. from ``list_parking``) and their details
+    and occupation are updated separately, so that the free spaces can be
+    refreshed as often as needed without rebuilding the index.
+
+    Parkings are identified by their family and ID.
+
+    Attributes:
+        errors (dict): Error of each parking, by (family, ID), whose details
+            could not be obtained in the last ``refresh()``.
+    """
+
+    def __init__(self, parkings, cell_size=250):
+        """Build the index.
+
+        Args:
+            parkings (list): ``Parking`` or ``ParkingDetails`` objects.
+                Duplicates and parkings without coordinates are ignored.
+                ``ParkingDetails`` objects also set the details of the parking.
+            cell_size (int): Size (in meters) of the cells of the grid.
+        """
+        self._parkings = []
+        self._positions = {}
+        points = []
+
+        for parking in parkings:
+            point = _coordinates(parking)
+            key = self._key(parking.family, parking.id)
+
+            if point is None or key in self._positions:
+                continue
+
+            self._positions[key] = len(self._parkings)
+            self._parkings.append(parking)
+            points.append(point)
+
+        self._grid = _Grid(points, cell_size)
+
+        # Details and free spaces by slot type of each parking
+        self._details = [None] * len(self._parkings)
+        self._free = [None] * len(self._parkings)
+        self.errors = {}
+
+        for parking in self._parkings:
+            if isinstance(parking, emtype.ParkingDetails):
+                self.update(parking)
+
+    def __len__(self):
+        return len(self._parkings)
+
+    @staticmethod
+    def _key(family, parking_id):
+        return (family, str(parking_id))
+
+    @classmethod
+    def load(cls, wrapper, lang='', cell_size=250):
+        """Build the index with all the parkings and their occupation.
+
+        This performs a ``list_parking`` request and a ``detail_parking``
+        request for each parking.
+
+        Args:
+            wrapper (Wrapper): Object that performs the requests to endpoints.
+            lang (str): Language code (*es* or *en*).
+            cell_size (int): Size (in meters) of the cells of the grid.
+
+        Returns:
+            ParkingIndex: Index of the parkings.
+
+        Raises:
+            RuntimeError: If the API returned an error.
+        """
+        result = wrapper.request_parking(
+            'list_parking', {'lang': util.language_code(lang)})
+
+        if not util.check_result(result):
+            raise RuntimeError('list_parking: %s' % (
+                result.get('message', 'UNKNOWN ERROR')))
+
+        values = util.response_list(result, 'Data') or []
+        index = cls([emtype.Parking.from_json(v) for v in values], cell_size)
+        index.refresh(wrapper, lang)
+
+        return index
+
+    def refresh(self, wrapper, lang='', moment=None):
+        """Update the details and occupation of all the parkings.
+
+        This performs a ``detail_parking`` request for each parking. A
+        failed request does not stop the refresh: the parking keeps its
+        previous details and its error is stored in ``errors``.
+
+        Args:
+            wrapper (Wrapper): Object that performs the requests to endpoints.
+            lang (str): Language code (*es* or *en*).
+            moment (datetime): Moment of the occupation to obtain, defaults to
+                the current time.
+
+        Returns:
+            int: Number of parkings updated.
+        """
+        if moment is None:
+            moment = datetime.datetime.now()
+
+        date = util.datetime_string(
+            moment.day, moment.month, moment.year, moment.hour, moment.minute)
+
+        errors = {}
+        updated = 0
+
+        for parking in list(self._parkings):
+            key = self._key(parking.family, parking.id)
+
+            try:
+                result = wrapper.request_parking(
+                    'detail_parking', {},
+                    language=util.language_code(lang),
+                    publicData=True,
+                    date=date,
+                    id=parking.id,
+                    family=parking.family)
+
+                if not util.check_result(result):
+                    raise RuntimeError('detail_parking: %s' % (
+                        result.get('message', 'UNKNOWN ERROR')))
+
+                details = [
+                    emtype.ParkingDetails.from_json(v)
+                    for v in util.response_list(result, 'Data') or []
+                ]
+
+            except Exception as error:
+                errors[key] = error
+                continue
+
+            for parking_details in details:
+                if self.update(parking_details):
+                    updated += 1
+
+        self.errors = errors
+        return updated
+
+    def update(self, details):
+        """Set the details and occupation of an indexed parking.
+
+        Args:
+            details (ParkingDetails): Details of the parking, as obtained from
+                ``detail_parking``.
+
+        Returns:
+            bool: Whether or not the parking is indexed.
+        """
+        position = self._positions.get(self._key(details.family, details.id))
+
+        if position is None:
+            return False
+
+        self._details[position] = details
+        self.update_occupation(
+            details.family, details.id, details.occupation or [])
+
+        return True
+
+    def update_occupation(self, family, parking_id, occupation):
+        """Set the free spaces of an indexed parking.
+
+        Args:
+            family (str): Family of the parking.
+            parking_id (int): ID of the parking.
+            occupation (list[ParkingOccupation]): Occupation of each type of
+                slot.
+
+        Returns:
+            bool: Whether or not the parking is indexed.
+        """
+        position = self._positions.get(self._key(family, parking_id))
+
+        if position is None:
+            return False
+
+        total = 0
+        free = {}
+
+        for slot in occupation:
+            try:
+                spaces = int(slot.free)
+
+            except (TypeError, ValueError):
+                continue
+
+            total += spaces
+
+            # Slot types can be queried by name or by code
+            for name in set((slot.type, slot.code)):
+                if name is not None:
+                    free[name] = free.get(name, 0) + spaces
+
+        # Replaced at once, so that queries never see a partial update
+        self._free[position] = (total, free)
+        return True
+
+    def details(self, family, parking_id):
+        """Obtain the details of a parking.
+
+        Returns:
+            ParkingDetails: Details of the parking, or None if they have not
+            been obtained yet or the parking is not indexed.
+        """
+        position = self._positions.get(self._key(family, parking_id))
+        return None if position is None else self._details[position]
+
+    def free_spaces(self, family, parking_id, slot_type=None):
+        """Obtain the number of free spaces of a parking.
+
+        Args:
+            family (str): Family of the parking.
+            parking_id (int): ID of the parking.
+            slot_type (str): Name or code of the type of slot, or None to
+                count all the types.
+
+        Returns:
+            int: Free spaces, or None if the occupation is not known.
+        """
+        position = self._positions.get(self._key(family, parking_id))
+
+        if position is None or self._free[position] is None:
+            return None
+
+        return self._count_free(self._free[position], slot_type)
+
+    def within(self, latitude, longitude, radius, min_free=0,
+               slot_type=None, types=None, families=None, features=None):
+        """Obtain the parkings within a radius of a point.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            radius (int): Radius (in meters) of the search.
+            min_free (int): Minimum number of free spaces.
+            slot_type (str): Name or code of the type of slot to count, or
+                None to count all the types.
+            types (list[str]): Parking types (name or code) to accept, or
+                None to accept all of them.
+            families (list[str]): Families (name or code) to accept, or None
+                to accept all of them.
+            features (list[str]): Features (name or code) that the parkings
+                must have. Parkings without details are not accepted.
+
+        Returns:
+            list: Parkings sorted by distance to the point.
+        """
+        found = self._grid.within(
+            latitude, longitude, radius,
+            self._accept(min_free, slot_type, types, families, features))
+
+        return [self._parkings[p] for _, p in found]
+
+    def nearest(self, latitude, longitude, count=1, min_free=0,
+                slot_type=None, types=None, families=None, features=None):
+        """Obtain the parkings closest to a point with enough free spaces.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            count (int): Number of parkings to obtain.
+            min_free (int): Minimum number of free spaces.
+            slot_type (str): Name or code of the type of slot to count, or
+                None to count all the types.
+            types (list[str]): Parking types (name or code) to accept, or
+                None to accept all of them.
+            families (list[str]): Families (name or code) to accept, or None
+                to accept all of them.
+            features (list[str]): Features (name or code) that the parkings
+                must have. Parkings without details are not accepted.
+
+        Returns:
+            list: Parkings sorted by distance to the point.
+        """
+        found = self._grid.nearest(
+            latitude, longitude, count,
+            self._accept(min_free, slot_type, types, families, features))
+
+        return [self._parkings[p] for _, p in found]
+
+    def _accept(self, min_free, slot_type, types=None, families=None,
+                features=None):
+        """Obtain the filter of parkings matching the search."""
+        checks = []
+
+        if min_free > 0:
+            free = self._free
+            count_free = self._count_free
+
+            checks.append(
+                lambda p: count_free(free[p], slot_type) >= min_free)
+
+        if types is not None:
+            types = set(types)
+            checks.append(lambda p: bool(self._types(p) & types))
+
+        if families is not None:
+            families = set(families)
+            checks.append(lambda p: bool(families.intersection((
+                self._parkings[p].family,
+                getattr(self._parkings[p], 'family_code', None)))))
+
+        if features:
+            features = set(features)
+            checks.append(lambda p: features <= self._features(p))
+
+        if not checks:
+            return None
+
+        return lambda p: all(check(p) for check in checks)
+
+    def _types(self, position):
+        """Obtain the names and codes of the type of a parking."""
+        parking = self._parkings[position]
+        details = self._details[position]
+        names = set((parking.type, getattr(parking, 'type_code', None)))
+
+        if details is not None:
+            names.update((details.type, details.type_code))
+
+        return names
+
+    def _features(self, position):
+        """Obtain the names and codes of the features of a parking."""
+        details = self._details[position]
+
+        if details is None:
+            return set()
+
+        names = set()
+
+        for feature in details.features or []:
+            names.update((feature.name, feature.code))
+
+        return names
+
+    @staticmethod
+    def _count_free(free, slot_type):
+        if free is None:
+            return 0
+
+        if slot_type is None:
+            return free[0]
+
+        return free[1].get(slot_type, 0)
@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains an offline journey planner for the bus network.
+
+Trips of each route are stored as a matrix of stop times (one row per trip,
+one column per stop of the route) and journeys are searched with RAPTOR, a
+round-based algorithm in which round *k* finds the earliest arrival at every
+stop using *k* buses.
+
+The API does not provide the time at which each trip passes each stop, so the
+times between the first and last stop are interpolated with the distance
+along the route. Times are seconds since the midnight of the service day.
+NumPy is required.
+"""
+
+import datetime
+
+from pyemtmad.graph import DIRECTION_NAMES
+from pyemtmad.util import np, require_numpy
+
+# Arrival time of unreached stops
+_NEVER = 1 << 30
+
+
+def _seconds(value, day=None):
+    """Convert a time of the service day to seconds since its midnight.
+
+    Dates and times are measured from the midnight of ``day`` (their own date
+    by default), so times on the next date are 24:00 or later.
+    """
+    if isinstance(value, datetime.timedelta):
+        return int(value.total_seconds())
+
+    if isinstance(value, datetime.datetime):
+        midnight = datetime.datetime.combine(
+            day or value.date(), datetime.time())
+        return int((value - midnight).total_seconds())
+
+    if isinstance(value, datetime.time):
+        return value.hour * 3600 + value.minute * 60 + value.second
+
+    return int(value)
+
+
+class Timetable(object):
+    """Trips of each route of a ``TransitGraph``.
+
+    Attributes:
+        graph (TransitGraph): Graph of the network.
+        stop_times (list[numpy.ndarray]): Matrix of stop times of each route,
+            with trips sorted by departure.
+
+    Trips of a route are assumed not to overtake each other, which is always
+    the case when they take the same time to complete the route.
+    """
+
+    def __init__(self, graph):
+        require_numpy('the journey planner')
+
+        self.graph = graph
+        self._trips = [[] for _ in range(graph.route_count)]
+        self.stop_times = None
+
+    @classmethod
+    def from_timetable(cls, graph, items, date=None, day_type=None):
+        """Build the timetable from a ``get_timetable_lines`` response.
+
+        Each item is a trip that leaves the first stop of the route at its
+        start time and reaches the last stop at its end time. Times past
+        midnight keep their day offset (e.g. *25:10* is 90600 seconds), and
+        items that end before they start are ignored.
+
+        Args:
+            graph (TransitGraph): Graph of the network.
+            items (list[TimetableLinesItem]): Trips of the lines.
+            date (datetime.date): Optional, only use the items of this date.
+            day_type (str): Optional, only use the items of this day type
+                (e.g. *Labour*).
+
+        Returns:
+            Timetable: Trips of the routes.
+        """
+        timetable = cls(graph)
+
+        for item in items:
+            if date is not None and item.date != date:
+                continue
+
+            if day_type is not None and item.day_type != day_type:
+                continue
+
+            if item.start_time is None or item.end_time is None:
+                continue
+
+            start = _seconds(item.start_time)
+            end = _seconds(item.end_time)
+
+            if end < start:
+                continue
+
+            timetable.add_trip(item.line, item.direction, start, end)
+
+        return timetable.freeze()
+
+    @classmethod
+    def from_times(cls, graph, items, headway=600, speed=4.0, day_type=None):
+        """Build the timetable from a ``get_times_lines`` response.
+
+        Only the first and last bus of each line are known, so trips are
+        generated every ``headway`` seconds between them, with a travel time
+        obtained from the length of the route. Times are measured from the
+        midnight of the date of the first bus, so a last bus on the next date
+        runs past 24:00. Directions whose last bus is before the first one
+        are ignored.
+
+        Args:
+            graph (TransitGraph): Graph of the network.
+            items (list[TimesLinesItem]): First and last bus of the lines.
+            headway (int | dict): Seconds between buses, or a dict with the
+                headway of each line number.
+            speed (double): Average speed of the buses in meters per second.
+            day_type (str): Optional, only use the items of this day type.
+
+        Returns:
+            Timetable: Trips of the routes.
+        """
+        timetable = cls(graph)
+
+        for item in items:
+            if day_type is not None and item.day_type != day_type:
+                continue
+
+            line_headway = headway.get(item.line, 600) \
+                if isinstance(headway, dict) else headway
+
+            for direction, first, last in (
+                    ('forward', item.first_forward, item.last_forward),
+                    ('backward', item.first_backward, item.last_backward)):
+                route = graph.route_index(item.line, direction)
+
+                if route is None or first is None or last is None:
+                    continue
+
+                distance = graph.route_distance[
+                    graph.route_offsets[route + 1] - 1] \
+                    - graph.route_distance[graph.route_offsets[route]]
+                duration = int(distance / speed)
+
+                day = first.date() \
+                    if isinstance(first, datetime.datetime) else None
+                start = _seconds(first, day)
+                end = _seconds(last, day)
+
+                if end < start:
+                    continue
+
+                for departure in range(start, end + 1, int(line_headway)):
+                    timetable.add_trip(
+                        item.line, direction, departure, departure + duration)
+
+        return timetable.freeze()
+
+    def add_trip(self, line, direction, start, end):
+        """Add a trip to the timetable.
+
+        Must be called before ``freeze()``.
+
+        Args:
+            line (int): Line number.
+            direction (str | int): *forward* or *backward*, or their codes
+                (1 and 2).
+            start (int): Departure from the first stop, in seconds since the
+                midnight of the service day.
+            end (int): Arrival at the last stop, in seconds since the
+                midnight of the service day (past 86400 after midnight).
+
+        Returns:
+            bool: Whether or not the route of the trip is in the graph.
+
+        Raises:
+            ValueError: If the trip ends before it starts.
+        """
+        if end < start:
+            raise ValueError('The trip ends before it starts')
+
+        if not isinstance(direction, str):
+            direction = DIRECTION_NAMES.get(direction)
+
+        route = self.graph.route_index(line, direction)
+
+        if route is None:
+            return False
+
+        self._trips[route].append((start, end))
+        return True
+
+    def freeze(self):
+        """Build the stop time matrices from the added trips.
+
+        Returns:
+            Timetable: This timetable.
+        """
+        graph = self.graph
+        self.stop_times = []
+
+        for route, trips in enumerate(self._trips):
+            start, end = graph.route_offsets[route:route + 2]
+            distance = graph.route_distance[start:end]
+            stops = end - start
+
+            # Fraction of the trip at each stop
+            length = distance[-1] - distance[0] if stops else 0
+            if length > 0:
+                fraction = (distance - distance[0]) / length
+
+            else:
+                fraction = np.linspace(0, 1, stops)
+
+            trips = np.array(sorted(trips), dtype=np.float64).reshape(-1, 2)
+            times = trips[:, :1] + (trips[:, 1:] - trips[:, :1]) * fraction
+
+            self.stop_times.append(np.round(times).astype(np.int32))
+
+        return self
+
+    @property
+    def trip_count(self):
+        """Number of trips in the timetable."""
+        return sum(len(t) for t in self.stop_times)
+
+
+class Leg(object):
+    """Part of a journey.
+
+    Attributes:
+        mode (str): *bus* or *walk*.
+        line (int): Line number, None when walking.
+        direction (str): *forward* or *backward*, None when walking.
+        from_stop (int): ID of the stop in which the leg starts.
+        to_stop (int): ID of the stop in which the leg ends.
+        departure (int): Departure time in seconds since midnight.
+        arrival (int): Arrival time in seconds since midnight.
+    """
+
+    def __init__(self, mode, line, direction, from_stop, to_stop, departure,
+                 arrival):
+        self.mode = mode
+        self.line = line
+        self.direction = direction
+        self.from_stop = from_stop
+        self.to_stop = to_stop
+        self.departure = departure
+        self.arrival = arrival
+
+    def __repr__(self):
+        return '<Leg %s %s %s->%s %d-%d>' % (
+            self.mode, self.line, self.from_stop, self.to_stop,
+            self.departure, self.arrival)
+
+
+class Journey(object):
+    """Result of a search.
+
+    Attributes:
+        legs (list[Leg]): Legs of the journey, in order.
+        departure (int): Requested departure time in seconds since midnight.
+        arrival (int): Arrival time in seconds since midnight.
+    """
+
+    def __init__(self, legs, departure, arrival):
+        self.legs = legs
+        self.departure = departure
+        self.arrival = arrival
+
+    @property
+    def transfers(self):
+        """Number of changes of bus."""
+        return max(0, sum(1 for l in self.legs if l.mode == 'bus') - 1)
+
+    @property
+    def duration(self):
+        """Seconds from the requested departure to the arrival."""
+        return self.arrival - self.departure
+
+
+class Planner(object):
+    """Earliest arrival journey planner.
+
+    Attributes:
+        timetable (Timetable): Trips of the network.
+        footpaths: Optional walking transfers between stops. An object with
+            CSR arrays ``offsets``, ``targets`` and ``durations`` (seconds)
+            indexed by the stop indexes of the graph.
+        min_transfer (int): Seconds needed to change bus at the same stop.
+    """
+
+    def __init__(self, timetable, footpaths=None, min_transfer=0):
+        self.timetable = timetable
+        self.graph = timetable.graph
+        self.footpaths = footpaths
+        self.min_transfer = min_transfer
+
+    def plan(self, origin, destination, departure, max_transfers=3):
+        """Find the journey that arrives earliest at a stop.
+
+        Args:
+            origin (int): ID of the departure stop.
+            destination (int): ID of the arrival stop.
+            departure: Departure time, as seconds since the midnight of the
+                service day, ``datetime.timedelta`` or ``datetime.time``.
+                Times after midnight are 24:00 or later.
+            max_transfers (int): Maximum number of changes of bus.
+
+        Returns:
+            Journey: Fastest journey (with the fewest transfers among the
+            fastest ones), or None if the destination cannot be reached.
+        """
+        graph = self.graph
+        source = graph.stop_index(origin)
+        target = graph.stop_index(destination)
+
+        if source is None or target is None:
+            return None
+
+        departure = _seconds(departure)
+
+        if source == target:
+            return Journey([], departure, departure)
+
+        count = graph.stop_count
+        best = [_NEVER] * count
+        labels = [[_NEVER] * count]
+        parents = [{}]
+
+        best[source] = labels[0][source] = departure
+        marked = set([source])
+        marked |= self._walk(labels[0], best, parents[0], marked, target)
+
+        for round_number in range(max_transfers + 1):
+            previous = labels[-1]
+            current = list(previous)
+            parent = {}
+
+            # No transfer time is needed to board the first bus
+            transfer = self.min_transfer if round_number else 0
+
+            marked = self._scan_routes(
+                self._queue(marked), previous, current, best, parent, target,
+                transfer)
+            marked |= self._walk(current, best, parent, marked, target)
+
+            labels.append(current)
+            parents.append(parent)
+
+            if not marked:
+                break
+
+        return self._journey(labels, parents, source, target, departure)
+
+    def _queue(self, marked):
+        """Obtain the earliest marked position of each route."""
+        graph = self.graph
+        offsets = graph.stop_route_offsets
+        routes = graph.stop_routes
+        positions = graph.stop_route_positions
+        queue = {}
+
+        for stop in marked:
+            for i in range(offsets[stop], offsets[stop + 1]):
+                route = int(routes[i])
+                position = int(positions[i])
+
+                if position < queue.get(route, _NEVER):
+                    queue[route] = position
+
+        return queue
+
+    def _scan_routes(self, queue, previous, current, best, parent, target,
+                     transfer):
+        """Ride each queued route from its earliest marked stop."""
+        graph = self.graph
+        stop_times = self.timetable.stop_times
+        marked = set()
+
+        for route, first in queue.items():
+            times = stop_times[route]
+
+            if not len(times):
+                continue
+
+            stops = graph.route_stop_indexes(route).tolist()
+            trip = None
+            trip_times = None
+            board = None
+
+            for position in range(first, len(stops)):
+                stop = stops[position]
+
+                # Alight, unless it does not improve the arrival at the stop
+                # or at the destination
+                if trip is not None:
+                    arrival = trip_times[position]
+
+                    if arrival < best[stop] and arrival < best[target]:
+                        current[stop] = best[stop] = arrival
+                        parent[stop] = (route, trip, board, position)
+                        marked.add(stop)
+
+                # Switch to an earlier trip if the stop was reached before
+                ready = previous[stop]
+                if ready >= _NEVER:
+                    continue
+
+                ready += transfer
+                if trip is not None and ready >= trip_times[position]:
+                    continue
+
+                earliest = int(np.searchsorted(times[:, position], ready))
+
+                if earliest < len(times) and (
+                        trip is None or earliest < trip):
+                    trip = earliest
+                    trip_times = times[trip].tolist()
+                    board = position
+
+        return marked
+
+    def _walk(self, labels, best, parent, marked, target):
+        """Relax the walking transfers from the marked stops."""
+        footpaths = self.footpaths
+        reached = set()
+
+        if footpaths is None:
+            return reached
+
+        offsets = footpaths.offsets
+        targets = footpaths.targets
+        durations = footpaths.durations
+
+        for stop in list(marked):
+            start = labels[stop]
+
+            for i in range(offsets[stop], offsets[stop + 1]):
+                other = int(targets[i])
+                arrival = start + int(durations[i])
+
+                if arrival < best[other] and arrival < best[target]:
+                    labels[other] = best[other] = arrival
+                    parent[other] = ('walk', stop)
+                    reached.add(other)
+
+        return reached
+
+    def _journey(self, labels, parents, source, target, departure):
+        """Rebuild the fastest journey from the labels of each round."""
+        graph = self.graph
+        arrivals = [round_labels[target] for round_labels in labels]
+        arrival = min(arrivals)
+
+        if arrival >= _NEVER:
+            return None
+
+        # Fewest rounds among the earliest arrivals
+        round_number = arrivals.index(arrival)
+        stop = target
+        legs = []
+
+        while stop != source:
+            entry = parents[round_number].get(stop)
+
+            if entry is None:
+                # Reached in a previous round
+                round_number -= 1
+                continue
+
+            if entry[0] == 'walk':
+                origin = entry[1]
+                legs.append(Leg(
+                    'walk', None, None,
+                    int(graph.stop_ids[origin]), int(graph.stop_ids[stop]),
+                    labels[round_number][origin], labels[round_number][stop]))
+                stop = origin
+                continue
+
+            route, trip, board, alight = entry
+            times = self.timetable.stop_times[route][trip]
+            stops = graph.route_stop_indexes(route)
+
+            legs.append(Leg(
+                'bus', int(graph.line_ids[graph.route_line[route]]),
+                DIRECTION_NAMES[int(graph.route_direction[route])],
+                int(graph.stop_ids[stops[board]]), int(graph.stop_ids[stop]),
+                int(times[board]), int(times[alight])))
+
+            stop = int(stops[board])
+            round_number -= 1
+
+        legs.reverse()
+        return Journey(legs, departure, arrival)
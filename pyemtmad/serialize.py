@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+
+"""This file contains a compact binary format for the parsed types.
+
+Items are grouped by type and stored column by column: the parsed value of
+each attribute and the original API response (``_json``). Loading assigns
+the stored values to new instances, so no response is parsed again. The
+columns are encoded as JSON and compressed with zlib, which keeps both ends
+in C code and repeated names small.
+
+The format is::
+
+    MAGIC VERSION | zlib(JSON document)
+
+Values that JSON does not support (dates, times and tuples) are converted
+column by column. Items whose parser changed since the data was stored (the
+field spec of their type is different) and types with nested items are
+parsed again from their response, so stored data survives library upgrades.
+"""
+
+import datetime
+import hashlib
+import json
+import operator
+import struct
+import zlib
+
+import six
+
+from pyemtmad import types as emtype
+
+MAGIC = b'EMT'
+FORMAT_VERSION = 1
+
+# Reference of the stored dates and times
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+# Types stored as they are in JSON
+_JSON_TYPES = (type(None), bool, float) + six.integer_types \
+    + six.string_types + (six.text_type,)
+
+# Types whose elements are compared when sharing columns
+_CONTAINERS = frozenset((list, tuple, dict))
+
+# Kinds of stored attribute values, see ``_kind()``
+_KINDS = ('value', 'tuples', 'date', 'datetime', 'timedelta')
+
+# Functions that build the items of each layout, see ``_builder()``
+_BUILDERS = {}
+
+
+def to_bytes(item):
+    """Serialize a single parsed item.
+
+    Args:
+        item: Object of one of the types in ``pyemtmad.types``.
+
+    Returns:
+        bytes: Serialized item.
+    """
+    return dumps([item])
+
+def from_bytes(data):
+    """Deserialize a single parsed item.
+
+    Args:
+        data (bytes): Data obtained from ``to_bytes()``.
+
+    Returns:
+        Parsed item.
+
+    Raises:
+        ValueError: If the data is not valid or does not contain one item.
+    """
+    items = loads(data)
+
+    if len(items) != 1:
+        raise ValueError('Expected one item, found %d' % len(items))
+
+    return items[0]
+
+def dumps(items):
+    """Serialize a list of parsed items.
+
+    Items may be of different types, including nested types such as ``Line``
+    or ``ParkingDetails``.
+
+    Args:
+        items (list): Objects of the types in ``pyemtmad.types``.
+
+    Returns:
+        bytes: Serialized items.
+
+    Raises:
+        TypeError: If an item is not one of the parsed types.
+    """
+    groups = {}
+
+    for position, item in enumerate(items):
+        if not isinstance(item, emtype._ParsedType):
+            raise TypeError('Cannot serialize %r' % (item,))
+
+        # Items of a type usually share the keys of their response
+        key = (type(item), tuple(item._json))
+        groups.setdefault(key, []).append(position)
+
+    blocks = [
+        _encode_block(item_type, keys, [items[p] for p in positions],
+                      positions)
+        for (item_type, keys), positions in groups.items()
+    ]
+
+    document = json.dumps(
+        {'count': len(items), 'blocks': blocks},
+        separators=(',', ':'), ensure_ascii=False)
+
+    return MAGIC + struct.pack('B', FORMAT_VERSION) \
+        + zlib.compress(document.encode('utf-8'), 1)
+
+def loads(data):
+    """Deserialize a list of parsed items.
+
+    Args:
+        data (bytes): Data obtained from ``dumps()``.
+
+    Returns:
+        list: Parsed items.
+
+    Raises:
+        ValueError: If the data is not valid or its format version is not
+            supported.
+    """
+    data = bytes(data)
+
+    if data[:len(MAGIC)] != MAGIC or len(data) <= len(MAGIC):
+        raise ValueError('Not a serialized pyemtmad result')
+
+    version = struct.unpack_from('B', data, len(MAGIC))[0]
+
+    try:
+        if version != FORMAT_VERSION:
+            raise ValueError('Unsupported format version: %d' % version)
+
+        document = json.loads(
+            zlib.decompress(data[len(MAGIC) + 1:]).decode('utf-8'))
+
+        items = [None] * document['count']
+
+        for block in document['blocks']:
+            _decode_block(block, items)
+
+    except (zlib.error, struct.error, UnicodeDecodeError, KeyError,
+            IndexError, TypeError, AttributeError, StopIteration) as error:
+        raise ValueError('Invalid serialized data: %s' % error)
+
+    if None in items:
+        raise ValueError('Invalid serialized data: missing items')
+
+    return items
+
+def _item_type(name):
+    """Obtain a parsed type by its name."""
+    item_type = getattr(emtype, name, None)
+
+    if not isinstance(item_type, type) \
+            or not issubclass(item_type, emtype._ParsedType):
+        raise ValueError('Unknown type: %s' % name)
+
+    return item_type
+
+def _signature(item_type):
+    """Obtain a digest of the field spec of a type.
+
+    The code of the converters is part of the digest, so stored values are
+    only used when neither the spec nor its converters changed.
+    """
+    digest = hashlib.sha1()
+
+    for field in item_type._fields:
+        converter = field.converter
+
+        if isinstance(converter, emtype._Lookup):
+            converter = (repr(converter.default), sorted(
+                (repr(k), repr(v)) for k, v in converter.mapping.items()))
+
+        else:
+            # Functions decorated with ``util.memoize`` keep the original
+            function = getattr(converter, '__wrapped__', converter)
+            converter = (getattr(converter, '__name__', repr(converter)),
+                         _code(getattr(function, '__code__', None)))
+
+        digest.update(repr(
+            (field.key, field.name, converter, field.default)).encode('utf-8'))
+
+    return digest.hexdigest()[:16]
+
+def _code(code):
+    """Obtain a stable representation of the code object of a function."""
+    if code is None:
+        return None
+
+    return (code.co_code, tuple(
+        _code(c) if hasattr(c, 'co_code') else repr(c)
+        for c in code.co_consts))
+
+def _tuples(getter, count, objects):
+    """Apply an ``attrgetter``/``itemgetter`` of ``count`` names, as tuples."""
+    if count == 1:
+        return [(getter(o),) for o in objects]
+
+    elif count == 0:
+        return [()] * len(objects)
+
+    return list(map(getter, objects))
+
+def _typed(value):
+    """Obtain the types of a value and of its elements, recursively."""
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_typed(v) for v in value))
+
+    if isinstance(value, dict):
+        return (dict, tuple(
+            sorted((k, _typed(v)) for k, v in value.items())))
+
+    return type(value)
+
+def _same_column(column, responses):
+    """Find a response column equal to an attribute column, or None.
+
+    Types are compared too, as ``1 == 1.0 == True`` would otherwise change
+    the type of the loaded values.
+    """
+    types = None
+
+    for index, response in enumerate(responses):
+        if response != column:
+            continue
+
+        if types is None:
+            types = tuple(map(type, column))
+
+            # Containers may hold values of other types too
+            nested = not _CONTAINERS.isdisjoint(types)
+            if nested:
+                typed = _typed(column)
+
+        if tuple(map(type, response)) == types \
+                and (not nested or _typed(response) == typed):
+            return index
+
+    return None
+
+def _kind(values):
+    """Obtain how a column of attribute values is stored, or None."""
+    types = set(map(type, values))
+    types.discard(type(None))
+
+    if types.issubset(_JSON_TYPES):
+        return 'value'
+
+    elif len(types) > 1:
+        return None
+
+    value_type = types.pop()
+
+    if value_type is datetime.datetime:
+        return 'datetime'
+
+    elif value_type is datetime.date:
+        return 'date'
+
+    elif value_type is datetime.timedelta:
+        return 'timedelta'
+
+    elif value_type is list:
+        elements = set(type(e) for v in values if v for e in v)
+
+        if elements == set([tuple]):
+            return 'tuples'
+
+        elif elements.issubset(_JSON_TYPES):
+            return 'value'
+
+    # Nested items
+    return None
+
+def _encode_column(kind, values):
+    """Convert a column of attribute values to JSON."""
+    if kind == 'value' or kind == 'tuples':
+        return values
+
+    elif kind == 'date':
+        return [None if v is None else v.toordinal() for v in values]
+
+    elif kind == 'datetime':
+        values = [None if v is None else v - _EPOCH for v in values]
+
+    return [
+        None if v is None else [v.days, v.seconds, v.microseconds]
+        for v in values
+    ]
+
+def _decode_column(kind, values):
+    """Convert a column of attribute values from JSON."""
+    if kind == 'value':
+        return values
+
+    elif kind == 'tuples':
+        return [
+            None if v is None else [tuple(t) for t in v] for v in values
+        ]
+
+    elif kind == 'date':
+        convert = datetime.date.fromordinal
+
+    elif kind == 'datetime':
+        convert = lambda v: _EPOCH + datetime.timedelta(*v)
+
+    else:
+        convert = lambda v: datetime.timedelta(*v)
+
+    return [None if v is None else convert(v) for v in values]
+
+def _encode_block(item_type, keys, items, positions):
+    """Encode the items of a type whose responses share the same keys.
+
+    Attributes equal to a value of the response (most of them) refer to its
+    column instead of being stored twice.
+    """
+    responses = list(zip(*_tuples(
+        operator.itemgetter(*keys), len(keys), [i._json for i in items])))
+
+    block = {
+        'type': item_type.__name__,
+        'signature': _signature(item_type),
+        'positions': positions,
+        'keys': keys,
+        'json': responses
+    }
+
+    names = item_type._attributes
+    columns = list(zip(*_tuples(operator.attrgetter(*names), len(names),
+                                items)))
+    sources = []
+    values = []
+
+    for column in columns:
+        source = _same_column(column, responses)
+
+        if source is not None:
+            sources.append(source)
+            continue
+
+        kind = _kind(column)
+
+        if kind is None:
+            # Parsed again when loaded
+            return block
+
+        sources.append(kind)
+        values.append(_encode_column(kind, column))
+
+    block['attributes'] = names
+    block['sources'] = sources
+    block['values'] = values
+
+    return block
+
+def _decode_block(block, items):
+    """Decode the items of a block into their positions of the list."""
+    item_type = _item_type(block['type'])
+    keys = block['keys']
+    responses = block['json']
+    positions = block['positions']
+
+    if not all(isinstance(k, six.string_types) for k in keys):
+        raise ValueError('Invalid response keys')
+
+    if 'values' not in block \
+            or block['signature'] != _signature(item_type) \
+            or block['attributes'] != list(item_type._attributes):
+        # Parse again from the responses
+        for position, values in zip(positions, zip(*responses)):
+            items[position] = item_type.from_json(dict(zip(keys, values)))
+
+        return
+
+    # Stored attributes follow the response values in each row
+    columns = list(responses)
+    stored = iter(block['values'])
+    sources = []
+
+    for source in block['sources']:
+        if source in _KINDS:
+            columns.append(_decode_column(source, next(stored)))
+            source = len(columns) - 1
+
+        elif not 0 <= source < len(responses):
+            raise ValueError('Invalid attribute source: %r' % (source,))
+
+        sources.append(source)
+
+    build = _builder(item_type, tuple(keys), tuple(sources))
+    rows = zip(*columns) if columns else [()] * len(positions)
+
+    for position, item in zip(positions, build(rows)):
+        items[position] = item
+
+def _builder(item_type, keys, sources):
+    """Obtain a function that builds items from rows of stored values.
+
+    The generated code fills the instance ``__dict__`` from a dict literal,
+    as the ``from_json()`` of the type. Functions are cached by layout.
+    """
+    layout = (item_type, keys, sources)
+    build = _BUILDERS.get(layout)
+
+    if build is not None:
+        return build
+
+    values = ['            %r: r[%d],' % a
+              for a in zip(item_type._attributes, sources)]
+    response = ['%r: r[%d]' % (k, i) for i, k in enumerate(keys)]
+
+    lines = [
+        'def build(rows):',
+        '    items = []',
+        '    for r in rows:',
+        '        item = _new(_cls)',
+        '        item.__dict__ = {'
+    ] + values + [
+        "            '_json': {%s}," % ', '.join(response),
+        '        }',
+        '        items.append(item)',
+        '    return items'
+    ]
+
+    namespace = {'_cls': item_type, '_new': object.__new__}
+    code = {}
+    exec(compile('\n'.join(lines) + '\n', '<build>', 'exec'), namespace,
+         code)
+
+    if len(_BUILDERS) >= 256:
+        _BUILDERS.clear()
+
+    build = _BUILDERS[layout] = code['build']
+    return build
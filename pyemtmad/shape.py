@@ -0,0 +1,697 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains the shapes of the routes of the lines.
+
+A route response includes every stop and vertex of a line as a separate item.
+``RouteShape`` groups them into ordered coordinate arrays per line and
+direction, which can be simplified and encoded as a polyline for map clients.
+NumPy is required.
+"""
+
+from pyemtmad import geomath
+from pyemtmad import types as emtype
+from pyemtmad.util import np, require_numpy
+
+# Node type codes by name (see SEC_DETAILS)
+_NODE_CODES = dict((v, k) for k, v in emtype.SEC_DETAILS.items())
+
+# Maximum number of elements of the matrices used when projecting
+_MATRIX_SIZE = 1 << 18
+
+# Size (in meters) of the cells of the segment index
+_SEGMENT_CELL = 250.0
+
+
+def encode_polyline(latitude, longitude, precision=5):
+    """Encode coordinates with the Encoded Polyline Algorithm.
+
+    Points with missing (NaN) coordinates are skipped.
+
+    Args:
+        latitude (numpy.ndarray): Latitudes in decimal degrees.
+        longitude (numpy.ndarray): Longitudes in decimal degrees.
+        precision (int): Number of decimals to keep.
+
+    Returns:
+        str: Encoded polyline.
+    """
+    require_numpy('route shapes')
+
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    known = ~(np.isnan(latitude) | np.isnan(longitude))
+
+    factor = 10 ** precision
+    points = np.empty((int(known.sum()), 2), dtype=np.int64)
+    points[:, 0] = np.round(latitude[known] * factor)
+    points[:, 1] = np.round(longitude[known] * factor)
+
+    # Each point is stored as the difference with the previous one
+    deltas = np.diff(
+        np.concatenate(([[0, 0]], points)), axis=0).ravel()
+    deltas = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+
+    chunks = []
+    for value in deltas.tolist():
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+
+        chunks.append(chr(value + 63))
+
+    return ''.join(chunks)
+
+def decode_polyline(polyline, precision=5):
+    """Decode a polyline obtained from ``encode_polyline()``.
+
+    Args:
+        polyline (str): Encoded polyline.
+        precision (int): Number of decimals used when encoding.
+
+    Returns:
+        tuple: Two ``numpy.ndarray`` with the latitudes and longitudes.
+    """
+    require_numpy('route shapes')
+
+    values = []
+    value = shift = 0
+
+    for char in polyline:
+        byte = ord(char) - 63
+        value |= (byte & 0x1f) << shift
+        shift += 5
+
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+
+    points = np.cumsum(
+        np.array(values, dtype=np.int64).reshape(-1, 2), axis=0)
+    points = points / float(10 ** precision)
+
+    return points[:, 0], points[:, 1]
+
+def _douglas_peucker(x, y, tolerance):
+    """Select the points of a polyline to keep when simplifying it.
+
+    Args:
+        x (numpy.ndarray): Projected coordinates in meters.
+        y (numpy.ndarray): Projected coordinates in meters.
+        tolerance (double): Maximum distance (in meters) between the original
+            and the simplified polyline.
+
+    Returns:
+        numpy.ndarray: Boolean mask of the points to keep.
+    """
+    keep = np.zeros(len(x), dtype=bool)
+
+    if len(x) == 0:
+        return keep
+
+    keep[0] = keep[-1] = True
+    stack = [(0, len(x) - 1)]
+
+    while stack:
+        start, end = stack.pop()
+
+        if end - start < 2:
+            continue
+
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        px = x[start + 1:end] - x[start]
+        py = y[start + 1:end] - y[start]
+        length = dx * dx + dy * dy
+
+        if length == 0:
+            distance = np.hypot(px, py)
+
+        else:
+            # Distance to the segment, not to the infinite line
+            t = np.clip((px * dx + py * dy) / length, 0, 1)
+            distance = np.hypot(px - t * dx, py - t * dy)
+
+        farthest = int(np.argmax(distance))
+
+        if distance[farthest] > tolerance:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            stack.append((start, middle))
+            stack.append((middle, end))
+
+    return keep
+
+
+class RouteShape(object):
+    """Ordered geometry of a line in one direction.
+
+    Attributes:
+        line (int): Line number.
+        direction (str): *forward* or *backward*.
+        latitude (numpy.ndarray): Latitudes of the nodes in decimal degrees.
+        longitude (numpy.ndarray): Longitudes of the nodes in decimal degrees.
+        distance (numpy.ndarray): Distance of each node to the origin of the
+            route in meters.
+        stop_index (numpy.ndarray): Position of each stop in the shape.
+        stop_ids (numpy.ndarray): IDs of the stops, in the same order as
+            ``stop_index``.
+    """
+
+    def __init__(self, line, direction, latitude, longitude, distance,
+                 stop_index, stop_ids):
+        self.line = line
+        self.direction = direction
+        self.latitude = latitude
+        self.longitude = longitude
+        self.distance = distance
+        self.stop_index = stop_index
+        self.stop_ids = stop_ids
+
+        # Segment arrays and their grid, computed on the first projection
+        self._segments = None
+        self._segment_grid = None
+
+    def __len__(self):
+        return len(self.latitude)
+
+    def __repr__(self):
+        return '<RouteShape line=%s direction=%s nodes=%d stops=%d>' % (
+            self.line, self.direction, len(self), len(self.stop_index))
+
+    @classmethod
+    def from_items(cls, items):
+        """Build the shapes of the routes in a route response.
+
+        Args:
+            items: List of ``RouteLinesItem`` or a ``RouteTable``, as
+                obtained from ``get_route_lines`` or ``get_route_lines_route``.
+
+        Returns:
+            dict: ``RouteShape`` objects indexed by ``(line, direction)``.
+        """
+        require_numpy('route shapes')
+
+        if isinstance(getattr(items, 'node_type', None), np.ndarray):
+            # RouteTable
+            ids = np.asarray(items.id, dtype=np.float64)
+            lines = np.asarray(items.line, dtype=np.float64)
+            codes = np.asarray(items.node_type, dtype=np.int64)
+            distance = np.asarray(items.distance_orig, dtype=np.float64)
+
+        else:
+            ids = geomath.float_array([i.id for i in items])
+            lines = geomath.float_array([i.line for i in items])
+            codes = np.array(
+                [_NODE_CODES.get(i.node_type, 10) for i in items],
+                dtype=np.int64)
+            distance = geomath.float_array([i.distance_orig for i in items])
+
+        ids = np.where(np.isnan(ids), -1, ids).astype(np.int64)
+        latitude, longitude = geomath.coordinates(items)
+        backward = codes >= 20
+        shapes = {}
+
+        for line in np.unique(lines[~np.isnan(lines)]):
+            for direction in ('forward', 'backward'):
+                mask = (lines == line) \
+                    & (backward == (direction == 'backward'))
+
+                if mask.any():
+                    shapes[(int(line), direction)] = cls._build(
+                        int(line), direction, ids[mask], codes[mask],
+                        latitude[mask], longitude[mask], distance[mask])
+
+        return shapes
+
+    @classmethod
+    def _build(cls, line, direction, ids, codes, latitude, longitude,
+               distance):
+        """Build a shape from the nodes of a line and direction."""
+        if np.isnan(distance).any():
+            # Keep the order of the response and measure the geometry
+            steps = geomath.haversine(
+                latitude[:-1], longitude[:-1], latitude[1:], longitude[1:])
+            distance = np.concatenate(([0.0], np.cumsum(steps)))
+
+        else:
+            order = np.argsort(distance, kind='mergesort')
+            ids, codes = ids[order], codes[order]
+            latitude, longitude = latitude[order], longitude[order]
+            distance = distance[order]
+
+        stop_index = np.flatnonzero(codes % 10 == 0)
+
+        return cls(
+            line, direction, latitude, longitude, distance, stop_index,
+            ids[stop_index])
+
+    def simplify(self, tolerance=5):
+        """Simplify the shape with the Douglas-Peucker algorithm.
+
+        Stops are always kept, so the simplification is applied to the
+        section between each pair of consecutive stops. Other nodes without
+        coordinates are dropped.
+
+        Args:
+            tolerance (double): Maximum distance (in meters) between the
+                original and the simplified shape.
+
+        Returns:
+            RouteShape: Simplified shape.
+        """
+        known = ~(np.isnan(self.latitude) | np.isnan(self.longitude))
+        keep = np.zeros(len(self), dtype=bool)
+        keep[self.stop_index] = True
+
+        # Simplify the known nodes only, anchored at the known stops
+        nodes = np.flatnonzero(known)
+        x, y = self._to_meters(self.latitude[nodes], self.longitude[nodes])
+        anchors = np.union1d(
+            np.flatnonzero(keep[nodes]), [0, max(len(nodes) - 1, 0)])
+        kept = np.zeros(len(nodes), dtype=bool)
+
+        for start, end in zip(anchors[:-1], anchors[1:]):
+            kept[start:end + 1] |= _douglas_peucker(
+                x[start:end + 1], y[start:end + 1], tolerance)
+
+        if len(nodes):
+            kept[anchors] = True
+
+        keep[nodes[kept]] = True
+
+        # Position of the stops among the kept nodes
+        positions = np.cumsum(keep) - 1
+
+        return RouteShape(
+            self.line, self.direction,
+            self.latitude[keep], self.longitude[keep], self.distance[keep],
+            positions[self.stop_index], self.stop_ids)
+
+    def encode(self, precision=5):
+        """Encode the shape as a polyline.
+
+        Nodes without coordinates are skipped.
+
+        Args:
+            precision (int): Number of decimals to keep.
+
+        Returns:
+            str: Encoded polyline.
+        """
+        return encode_polyline(self.latitude, self.longitude, precision)
+
+    def stop_distances(self):
+        """Obtain the distance of each stop to the origin of the route.
+
+        Returns:
+            numpy.ndarray: Distances in meters, in the same order as
+            ``stop_ids``.
+        """
+        return self.distance[self.stop_index]
+
+    def project(self, latitude, longitude):
+        """Snap positions to the shape.
+
+        Each position is projected onto the closest segment of the shape. All
+        the positions are processed at once. Segments are bucketed in a grid,
+        so only those around each position are compared; positions far from
+        the shape are compared with all of them.
+
+        Args:
+            latitude: Latitudes in decimal degrees (scalar or array).
+            longitude: Longitudes in decimal degrees (scalar or array).
+
+        Returns:
+            RouteProjection: Projection of each position.
+        """
+        latitude = np.atleast_1d(np.asarray(latitude, dtype=np.float64))
+        longitude = np.atleast_1d(np.asarray(longitude, dtype=np.float64))
+
+        count = len(latitude)
+        segment = np.full(count, -1, dtype=np.int64)
+        offset = np.full(count, np.nan)
+        along = np.full(count, np.nan)
+
+        valid = ~(np.isnan(latitude) | np.isnan(longitude))
+
+        if len(self) < 2 or not valid.any():
+            return self._projection(segment, offset, along)
+
+        px, py = self._to_meters(latitude[valid], longitude[valid])
+        rows = np.flatnonzero(valid)
+
+        closest, squared, fraction = self._closest_nearby(px, py)
+
+        # A closer segment can only be outside the neighbouring cells if the
+        # closest one found is farther than the size of a cell
+        far = squared > _SEGMENT_CELL * _SEGMENT_CELL
+
+        if far.any():
+            closest[far], squared[far], fraction[far] = \
+                self._closest_all(px[far], py[far])
+
+        # Segments without coordinates are never picked
+        found = np.isfinite(squared)
+        rows, closest = rows[found], closest[found]
+
+        segment[rows] = closest
+        offset[rows] = np.sqrt(squared[found])
+        along[rows] = self.distance[closest] + fraction[found] * (
+            self.distance[closest + 1] - self.distance[closest])
+
+        return self._projection(segment, offset, along)
+
+    @staticmethod
+    def _segment_distance(px, py, segments, x0, y0, dx, dy, length):
+        """Compute the squared distance and fraction of position-segment
+        pairs."""
+        ex = px - x0[segments]
+        ey = py - y0[segments]
+        sx = dx[segments]
+        sy = dy[segments]
+
+        t = np.clip((ex * sx + ey * sy) / length[segments], 0, 1)
+
+        return (ex - t * sx) ** 2 + (ey - t * sy) ** 2, t
+
+    def _closest_all(self, px, py):
+        """Find the closest segment comparing with all the segments."""
+        x0, y0, dx, dy, length = self._segment_arrays()
+
+        closest = np.zeros(len(px), dtype=np.int64)
+        squared = np.zeros(len(px))
+        fraction = np.zeros(len(px))
+        segments = np.arange(len(x0))
+
+        # Limit the size of the (positions x segments) matrices
+        chunk = max(1, _MATRIX_SIZE // len(x0))
+
+        for start in range(0, len(px), chunk):
+            part = slice(start, start + chunk)
+            distance, t = self._segment_distance(
+                px[part, None], py[part, None], segments,
+                x0, y0, dx, dy, length)
+            distance[np.isnan(distance)] = np.inf
+
+            best = np.argmin(distance, axis=1)
+            picked = np.arange(len(best))
+
+            closest[part] = best
+            squared[part] = distance[picked, best]
+            fraction[part] = t[picked, best]
+
+        return closest, squared, fraction
+
+    def _closest_nearby(self, px, py):
+        """Find the closest segment among those in the neighbouring cells.
+
+        Positions without segments around them get an infinite distance.
+        """
+        x0, y0, dx, dy, length = self._segment_arrays()
+        origin, columns, rows, cell_offsets, cell_segments = \
+            self._segment_index()
+
+        closest = np.zeros(len(px), dtype=np.int64)
+        squared = np.full(len(px), np.inf)
+        fraction = np.zeros(len(px))
+
+        cx = np.floor((px - origin[0]) / _SEGMENT_CELL).astype(np.int64)
+        cy = np.floor((py - origin[1]) / _SEGMENT_CELL).astype(np.int64)
+
+        # Segments of the 3x3 cells around each position
+        positions = []
+        starts = []
+        ends = []
+
+        for ox in (-1, 0, 1):
+            for oy in (-1, 0, 1):
+                x = cx + ox
+                y = cy + oy
+                inside = np.flatnonzero(
+                    (x >= 0) & (x < columns) & (y >= 0) & (y < rows))
+                cell = x[inside] * rows + y[inside]
+
+                positions.append(inside)
+                starts.append(cell_offsets[cell])
+                ends.append(cell_offsets[cell + 1])
+
+        positions = np.concatenate(positions)
+        starts = np.concatenate(starts)
+        counts = np.concatenate(ends) - starts
+
+        total = int(counts.sum())
+        if total == 0:
+            return closest, squared, fraction
+
+        pair_position = np.repeat(positions, counts)
+        pair_segment = cell_segments[
+            np.repeat(starts - np.cumsum(counts) + counts, counts)
+            + np.arange(total)]
+
+        distance, t = self._segment_distance(
+            px[pair_position], py[pair_position], pair_segment,
+            x0, y0, dx, dy, length)
+
+        # Closest pair of each position
+        order = np.lexsort((distance, pair_position))
+        first = order[np.flatnonzero(np.diff(
+            np.concatenate(([-1], pair_position[order]))))]
+        found = pair_position[first]
+
+        closest[found] = pair_segment[first]
+        squared[found] = distance[first]
+        fraction[found] = t[first]
+
+        return closest, squared, fraction
+
+    def _projection(self, segment, offset, along):
+        """Find the next stop of each projected position."""
+        stop_distance = self.distance[self.stop_index]
+        following = np.searchsorted(stop_distance, along, side='left')
+
+        # Positions past the last stop (or not projected) have no next stop
+        has_next = (following < len(stop_distance)) & ~np.isnan(along)
+        following = np.minimum(following, max(len(stop_distance) - 1, 0))
+
+        next_stop = np.full(len(along), -1, dtype=np.int64)
+        remaining = np.full(len(along), np.nan)
+
+        if len(stop_distance):
+            next_stop[has_next] = self.stop_ids[following[has_next]]
+            remaining[has_next] = \
+                stop_distance[following[has_next]] - along[has_next]
+
+        return RouteProjection(
+            segment, along, offset, next_stop, remaining)
+
+    def _to_meters(self, latitude, longitude):
+        """Project coordinates to meters around the center of the shape."""
+        known = self.latitude[~np.isnan(self.latitude)]
+        lat0 = np.radians(np.mean(known)) if len(known) else 0.0
+
+        return (
+            np.radians(longitude) * np.cos(lat0) * geomath.EARTH_RADIUS,
+            np.radians(latitude) * geomath.EARTH_RADIUS
+        )
+
+    def _segment_arrays(self):
+        """Obtain the start, vector and squared length of each segment."""
+        if self._segments is None:
+            x, y = self._to_meters(self.latitude, self.longitude)
+            dx = np.diff(x)
+            dy = np.diff(y)
+            length = dx * dx + dy * dy
+
+            # Repeated nodes produce empty segments
+            length[length == 0] = 1.0
+
+            self._segments = (x[:-1], y[:-1], dx, dy, length)
+
+        return self._segments
+
+    def _segment_index(self):
+        """Obtain the grid that buckets the segments of the shape.
+
+        Each segment is stored in every cell covered by its bounding box.
+
+        Returns:
+            tuple: Origin of the grid in meters, number of columns and rows,
+            and the CSR offsets (by cell) and segments of the buckets.
+        """
+        if self._segment_grid is None:
+            x0, y0, dx, dy, _ = self._segment_arrays()
+            segments = np.flatnonzero(~(np.isnan(dx) | np.isnan(dy)))
+
+            x0, y0 = x0[segments], y0[segments]
+            x1, y1 = x0 + dx[segments], y0 + dy[segments]
+
+            origin = (0.0, 0.0)
+            if len(segments):
+                origin = (np.minimum(x0, x1).min(), np.minimum(y0, y1).min())
+
+            def cells(start, end, base):
+                return (
+                    np.floor((np.minimum(start, end) - base)
+                             / _SEGMENT_CELL).astype(np.int64),
+                    np.floor((np.maximum(start, end) - base)
+                             / _SEGMENT_CELL).astype(np.int64))
+
+            left, right = cells(x0, x1, origin[0])
+            bottom, top = cells(y0, y1, origin[1])
+            columns = int(right.max()) + 1 if len(segments) else 0
+            rows = int(top.max()) + 1 if len(segments) else 0
+
+            # One (cell, segment) pair for each cell of each bounding box
+            width = right - left + 1
+            height = top - bottom + 1
+            count = width * height
+            pair = np.arange(int(count.sum())) \
+                - np.repeat(np.cumsum(count) - count, count)
+            column = np.repeat(left, count) + pair // np.repeat(height, count)
+            row = np.repeat(bottom, count) + pair % np.repeat(height, count)
+            cell = column * rows + row
+
+            order = np.argsort(cell, kind='mergesort')
+            offsets = np.zeros(columns * rows + 1, dtype=np.int64)
+            np.cumsum(
+                np.bincount(cell, minlength=columns * rows),
+                out=offsets[1:])
+
+            self._segment_grid = (
+                origin, columns, rows, offsets,
+                np.repeat(segments, count)[order])
+
+        return self._segment_grid
+
+
+class RouteProjection(object):
+    """Positions snapped to a route shape.
+
+    All the attributes are arrays with one element per projected position.
+    Positions that could not be projected have NaN values and -1 as segment
+    and next stop.
+
+    Attributes:
+        segment (numpy.ndarray): Index of the closest segment of the shape,
+            which starts at the node with the same index.
+        distance (numpy.ndarray): Distance along the route from its origin,
+            in meters.
+        offset (numpy.ndarray): Distance from the position to the shape, in
+            meters.
+        next_stop (numpy.ndarray): ID of the next stop, or -1 past the last
+            stop.
+        remaining (numpy.ndarray): Distance along the route to the next stop,
+            in meters.
+    """
+
+    def __init__(self, segment, distance, offset, next_stop, remaining):
+        self.segment = segment
+        self.distance = distance
+        self.offset = offset
+        self.next_stop = next_stop
+        self.remaining = remaining
+
+    def __len__(self):
+        return len(self.segment)
+
+
+def _line_key(line):
+    """Obtain the key used to match the line of an arrival with a shape.
+
+    Line numbers are compared without leading zeros, other line IDs (such as
+    *N1*) as they are.
+    """
+    key = str(line).strip()
+    return str(int(key)) if key.isdigit() else key
+
+def project_arrivals(shapes, arrivals, labels=None):
+    """Snap the positions of the buses of a list of arrivals to their routes.
+
+    Arrivals do not include the direction of the bus, so each position is
+    projected onto both directions of its line and the closest one is used.
+
+    Arrivals identify their line with a string ID that is not always the
+    line number of the shapes (e.g. night lines such as *N1*). Those IDs are
+    translated with ``labels``; arrivals whose line has no shape are not
+    projected.
+
+    Args:
+        shapes (dict): Shapes indexed by ``(line, direction)``, as obtained
+            from ``RouteShape.from_items()``.
+        arrivals (list[Arrival]): Arrivals obtained from ``get_arrive_stop``.
+        labels (dict): Optional, line number of each line ID, as in the
+            ``label`` and ``line`` attributes of ``LineInfo``.
+
+    Returns:
+        tuple: ``RouteProjection`` of the arrivals (in the same order) and an
+        array with the direction of each one (None if its line has no
+        shape).
+    """
+    require_numpy('route shapes')
+
+    count = len(arrivals)
+    result = RouteProjection(
+        np.full(count, -1, dtype=np.int64), np.full(count, np.nan),
+        np.full(count, np.nan), np.full(count, -1, dtype=np.int64),
+        np.full(count, np.nan))
+    directions = np.full(count, None, dtype=object)
+
+    latitude, longitude = geomath.coordinates(arrivals)
+
+    # Shapes and line numbers by line ID
+    by_line = dict(
+        ((_line_key(line), direction), shape)
+        for (line, direction), shape in shapes.items())
+    numbers = dict(
+        (_line_key(label), _line_key(line))
+        for label, line in (labels or {}).items())
+
+    # Group the arrivals by line
+    groups = {}
+    for index, arrival in enumerate(arrivals):
+        if arrival.line_id is None:
+            continue
+
+        line = _line_key(arrival.line_id)
+        groups.setdefault(numbers.get(line, line), []).append(index)
+
+    for line, rows in groups.items():
+        rows = np.array(rows)
+
+        for direction in ('forward', 'backward'):
+            shape = by_line.get((line, direction))
+
+            if shape is None:
+                continue
+
+            projection = shape.project(latitude[rows], longitude[rows])
+
+            # Keep the projection if it is closer than the previous one
+            better = ~np.isnan(projection.offset) & ~(
+                projection.offset >= result.offset[rows])
+            target = rows[better]
+
+            for name in ('segment', 'distance', 'offset', 'next_stop',
+                         'remaining'):
+                getattr(result, name)[target] = \
+                    getattr(projection, name)[better]
+
+            directions[target] = direction
+
+    return result, directions
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains snapshots of the line network on a given date.
+
+A snapshot groups the ``get_route_lines`` and ``get_list_lines`` items by
+line and computes a fingerprint of the content of each line. Comparing the
+fingerprints of two dates tells which lines were added, removed or modified,
+so that only those lines have to be processed again.
+
+``SnapshotDiff`` updates the route shapes, the walking transfers and the
+cached stop searches in place. ``TransitGraph`` and ``StopIndex`` have no
+incremental update: build them again from the updated shapes and nodes,
+which only involves local vectorized work.
+"""
+
+import hashlib
+import json
+
+from pyemtmad import types as emtype
+from pyemtmad.shape import RouteShape
+
+
+def _raw_items(items):
+    """Obtain the response items of a list of objects or a table."""
+    if items is None:
+        return []
+
+    if hasattr(items, 'raw_items'):
+        # Columnar table
+        return items.raw_items()
+
+    return [getattr(item, '_json', item) for item in items]
+
+def _line_number(value):
+    """Convert a line number of a response, or None if it is not valid."""
+    try:
+        return int(value)
+
+    except (TypeError, ValueError):
+        return None
+
+def _group(items):
+    """Group response items by line number."""
+    groups = {}
+
+    for item in _raw_items(items):
+        line = _line_number(item.get('line'))
+
+        if line is not None:
+            groups.setdefault(line, []).append(item)
+
+    return groups
+
+def _fingerprint(*groups):
+    """Compute a digest of the items of a line, regardless of their order."""
+    digest = hashlib.sha1()
+
+    for items in groups:
+        for item in sorted(json.dumps(i, sort_keys=True) for i in items):
+            digest.update(item.encode('utf-8'))
+            digest.update(b'\n')
+
+        # Separate the items of each endpoint
+        digest.update(b'\0')
+
+    return digest.hexdigest()
+
+
+class NetworkSnapshot(object):
+    """Routes and information of the lines on a date.
+
+    Attributes:
+        date (datetime.date): Date of the snapshot.
+        routes (dict): Raw route items of each line number.
+        lines (dict): Raw line information items of each line number.
+        fingerprints (dict): Content digest of each line number.
+    """
+
+    def __init__(self, date, route_items=None, line_items=None):
+        """Build the snapshot from the responses of the API.
+
+        Args:
+            date (datetime.date): Date of the responses.
+            route_items: List of ``RouteLinesItem`` or a ``RouteTable``, as
+                obtained from ``get_route_lines``.
+            line_items (list[ListLineInfo]): Response of ``get_list_lines``.
+        """
+        self.date = date
+        self.routes = _group(route_items)
+        self.lines = _group(line_items)
+
+        self.fingerprints = dict(
+            (line, _fingerprint(
+                self.routes.get(line, []), self.lines.get(line, [])))
+            for line in set(self.routes) | set(self.lines)
+        )
+
+    def __len__(self):
+        """Number of lines in the snapshot."""
+        return len(self.fingerprints)
+
+    def __contains__(self, line):
+        return _line_number(line) in self.fingerprints
+
+    @classmethod
+    def load(cls, wrapper, date, lines=None):
+        """Request the routes and information of the lines on a date.
+
+        Args:
+            wrapper (Wrapper): Wrapper used to perform the requests.
+            date (datetime.date): Date to query.
+            lines (list[int]): Optional, lines to query (all by default).
+
+        Returns:
+            NetworkSnapshot: Snapshot of the date.
+
+        Raises:
+            RuntimeError: If any of the requests fails.
+        """
+        params = {
+            'day': date.day, 'month': date.month, 'year': date.year,
+            'lines': lines or []
+        }
+
+        status, routes = wrapper.bus.get_route_lines(**params)
+        if not status:
+            raise RuntimeError(routes)
+
+        status, line_info = wrapper.bus.get_list_lines(**params)
+        if not status:
+            raise RuntimeError(line_info)
+
+        return cls(date, routes, line_info)
+
+    def route_items(self, lines=None):
+        """Obtain the raw route items of some lines.
+
+        Args:
+            lines (list[int]): Optional, line numbers (all by default).
+
+        Returns:
+            list[dict]: Response items of ``get_route_lines``.
+        """
+        if lines is None:
+            lines = sorted(self.routes)
+
+        return [
+            item for line in lines for item in self.routes.get(line, [])
+        ]
+
+    def diff(self, newer):
+        """Compare this snapshot with the one of another date.
+
+        Args:
+            newer (NetworkSnapshot): Snapshot to compare with.
+
+        Returns:
+            SnapshotDiff: Changes from this snapshot to ``newer``.
+        """
+        return SnapshotDiff(self, newer)
+
+
+class SnapshotDiff(object):
+    """Changes between two snapshots.
+
+    Attributes:
+        old (NetworkSnapshot): Original snapshot.
+        new (NetworkSnapshot): Updated snapshot.
+        added (list[int]): Lines that only exist in the updated snapshot.
+        removed (list[int]): Lines that only exist in the original snapshot.
+        modified (list[int]): Lines whose content changed.
+    """
+
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+
+        old_lines = set(old.fingerprints)
+        new_lines = set(new.fingerprints)
+
+        self.added = sorted(new_lines - old_lines)
+        self.removed = sorted(old_lines - new_lines)
+        self.modified = sorted(
+            line for line in old_lines & new_lines
+            if old.fingerprints[line] != new.fingerprints[line])
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+
+    __nonzero__ = __bool__
+
+    def __repr__(self):
+        return '<SnapshotDiff +%d -%d ~%d>' % (
+            len(self.added), len(self.removed), len(self.modified))
+
+    @property
+    def changed(self):
+        """Lines that were added or modified."""
+        return sorted(self.added + self.modified)
+
+    def update_shapes(self, shapes):
+        """Apply the changes to the route shapes of the original snapshot.
+
+        Only the shapes of the added and modified lines are built again.
+
+        Args:
+            shapes (dict): Shapes indexed by ``(line, direction)``, as
+                obtained from ``RouteShape.from_items()``. It is modified in
+                place and can then be used to build a new ``TransitGraph``.
+
+        Returns:
+            dict: The updated shapes.
+        """
+        outdated = set(self.removed) | set(self.modified)
+
+        for key in [k for k in shapes if k[0] in outdated]:
+            del shapes[key]
+
+        if self.changed:
+            shapes.update(RouteShape.from_items([
+                emtype.RouteLinesItem.from_json(item)
+                for item in self.new.route_items(self.changed)
+            ]))
+
+        return shapes
+
+    def update_cache(self, geo_cache):
+        """Discard the cached searches affected by the changes.
+
+        Stops found around a point include the lines that serve them, so
+        the searches with a stop of a changed line, or whose area contains
+        a stop of an added or modified route, are discarded.
+
+        Args:
+            geo_cache (GeoCache): Cache of the wrapper.
+
+        Returns:
+            int: Number of discarded responses.
+        """
+        if not self:
+            return 0
+
+        lines = set(self.added + self.removed + self.modified)
+        stops = set()
+        points = []
+
+        for item in self.old.route_items(sorted(lines)):
+            stops.add(str(item.get('node')))
+
+        # Stops of the new routes may not be in the cached searches yet
+        for item in self.new.route_items(sorted(lines)):
+            stops.add(str(item.get('node')))
+
+            if item.get('latitude') is not None \
+                    and item.get('longitude') is not None:
+                points.append(
+                    (float(item['latitude']), float(item['longitude'])))
+
+        def match(stop):
+            # The stop is on a changed route or lists a changed line
+            if str(stop.get('stopId')) in stops:
+                return True
+
+            served = stop.get('line') or []
+            if isinstance(served, dict):
+                served = [served]
+
+            return any(_line_number(i.get('name')) in lines for i in served)
+
+        return geo_cache.invalidate('get_stops_from_xy', match, points)
+
+    def update_transfers(self, transfers, graph):
+        """Apply the changes to the walking transfers between stops.
+
+        Only the transfers of the stops that were added, moved or removed
+        are computed again (see ``TransferIndex.update()``).
+
+        Args:
+            transfers (TransferIndex): Transfers of the original network.
+            graph (TransitGraph): Graph of the updated network.
+
+        Returns:
+            int: Number of stops that were added, moved or removed.
+        """
+        return transfers.update(
+            graph.stop_ids, graph.stop_latitude, graph.stop_longitude)
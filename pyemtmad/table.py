@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains columnar result types backed by NumPy arrays.
+
+These are an opt-in alternative to the lists of objects defined in
+``pyemtmad.types`` and are built directly from the ``resultValues`` payload
+of the API. NumPy is required to use them.
+"""
+
+from pyemtmad import geomath
+from pyemtmad import types as emtype
+from pyemtmad.util import np, require_numpy
+
+
+def _column(values, key, dtype, default):
+    """Build a typed column from a list of response items.
+
+    Args:
+        values (list[dict]): Response items.
+        key (str): Attribute of the items to extract.
+        dtype: NumPy type of the column.
+        default: Value to use when the attribute is missing or empty.
+
+    Returns:
+        numpy.ndarray: Column values.
+    """
+    column = [v.get(key) for v in values]
+    return np.array(
+        [default if c is None or c == '' else c for c in column],
+        dtype=dtype)
+
+def _string_column(values, key):
+    """Build a column of strings in which repeated values share storage.
+
+    Args:
+        values (list[dict]): Response items.
+        key (str): Attribute of the items to extract.
+
+    Returns:
+        numpy.ndarray: Object array of strings.
+    """
+    pool = {}
+    column = np.empty(len(values), dtype=object)
+
+    for index, value in enumerate(values):
+        string = value.get(key)
+        column[index] = pool.setdefault(string, string)
+
+    return column
+
+def decode_node_lines(values):
+    """Decode the ``lines`` of all the items of a nodes response at once.
+
+    Each line string (e.g. ``'12/1'``) is split into its line number and its
+    direction code (1 = forward, 2 = backward). Instead of handling each
+    string separately, all of them are joined and parsed in a single pass.
+
+    Args:
+        values (list[dict]): ``resultValues`` of a ``get_nodes_lines``
+            response.
+
+    Returns:
+        tuple: Three parallel ``numpy.ndarray`` with the position of the node
+        in ``values``, the line number and the direction code.
+
+    Raises:
+        ValueError: If any of the line strings is malformed.
+    """
+    require_numpy('columnar results')
+
+    counts = np.zeros(len(values), dtype=np.int64)
+    strings = []
+
+    for index, value in enumerate(values):
+        lines = [l for l in value.get('lines') or [] if l]
+        counts[index] = len(lines)
+        strings.extend(lines)
+
+    text = '/'.join(strings).replace('\\', '')
+    numbers = np.fromstring(text, dtype=np.int32, sep='/') if text \
+            else np.zeros(0, dtype=np.int32)
+
+    if len(numbers) != 2 * len(strings):
+        raise ValueError('Malformed line string in nodes response')
+
+    node = np.repeat(np.arange(len(values), dtype=np.int32), counts)
+    return node, numbers[0::2], numbers[1::2].astype(np.int8)
+
+
+class _Table(object):
+    """Base class for columnar results.
+
+    Columns are stored as attributes with the same name as the attribute of
+    the equivalent object type.
+
+    Attributes:
+        _json (list[dict]): Original API response items.
+        _index (numpy.ndarray): Position of each row in ``_json``.
+    """
+
+    columns = ()
+
+    def __init__(self, values, index=None, **columns):
+        for name in self.columns:
+            setattr(self, name, columns[name])
+
+        self._json = values
+
+        if index is None:
+            index = np.arange(len(values))
+
+        self._index = index
+
+    def __len__(self):
+        return len(self._index)
+
+    def filter(self, mask):
+        """Obtain a new table containing only some of the rows.
+
+        Args:
+            mask (numpy.ndarray): Boolean mask or integer positions of the
+                rows to keep.
+
+        Returns:
+            Table of the same type with the selected rows.
+        """
+        columns = dict(
+            (name, getattr(self, name)[mask]) for name in self.columns)
+
+        return self._copy(self._index[mask], columns)
+
+    def distance_to(self, latitude, longitude):
+        """Compute the distance from every row to the given point.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+
+        Returns:
+            numpy.ndarray: Great-circle distances in meters.
+        """
+        return geomath.haversine(
+            self.latitude, self.longitude, latitude, longitude)
+
+    def within(self, latitude, longitude, radius):
+        """Obtain the rows within a given radius of a point.
+
+        Args:
+            latitude (double): Latitude in decimal degrees.
+            longitude (double): Longitude in decimal degrees.
+            radius (int): Radius (in meters) of the search.
+
+        Returns:
+            Table of the same type with the selected rows.
+        """
+        return self.filter(self.distance_to(latitude, longitude) <= radius)
+
+    def to_objects(self):
+        """Convert the rows of the table to their object type.
+
+        Returns:
+            list: Objects built from the original response items.
+        """
+        return [self._type.from_json(self._json[i]) for i in self._index]
+
+    def raw_items(self):
+        """Obtain the original response items of the rows of the table.
+
+        Returns:
+            list[dict]: Response items, in the order of the rows.
+        """
+        return [self._json[i] for i in self._index]
+
+    def _copy(self, index, columns):
+        """Create a table of the same type sharing the original response."""
+        return self.__class__(self._json, index, **columns)
+
+
+class RouteTable(_Table):
+    """Columnar version of a list of ``RouteLinesItem``.
+
+    Attributes:
+        id (numpy.ndarray): Node IDs.
+        line (numpy.ndarray): Line to which each node belongs.
+        node_type (numpy.ndarray): Node type codes (see ``SEC_DETAILS``).
+        distance_orig (numpy.ndarray): Distances to origin in meters.
+        distance_prev (numpy.ndarray): Distances to previous stop in meters.
+        name (numpy.ndarray): Names of the stops.
+        latitude (numpy.ndarray): Latitudes in decimal degrees.
+        longitude (numpy.ndarray): Longitudes in decimal degrees.
+    """
+
+    columns = (
+        'id', 'line', 'node_type', 'distance_orig', 'distance_prev', 'name',
+        'latitude', 'longitude'
+    )
+
+    _type = emtype.RouteLinesItem
+
+    @classmethod
+    def from_values(cls, values):
+        """Build the table from the ``resultValues`` of a route response.
+
+        Args:
+            values (list[dict]): Response items.
+
+        Returns:
+            RouteTable: Parsed table.
+        """
+        require_numpy('columnar results')
+
+        return cls(
+            values,
+            id=_column(values, 'node', np.int32, -1),
+            line=_column(values, 'line', np.int32, -1),
+            node_type=_column(values, 'secDetail', np.int8, 10),
+            distance_orig=_column(values, 'distance', np.float64, np.nan),
+            distance_prev=_column(
+                values, 'distancePreviousStop', np.float64, np.nan),
+            name=_string_column(values, 'name'),
+            latitude=_column(values, 'latitude', np.float64, np.nan),
+            longitude=_column(values, 'longitude', np.float64, np.nan)
+        )
+
+    def stops(self):
+        """Obtain only the rows that correspond to stops (not vertices).
+
+        Returns:
+            RouteTable: Table with the stops of the route.
+        """
+        return self.filter((self.node_type == 10) | (self.node_type == 20))
+
+    def direction(self, direction):
+        """Obtain only the rows of a given direction.
+
+        Args:
+            direction (str): *forward* or *backward*.
+
+        Returns:
+            RouteTable: Table with the nodes of the given direction.
+        """
+        if direction == 'backward':
+            return self.filter(self.node_type >= 20)
+
+        return self.filter(self.node_type < 20)
+
+
+class StopTable(_Table):
+    """Columnar version of a list of ``Stop`` or ``NodeLinesItem``.
+
+    Attributes:
+        id (numpy.ndarray): Stop IDs.
+        name (numpy.ndarray): Names of the stops.
+        latitude (numpy.ndarray): Latitudes in decimal degrees.
+        longitude (numpy.ndarray): Longitudes in decimal degrees.
+    """
+
+    columns = ('id', 'name', 'latitude', 'longitude')
+
+    def __init__(self, values, index=None, item_type=emtype.Stop, **columns):
+        super(StopTable, self).__init__(values, index, **columns)
+        self._type = item_type
+
+    @classmethod
+    def from_values(cls, values):
+        """Build the table from the items of a stop response.
+
+        Args:
+            values (list[dict]): Response items.
+
+        Returns:
+            StopTable: Parsed table.
+        """
+        return cls._from_values(values, 'stopId', emtype.Stop)
+
+    @classmethod
+    def from_nodes(cls, values):
+        """Build the table from the ``resultValues`` of a nodes response.
+
+        Args:
+            values (list[dict]): Response items.
+
+        Returns:
+            StopTable: Parsed table.
+        """
+        return cls._from_values(values, 'node', emtype.NodeLinesItem)
+
+    @classmethod
+    def _from_values(cls, values, id_key, item_type):
+        require_numpy('columnar results')
+
+        return cls(
+            values,
+            item_type=item_type,
+            id=_column(values, id_key, np.int32, -1),
+            name=_string_column(values, 'name'),
+            latitude=_column(values, 'latitude', np.float64, np.nan),
+            longitude=_column(values, 'longitude', np.float64, np.nan)
+        )
+
+    def node_lines(self):
+        """Obtain the lines of each node in a table built with ``from_nodes``.
+
+        Returns:
+            tuple: Three parallel ``numpy.ndarray`` with the row of the node
+            in this table, the line number and the direction code.
+        """
+        node, line, direction = decode_node_lines(self._json)
+
+        # Map positions in the response to rows in the table
+        rows = np.full(len(self._json), -1, dtype=np.int32)
+        rows[self._index] = np.arange(len(self._index))
+
+        node = rows[node]
+        keep = node >= 0
+
+        return node[keep], line[keep], direction[keep]
+
+    def _copy(self, index, columns):
+        return self.__class__(
+            self._json, index, item_type=self._type, **columns)
@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains a tracker of the buses seen in the arrivals of stops.
+
+The same bus is listed in the ``get_arrive_stop`` responses of many stops.
+The tracker merges those arrivals by bus ID into a single state per vehicle
+with its latest position and its estimated arrival at each polled stop, so a
+sparse set of stops of each line is enough to follow all its buses.
+"""
+
+import threading
+import time
+
+from pyemtmad import types as emtype
+from pyemtmad.watcher import TIME_LEFT_SENTINEL
+
+
+def sample_stops(graph, spacing=1500):
+    """Choose a sparse set of stops that covers every route of a graph.
+
+    Stops are taken along each route every ``spacing`` meters, plus the last
+    stop, so every bus on the route is approaching one of them.
+
+    Args:
+        graph (TransitGraph): Graph of the network.
+        spacing (double): Distance in meters between chosen stops.
+
+    Returns:
+        list[int]: Sorted IDs of the chosen stops.
+    """
+    chosen = set()
+
+    for route in range(graph.route_count):
+        start, end = graph.route_offsets[route:route + 2]
+        stops = graph.route_stops[start:end].tolist()
+        distance = graph.route_distance[start:end].tolist()
+
+        if not stops:
+            continue
+
+        # First stop at least ``spacing`` meters after the origin
+        last = distance[0]
+
+        for stop, position in zip(stops[1:], distance[1:]):
+            if position - last >= spacing:
+                chosen.add(stop)
+                last = position
+
+        chosen.add(stops[-1])
+
+    return sorted(int(graph.stop_ids[s]) for s in chosen)
+
+
+class Vehicle(object):
+    """State of a bus obtained from the arrivals of several stops.
+
+    Attributes:
+        bus_id (int): ID of the bus.
+        line_id (string): Line of the bus.
+        destination (string): Destination of the bus.
+        latitude (double): Latest known latitude.
+        longitude (double): Latest known longitude.
+        position_type (string): *real* or *estimate*.
+        position_at (double): Timestamp of the arrival that gave the
+            position.
+        seen_at (double): Timestamp of the latest arrival of the bus.
+        etas (dict): ``(time_left, timestamp)`` of the latest arrival at
+            each stop, indexed by stop ID.
+    """
+
+    def __init__(self, bus_id, line_id, destination):
+        self.bus_id = bus_id
+        self.line_id = line_id
+        self.destination = destination
+        self.latitude = None
+        self.longitude = None
+        self.position_type = None
+        self.position_at = None
+        self.seen_at = None
+        self.etas = {}
+
+    def __repr__(self):
+        return '<Vehicle %s line %s (%s, %s)>' % (
+            self.bus_id, self.line_id, self.latitude, self.longitude)
+
+    def eta(self, stop_id, now=None):
+        """Obtain the seconds left for the bus to reach a stop.
+
+        Args:
+            stop_id (int): ID of the stop.
+            now (double): Optional, current timestamp.
+
+        Returns:
+            int: Seconds left (discounting the time since the arrival was
+            obtained), ``TIME_LEFT_SENTINEL`` if 20+ minutes remain, or None
+            if the stop is unknown.
+        """
+        entry = self.etas.get(int(stop_id))
+
+        if entry is None:
+            return None
+
+        time_left, observed = entry
+
+        if time_left >= TIME_LEFT_SENTINEL:
+            return TIME_LEFT_SENTINEL
+
+        now = time.time() if now is None else now
+        return max(int(time_left - (now - observed)), 0)
+
+    def next_stops(self, now=None):
+        """Obtain the known stops ahead of the bus, nearest first.
+
+        Args:
+            now (double): Optional, current timestamp.
+
+        Returns:
+            list[tuple]: Stop ID and seconds left (see ``eta()``).
+        """
+        now = time.time() if now is None else now
+        return sorted(
+            ((stop, self.eta(stop, now)) for stop in self.etas),
+            key=lambda e: (e[1], e[0]))
+
+
+class VehicleTracker(object):
+    """Tracker of the buses that appear in the arrivals of stops.
+
+    Positions marked as *real* are preferred over estimates unless they are
+    older than ``real_max_age`` seconds. Buses that do not appear in any
+    response for ``max_age`` seconds are forgotten.
+
+    Attributes:
+        max_age (double): Seconds after which an unseen bus is forgotten.
+        real_max_age (double): Seconds during which a real position is kept
+            over newer estimates.
+    """
+
+    def __init__(self, max_age=300, real_max_age=30):
+        self.max_age = max_age
+        self.real_max_age = real_max_age
+
+        self._vehicles = {}
+        self._lock = threading.Lock()
+
+        # Buses listed in the latest response of each stop
+        self._stop_buses = {}
+
+    def __len__(self):
+        """Number of tracked vehicles."""
+        return len(self._vehicles)
+
+    def __iter__(self):
+        return iter(list(self._vehicles.values()))
+
+    def __contains__(self, bus_id):
+        return int(bus_id) in self._vehicles
+
+    def get(self, bus_id):
+        """Obtain a vehicle by its bus ID, or None if it is not tracked."""
+        return self._vehicles.get(int(bus_id))
+
+    def on_line(self, line_id):
+        """Obtain the tracked vehicles of a line.
+
+        Args:
+            line_id (string): Line ID, as in ``Arrival.line_id``.
+
+        Returns:
+            list[Vehicle]: Vehicles sorted by bus ID.
+        """
+        line_id = str(line_id)
+        return sorted(
+            (v for v in self if str(v.line_id) == line_id),
+            key=lambda v: v.bus_id)
+
+    def update(self, stop_id, arrivals, observed_at=None):
+        """Merge the arrivals of a stop.
+
+        Buses that were listed in the previous response of the stop but not
+        in this one are considered to have passed it.
+
+        Args:
+            stop_id (int): ID of the stop.
+            arrivals (list): ``Arrival`` objects or raw response items.
+            observed_at (double): Optional, timestamp of the response.
+
+        Returns:
+            list[Vehicle]: Vehicles listed in the response.
+        """
+        stop_id = int(stop_id)
+        now = time.time() if observed_at is None else observed_at
+        seen = []
+
+        with self._lock:
+            for arrival in arrivals:
+                if isinstance(arrival, dict):
+                    arrival = emtype.Arrival.from_json(arrival)
+
+                if arrival.bus_id is None or arrival.bus_id < 0:
+                    continue
+
+                vehicle = self._merge(stop_id, arrival, now)
+                seen.append(vehicle)
+
+            current = set(v.bus_id for v in seen)
+
+            for bus_id in self._stop_buses.get(stop_id, set()) - current:
+                vehicle = self._vehicles.get(bus_id)
+
+                if vehicle is not None:
+                    vehicle.etas.pop(stop_id, None)
+
+            self._stop_buses[stop_id] = current
+            self._expire(now)
+
+        return seen
+
+    def update_from(self, update):
+        """Merge the arrivals of a ``StopUpdate`` of a ``StopWatcher``.
+
+        Failed requests are ignored.
+        """
+        if update.arrivals is not None:
+            self.update(update.stop_id, update.arrivals, update.polled_at)
+
+    def attach(self, watcher):
+        """Merge the updates of a ``StopWatcher`` as they are produced.
+
+        Returns:
+            Function registered in the watcher, which can be passed to
+            ``watcher.remove_callback()``.
+        """
+        watcher.add_callback(self.update_from)
+        return self.update_from
+
+    def expire(self, now=None):
+        """Forget the vehicles not seen for ``max_age`` seconds.
+
+        Returns:
+            int: Number of forgotten vehicles.
+        """
+        with self._lock:
+            return self._expire(time.time() if now is None else now)
+
+    def _merge(self, stop_id, arrival, now):
+        """Merge an arrival into the state of its vehicle."""
+        vehicle = self._vehicles.get(arrival.bus_id)
+
+        if vehicle is None:
+            vehicle = self._vehicles[arrival.bus_id] = Vehicle(
+                arrival.bus_id, arrival.line_id, arrival.destination)
+
+        vehicle.line_id = arrival.line_id
+        vehicle.destination = arrival.destination
+        vehicle.seen_at = max(vehicle.seen_at or now, now)
+
+        try:
+            vehicle.etas[stop_id] = (int(float(arrival.time_left)), now)
+
+        except (TypeError, ValueError):
+            vehicle.etas.pop(stop_id, None)
+
+        if arrival.latitude is not None and arrival.longitude is not None \
+                and self._better_position(vehicle, arrival, now):
+            vehicle.latitude = float(arrival.latitude)
+            vehicle.longitude = float(arrival.longitude)
+            vehicle.position_type = arrival.position_type
+            vehicle.position_at = now
+
+        return vehicle
+
+    def _better_position(self, vehicle, arrival, now):
+        """Check if an arrival has a better position than the vehicle."""
+        if vehicle.position_at is None:
+            return True
+
+        if vehicle.position_type == 'real' \
+                and arrival.position_type != 'real':
+            # Keep a recent real position over estimates
+            return now - vehicle.position_at > self.real_max_age
+
+        return now >= vehicle.position_at
+
+    def _expire(self, now):
+        """Remove the vehicles not seen recently (lock must be held)."""
+        expired = [
+            bus_id for bus_id, vehicle in self._vehicles.items()
+            if now - vehicle.seen_at > self.max_age
+        ]
+
+        for bus_id in expired:
+            del self._vehicles[bus_id]
+
+        return len(expired)
@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains a precomputed table of walking transfers between stops.
+
+Every pair of stops within a maximum distance is found in a single vectorized
+pass: stops are assigned to square cells as large as that distance, so the
+neighbors of a stop can only be in its cell or the eight surrounding ones.
+The pairs are stored in CSR arrays, sorted by distance within each stop, and
+can be used as the walking transfers of the journey planner. NumPy is
+required.
+"""
+
+from pyemtmad import geomath
+from pyemtmad.util import np, require_numpy
+
+
+def _pairs(latitude, longitude, max_distance, sources=None):
+    """Find the pairs of points within a distance.
+
+    Args:
+        latitude (numpy.ndarray): Latitudes of the points.
+        longitude (numpy.ndarray): Longitudes of the points.
+        max_distance (double): Maximum distance in meters.
+        sources (numpy.ndarray): Optional, only find the pairs that start in
+            these points.
+
+    Returns:
+        tuple: Three ``numpy.ndarray`` with the first and second point of
+        each pair and their distance. Points without coordinates are ignored.
+    """
+    valid = np.flatnonzero(~(np.isnan(latitude) | np.isnan(longitude)))
+    empty = np.zeros(0, dtype=np.int64)
+
+    if not len(valid) or max_distance <= 0:
+        return empty, empty, np.zeros(0)
+
+    # Square cells in an equirectangular projection
+    scale = geomath.EARTH_RADIUS / max_distance
+    x = np.radians(longitude[valid]) \
+        * np.cos(np.radians(np.mean(latitude[valid]))) * scale
+    y = np.radians(latitude[valid]) * scale
+
+    cell_x = np.floor(x).astype(np.int64)
+    cell_y = np.floor(y).astype(np.int64)
+    cell_x -= cell_x.min() - 1
+    cell_y -= cell_y.min() - 1
+
+    # Margin of one cell so that neighbor keys never wrap around
+    width = cell_y.max() + 2
+    keys = cell_x * width + cell_y
+    order = np.argsort(keys, kind='mergesort')
+    sorted_keys = keys[order]
+
+    if sources is None:
+        sources = np.arange(len(valid))
+
+    else:
+        # Positions of the sources among the valid points, sources without
+        # coordinates have none
+        sources = np.flatnonzero(np.isin(valid, sources))
+
+    rows = []
+    columns = []
+
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            target = keys[sources] + dx * width + dy
+            start = np.searchsorted(sorted_keys, target, 'left')
+            counts = np.searchsorted(sorted_keys, target, 'right') - start
+
+            total = counts.sum()
+            first = np.repeat(np.cumsum(counts) - counts, counts)
+
+            rows.append(np.repeat(sources, counts))
+            columns.append(order[
+                np.repeat(start, counts) + np.arange(total) - first])
+
+    rows = valid[np.concatenate(rows)]
+    columns = valid[np.concatenate(columns)]
+
+    distance = geomath.haversine(
+        latitude[rows], longitude[rows],
+        latitude[columns], longitude[columns])
+    keep = (rows != columns) & (distance <= max_distance)
+
+    return rows[keep], columns[keep], distance[keep]
+
+def _same(old, new):
+    """Check which coordinates did not change, NaN being equal to NaN."""
+    return (old == new) | (np.isnan(old) & np.isnan(new))
+
+def _stop_arrays(stops):
+    """Obtain the IDs and coordinates of a list of stops."""
+    stop_ids = [
+        s.get('node', s.get('stopId')) if isinstance(s, dict) else s.id
+        for s in stops
+    ]
+    latitude, longitude = geomath.coordinates(stops)
+
+    return stop_ids, latitude, longitude
+
+
+class TransferIndex(object):
+    """Walking transfers between the stops of the network.
+
+    Stops are identified by their position in the sorted ``stop_ids`` array,
+    which matches the stop indexes of a ``TransitGraph`` built with the same
+    stops, so the index can be passed as the ``footpaths`` of a ``Planner``.
+
+    Attributes:
+        stop_ids (numpy.ndarray): ID of each stop (sorted).
+        latitude (numpy.ndarray): Latitude of each stop.
+        longitude (numpy.ndarray): Longitude of each stop.
+        max_distance (double): Maximum walking distance in meters.
+        walk_speed (double): Walking speed in meters per second.
+        offsets (numpy.ndarray): CSR offsets of ``targets``.
+        targets (numpy.ndarray): Stop indexes reachable from each stop,
+            sorted by distance.
+        distances (numpy.ndarray): Distance (in meters) to each target.
+        durations (numpy.ndarray): Walking time (in seconds) to each target.
+    """
+
+    def __init__(self, stop_ids, latitude, longitude, max_distance=400,
+                 walk_speed=1.3):
+        """Build the transfer table.
+
+        Args:
+            stop_ids (list): IDs of the stops.
+            latitude (list): Latitude of each stop.
+            longitude (list): Longitude of each stop.
+            max_distance (double): Maximum walking distance in meters.
+            walk_speed (double): Walking speed in meters per second.
+        """
+        require_numpy('the transfer table')
+
+        self.max_distance = float(max_distance)
+        self.walk_speed = float(walk_speed)
+
+        self._set_stops(stop_ids, latitude, longitude)
+        self._set_pairs(*_pairs(
+            self.latitude, self.longitude, self.max_distance))
+
+    @classmethod
+    def from_graph(cls, graph, max_distance=400, walk_speed=1.3):
+        """Build the transfer table of the stops of a ``TransitGraph``.
+
+        Args:
+            graph (TransitGraph): Graph of the network.
+            max_distance (double): Maximum walking distance in meters.
+            walk_speed (double): Walking speed in meters per second.
+
+        Returns:
+            TransferIndex: Transfers indexed as the stops of the graph.
+        """
+        return cls(
+            graph.stop_ids, graph.stop_latitude, graph.stop_longitude,
+            max_distance, walk_speed)
+
+    @classmethod
+    def from_stops(cls, stops, max_distance=400, walk_speed=1.3):
+        """Build the transfer table from a list of stops.
+
+        Args:
+            stops (list): ``Stop`` or ``NodeLinesItem`` objects, or raw
+                items of a ``get_nodes_lines`` response.
+            max_distance (double): Maximum walking distance in meters.
+            walk_speed (double): Walking speed in meters per second.
+
+        Returns:
+            TransferIndex: Transfers between the stops.
+        """
+        stop_ids, latitude, longitude = _stop_arrays(stops)
+        return cls(stop_ids, latitude, longitude, max_distance, walk_speed)
+
+    def _set_stops(self, stop_ids, latitude, longitude):
+        """Store the stops sorted by ID, without duplicates."""
+        self.stop_ids, first = np.unique(
+            np.asarray(stop_ids, dtype=np.int64), return_index=True)
+        self.latitude = geomath.float_array(latitude)[first]
+        self.longitude = geomath.float_array(longitude)[first]
+
+        self._stop_index = dict(
+            (stop, index) for index, stop in enumerate(self.stop_ids.tolist()))
+
+    def _set_pairs(self, rows, columns, distance):
+        """Build the CSR arrays from the pairs of stops."""
+        # Sort by stop, distance (as stored) and target, so that the order
+        # does not depend on how the pairs were found
+        distance = distance.astype(np.float32)
+        order = np.lexsort((columns, distance, rows))
+
+        self.offsets = np.zeros(len(self.stop_ids) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(rows, minlength=len(self.stop_ids)),
+            out=self.offsets[1:])
+
+        self.targets = columns[order].astype(np.int32)
+        self.distances = distance[order]
+        self.durations = np.ceil(
+            self.distances / self.walk_speed).astype(np.int32)
+
+    def __len__(self):
+        """Number of transfers (in one direction) in the table."""
+        return len(self.targets)
+
+    @property
+    def stop_count(self):
+        """Number of stops in the table."""
+        return len(self.stop_ids)
+
+    def stop_index(self, stop_id):
+        """Obtain the index of a stop, or None if it is not in the table."""
+        return self._stop_index.get(int(stop_id))
+
+    def neighbors(self, stop_id, max_distance=None):
+        """Obtain the stops within walking distance of a stop.
+
+        Args:
+            stop_id (int): ID of the stop.
+            max_distance (double): Optional, distance (in meters) smaller than
+                the one of the table.
+
+        Returns:
+            tuple: Two ``numpy.ndarray`` with the stop IDs and their distance,
+            sorted by distance. Empty if the stop is not in the table.
+        """
+        stop = self.stop_index(stop_id)
+
+        if stop is None:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        start, end = self.offsets[stop:stop + 2]
+        distances = self.distances[start:end]
+
+        if max_distance is not None:
+            end = start + np.searchsorted(distances, max_distance, 'right')
+            distances = distances[:end - start]
+
+        return self.stop_ids[self.targets[start:end]], distances
+
+    def update(self, stop_ids, latitude, longitude):
+        """Update the table to a new list of stops.
+
+        Only the transfers of the stops that were added, moved or removed are
+        computed again.
+
+        Args:
+            stop_ids (list): IDs of all the stops.
+            latitude (list): Latitude of each stop.
+            longitude (list): Longitude of each stop.
+
+        Returns:
+            int: Number of stops that were added, moved or removed.
+        """
+        old_ids = self.stop_ids
+        old_latitude = self.latitude
+        old_longitude = self.longitude
+        old_rows = np.repeat(
+            np.arange(len(old_ids)), np.diff(self.offsets))
+        old_columns = self.targets.astype(np.int64)
+        old_distance = self.distances.astype(np.float64)
+
+        self._set_stops(stop_ids, latitude, longitude)
+
+        # New index of each old stop, or -1 if it was removed
+        position = np.searchsorted(self.stop_ids, old_ids)
+        position[position == len(self.stop_ids)] = 0
+        kept = self.stop_ids[position] == old_ids if len(self.stop_ids) \
+            else np.zeros(len(old_ids), dtype=bool)
+        mapping = np.where(kept, position, -1)
+
+        # Stops that moved, including those whose coordinates became unknown
+        same = np.zeros(len(old_ids), dtype=bool)
+        same[kept] = \
+            _same(old_latitude[kept], self.latitude[mapping[kept]]) \
+            & _same(old_longitude[kept], self.longitude[mapping[kept]])
+
+        changed = np.ones(len(self.stop_ids), dtype=bool)
+        changed[mapping[same]] = False
+        sources = np.flatnonzero(changed)
+
+        # Keep the transfers between unchanged stops
+        keep = same[old_rows] & same[old_columns]
+        rows = [mapping[old_rows[keep]]]
+        columns = [mapping[old_columns[keep]]]
+        distance = [old_distance[keep]]
+
+        # Transfers from the changed stops and back to them
+        new_rows, new_columns, new_distance = _pairs(
+            self.latitude, self.longitude, self.max_distance, sources)
+        back = ~changed[new_columns]
+
+        rows += [new_rows, new_columns[back]]
+        columns += [new_columns, new_rows[back]]
+        distance += [new_distance, new_distance[back]]
+
+        self._set_pairs(
+            np.concatenate(rows), np.concatenate(columns),
+            np.concatenate(distance))
+
+        return len(sources) + int(np.count_nonzero(~kept))
+
+    def save(self, path):
+        """Save the table to a file.
+
+        Args:
+            path: File name or file object, as accepted by ``numpy.savez``.
+        """
+        np.savez_compressed(
+            path, stop_ids=self.stop_ids, latitude=self.latitude,
+            longitude=self.longitude, offsets=self.offsets,
+            targets=self.targets, distances=self.distances,
+            settings=np.array([self.max_distance, self.walk_speed]))
+
+    @classmethod
+    def load(cls, path):
+        """Load a table saved with ``save()``.
+
+        Args:
+            path: File name or file object, as accepted by ``numpy.load``.
+
+        Returns:
+            TransferIndex: Loaded table.
+        """
+        require_numpy('the transfer table')
+
+        index = cls.__new__(cls)
+
+        with np.load(path) as data:
+            index.max_distance, index.walk_speed = \
+                data['settings'].tolist()
+            index._set_stops(
+                data['stop_ids'], data['latitude'], data['longitude'])
+
+            index.offsets = data['offsets']
+            index.targets = data['targets']
+            index.distances = data['distances']
+
+        index.durations = np.ceil(
+            index.distances / index.walk_speed).astype(np.int32)
+
+        return index
+
@@ -18,8 +18,11 @@
 
 """This file contains type definitions for the data returned by the API."""
 
+import collections
 import datetime
 
+from pyemtmad import util
+
 WEEK_DAYS = {
     'L': 'Monday',
     'M': 'Tuesday',
@@ -73,8 +76,249 @@ PARKING_POI_TYPES = {
     'Parking' : 'parking'
 }
 
+POSITION_TYPES = {
+    0: 'real',
+    1: 'estimate'
+}
+
+SITE_TYPES = {
+    'C': 'street',
+    'P': 'poi'
+}
+
+DIRECTIONS = {
+    1: 'forward',
+    2: 'backward'
+}
+
+HEADER_DIRECTIONS = {
+    'A': 'forward',
+    'B': 'backward'
+}
+
+STRIKE = {
+    'Y': True,
+    'N': False
+}
+
+
+class Field(object):
+    """Definition of an attribute of a parsed type.
+
+    Attributes:
+        key (str | tuple | None): Key of the value in the API response. A
+            ``(parent, key)`` tuple obtains the value from a nested dict. If
+            ``None``, the whole response is passed to the converter.
+        name (str): Name of the attribute in the parsed type.
+        converter: Function applied to the value, if any.
+        default: Value used when the key is not present in the response.
+    """
+
+    def __init__(self, key, name, converter=None, default=None):
+        self.key = key
+        self.name = name
+        self.converter = converter
+        self.default = default
+
+
+def compile_parser(fields, item_type):
+    """Generate the functions that parse a response using a field spec.
+
+    The generated code obtains every value with a direct ``dict.get()`` and
+    inlines the dict lookups of the spec. ``from_json()`` also builds the
+    attributes of the instance in a single dict literal and avoids the copy
+    of the response made by ``**kwargs``, which makes it the fastest way to
+    parse large lists of items.
+
+    Args:
+        fields (tuple[Field]): Definition of the attributes.
+        item_type (type): Class whose instances are built.
+
+    Returns:
+        Tuple with three functions:
+
+        - ``parse(kwargs)``: returns a dict with the parsed attributes.
+        - ``__init__(self, **kwargs)``: sets the attributes of an instance.
+        - ``from_json(kwargs)``: builds an instance without copying the
+          response into a new ``kwargs`` dict.
+
+        Their source code is available in their ``source`` attribute.
+    """
+    namespace = {'_cls': item_type, '_new': object.__new__}
+    parents = {}
+    setup = ['    get = kwargs.get']
+    attributes = []
+    values = []
+
+    for index, field in enumerate(fields):
+        if field.key is None:
+            value = 'kwargs'
+
+        else:
+            getter = 'get'
+            key = field.key
+
+            if isinstance(key, tuple):
+                parent, key = key
+
+                if parent not in parents:
+                    parents[parent] = '_p%d' % len(parents)
+                    setup.append(
+                        '    %s = get(%r) or {}' % (parents[parent], parent))
+
+                getter = parents[parent] + '.get'
+
+            if field.default is None:
+                value = '%s(%r)' % (getter, key)
+
+            else:
+                namespace['_d%d' % index] = field.default
+                value = '%s(%r, _d%d)' % (getter, key, index)
+
+        converter = field.converter
+
+        if isinstance(converter, _Lookup):
+            namespace['_m%d' % index] = converter.mapping
+            namespace['_md%d' % index] = converter.default
+            value = '_m%d.get(%s, _md%d)' % (index, value, index)
+
+        elif converter is not None:
+            namespace['_c%d' % index] = converter
+            value = '_c%d(%s)' % (index, value)
+
+        attributes.append((field.name, value))
+        values.append('        %r: %s,' % (field.name, value))
+
+    parse = ['def parse(kwargs):'] + setup + ['    return {'] + values
+    parse.append('    }')
+
+    init = ['def __init__(self, **kwargs):'] + setup
+    init += ['    self.%s = %s' % a for a in attributes]
+    init += ['    self._json = kwargs']
+
+    from_json = ['def from_json(kwargs):'] + setup
+    from_json += ['    self = _new(_cls)', '    self.__dict__ = {'] + values
+    from_json += ["        '_json': kwargs,", '    }', '    return self']
+
+    functions = []
+    for lines in (parse, init, from_json):
+        source = '\n'.join(lines) + '\n'
+        code = {}
+        exec(compile(source, '<%s>' % lines[0], 'exec'), namespace, code)
+
+        function = list(code.values())[0]
+        function.source = source
+        functions.append(function)
+
+    return tuple(functions)
 
-class Arrival(object):
+def _clean(value):
+    """Remove escape characters and surrounding whitespace."""
+    return value.replace('\\', '').strip()
+
+def _strip(value):
+    """Remove surrounding whitespace."""
+    return value.strip()
+
+def _is_head(value):
+    """Convert the ``isHead`` flag of an arrival."""
+    return False if value == 'False' else True
+
+class _Lookup(object):
+    """Converter that translates values using a dict.
+
+    The lookup is inlined in the code generated by ``compile_parser()``.
+    """
+
+    def __init__(self, mapping, default=None):
+        self.mapping = mapping
+        self.default = default
+
+    def __call__(self, value):
+        return self.mapping.get(value, self.default)
+
+_lookup = _Lookup
+
+def _direction(value):
+    """Convert a numeric direction code."""
+    return DIRECTIONS.get(int(value))
+
+def _poi_type(value):
+    """Convert a POI type code that may be a string."""
+    return POI_TYPES.get(int(value), '')
+
+def _poi_type_id(value):
+    """Convert a POI type code to its number, or -1 if it is not valid."""
+    try:
+        return int(value)
+
+    except (TypeError, ValueError):
+        return -1
+
+def _item_of(type_name):
+    """Obtain a converter that parses a nested item."""
+    def convert(value):
+        if value is None:
+            return None
+
+        return globals()[type_name].from_json(value)
+
+    return convert
+
+def _list_of(type_name):
+    """Obtain a converter that parses one or several nested items."""
+    def convert(value):
+        if value is None:
+            return None
+
+        from_json = globals()[type_name].from_json
+
+        if isinstance(value, dict):
+            # Single item
+            return [from_json(value)]
+
+        return [from_json(a) for a in value]
+
+    return convert
+
+def _line_date(kwargs):
+    """Obtain the date of a line, which depends on the endpoint used."""
+    if 'date' in kwargs:
+        # Extended version returns a timestamp
+        return datetime.datetime.fromtimestamp(kwargs.get('date', 0) / 1e3)
+
+    elif 'string' in kwargs:
+        # Basic
+        return _clean(kwargs.get('string', ''))
+
+    return None
+
+def _node_lines(lines):
+    """Convert the ``'line/direction'`` strings of a node."""
+    result = []
+
+    for line in lines or []:
+        if line:
+            elements = _clean(line).split('/')
+            # 1 = forward, 2 = backward
+            direction = 'forward' if elements[1] == '1' else 'backward'
+            result.append((int(elements[0]), direction))
+
+    return result
+
+
+class _ParsedType(object):
+    """Base class of the types returned by the API.
+
+    Each type declares its attributes in ``_fields``. When this module is
+    loaded, the spec is compiled into the ``__init__()``, ``_parse()`` and
+    ``from_json()`` methods of the type (see ``compile_parser()``).
+    """
+
+    _fields = ()
+
+
+class Arrival(_ParsedType):
     """
     Attributes:
         stop_id (int): Stop ID.
@@ -92,29 +336,21 @@ class Arrival(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.stop_id = kwargs.get('stopId')
-        self.line_id = kwargs.get('lineId')
-        self.is_head = False if kwargs.get('isHead') == 'False' else True
-        self.destination = kwargs.get('destination')
-        self.bus_id = int(kwargs.get('busId', '-1'))
-        self.time_left = kwargs.get('busTimeLeft')
-        self.distance = kwargs.get('busDistance')
-        self.longitude = kwargs.get('longitude')
-        self.latitude = kwargs.get('latitude')
-
-        pos_type = kwargs.get('busPositionType')
-        if pos_type == 0:
-            self.position_type = 'real'
-
-        elif pos_type == 1:
-            self.position_type = 'estimate'
-
-
-        self._json = kwargs
-
-
-class BusGroupItem(object):
+    _fields = (
+        Field('stopId', 'stop_id'),
+        Field('lineId', 'line_id'),
+        Field('isHead', 'is_head', _is_head),
+        Field('destination', 'destination'),
+        Field('busId', 'bus_id', int, '-1'),
+        Field('busTimeLeft', 'time_left'),
+        Field('busDistance', 'distance'),
+        Field('longitude', 'longitude'),
+        Field('latitude', 'latitude'),
+        Field('busPositionType', 'position_type', _lookup(POSITION_TYPES))
+    )
+
+
+class BusGroupItem(_ParsedType):
     """
     Attributes:
         id (int): Group ID.
@@ -123,17 +359,16 @@ class BusGroupItem(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.id = int(kwargs.get('groupId'))
-        self.description = kwargs.get('groupDescription').strip()
+    _fields = (
+        Field('groupId', 'id', int),
+        Field('groupDescription', 'description', _strip)
+    )
 
-        self._json = kwargs
 
-
-class CalendarItem(object):
+class CalendarItem(_ParsedType):
     """
     Attributes:
-        date (string): Date in DD/MM/YYYY H:mm:ss format.
+        date (datetime): Date of the calendar item.
         day_type (string): Day type. May be:
             - labour (LA)
             - friday (F)
@@ -152,31 +387,21 @@ class CalendarItem(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.date = kwargs.get('date', '').replace('\\', '').strip()
-        self.week = kwargs.get('week')
-        self.month = kwargs.get('month')
-        self.trimester = kwargs.get('trimester')
-        self.quarter = kwargs.get('quarter')
-        self.semester = kwargs.get('semester')
-        self.year = kwargs.get('year')
-
-        self.day_type = DAY_TYPES.get(kwargs.get('typeDay'), 'Labour')
-
-        on_strike = kwargs.get('strike', 'N')
-        if on_strike == 'Y':
-            self.strike = True
-
-        elif on_strike == 'N':
-            self.strike = False
-
-        day_week = kwargs.get('dayOfWeek')
-        self.day_of_week = WEEK_DAYS.get(day_week, 'Monday')
-
-        self._json = kwargs
-
-
-class DayType(object):
+    _fields = (
+        Field('date', 'date', util.parse_datetime, ''),
+        Field('week', 'week'),
+        Field('month', 'month'),
+        Field('trimester', 'trimester'),
+        Field('quarter', 'quarter'),
+        Field('semester', 'semester'),
+        Field('year', 'year'),
+        Field('typeDay', 'day_type', _lookup(DAY_TYPES, 'Labour')),
+        Field('strike', 'strike', _lookup(STRIKE), 'N'),
+        Field('dayOfWeek', 'day_of_week', _lookup(WEEK_DAYS, 'Monday'))
+    )
+
+
+class DayType(_ParsedType):
     """
     Attributes:
         day_type (string): Day type. May be:
@@ -190,15 +415,14 @@ class DayType(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.day_type = DAY_TYPES.get(kwargs.get('dayTypeId'), 'Labour')
-        self.dir_forward = Direction(**kwargs.get('direction1'))
-        self.dir_backward = Direction(**kwargs.get('direction2'))
+    _fields = (
+        Field('dayTypeId', 'day_type', _lookup(DAY_TYPES, 'Labour')),
+        Field('direction1', 'dir_forward', _item_of('Direction')),
+        Field('direction2', 'dir_backward', _item_of('Direction'))
+    )
 
-        self._json = kwargs
 
-
-class Direction(object):
+class Direction(_ParsedType):
     """
     Attributes:
         start_time (string): Starting time in HH:mm.
@@ -211,18 +435,16 @@ class Direction(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.start_time = kwargs.get('startTime')
-        self.end_time = kwargs.get('endTime')
-        self.minimum_frequency = kwargs.get('minimumFrequency')
-        self.maximum_frequency = kwargs.get('maximumFrequency')
-        self.frequency_description = kwargs.get('frequencyDescription', '') \
-                .replace('\\', '').strip()
-
-        self._json = kwargs
+    _fields = (
+        Field('startTime', 'start_time'),
+        Field('endTime', 'end_time'),
+        Field('minimumFrequency', 'minimum_frequency'),
+        Field('maximumFrequency', 'maximum_frequency'),
+        Field('frequencyDescription', 'frequency_description', _clean, '')
+    )
 
 
-class GeoGroupItem(object):
+class GeoGroupItem(_ParsedType):
     """
     Attributes:
         id (int): group ID.
@@ -234,17 +456,16 @@ class GeoGroupItem(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.id = kwargs.get('groupId')
-        self.subgroup = kwargs.get('subGroupId')
-        self.start_date = kwargs.get('startDate')
-        self.end_date = kwargs.get('endDate')
-        self.description = kwargs.get('description')
-
-        self._json = kwargs
+    _fields = (
+        Field('groupId', 'id'),
+        Field('subGroupId', 'subgroup'),
+        Field('startDate', 'start_date'),
+        Field('endDate', 'end_date'),
+        Field('description', 'description')
+    )
 
 
-class IconDescription(object):
+class IconDescription(_ParsedType):
     """
     Attributes:
         classification (str): Localized name of the group of the icon.
@@ -256,17 +477,16 @@ class IconDescription(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.classification = kwargs.get('classificationTranslated')
-        self.classification_spanish = kwargs.get('classification')
-        self.description = kwargs.get('description')
-        self.icon_name = kwargs.get('iconName')
-        self.url_icon = kwargs.get('urlIcon')
+    _fields = (
+        Field('classificationTranslated', 'classification'),
+        Field('classification', 'classification_spanish'),
+        Field('description', 'description'),
+        Field('iconName', 'icon_name'),
+        Field('urlIcon', 'url_icon')
+    )
 
-        self._json = kwargs
 
-
-class InfoParkingPoi(object):
+class InfoParkingPoi(_ParsedType):
     """
     Attributes:
         id (int): Parking or POI ID. They are identified with (family, id).
@@ -294,31 +514,31 @@ class InfoParkingPoi(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.id = kwargs.get('id')
-        self.name = kwargs.get('name')
-        self.address = kwargs.get('address')
-        self.type = kwargs.get('type')
-        self.type_code = kwargs.get('typeCode')
-        self.administrative_area = kwargs.get('administrativeArea')
-        self.area_code = int(kwargs.get('areaCode', '-1'))
-        self.category = kwargs.get('category')
-        self.category_code = kwargs.get('categoryCode')
-        self.country = kwargs.get('country')
-        self.email = kwargs.get('email')
-        self.family = kwargs.get('familyName')
-        self.family_code = kwargs.get('family')
-        self.fax = kwargs.get('fax')
-        self.url_icon = kwargs.get('icon')
-        self.state = kwargs.get('state')
-        self.telephone = kwargs.get('telephone')
-        self.town = kwargs.get('town')
-        self.latitude = float(kwargs.get('latitude', '0.0'))
-        self.longitude = float(kwargs.get('longitude', '0.0'))
-
-        self._json = kwargs
-
-class Line(object):
+    _fields = (
+        Field('id', 'id'),
+        Field('name', 'name'),
+        Field('address', 'address'),
+        Field('type', 'type'),
+        Field('typeCode', 'type_code'),
+        Field('administrativeArea', 'administrative_area'),
+        Field('areaCode', 'area_code', int, '-1'),
+        Field('category', 'category'),
+        Field('categoryCode', 'category_code'),
+        Field('country', 'country'),
+        Field('email', 'email'),
+        Field('familyName', 'family'),
+        Field('family', 'family_code'),
+        Field('fax', 'fax'),
+        Field('icon', 'url_icon'),
+        Field('state', 'state'),
+        Field('telephone', 'telephone'),
+        Field('town', 'town'),
+        Field('latitude', 'latitude', float, '0.0'),
+        Field('longitude', 'longitude', float, '0.0')
+    )
+
+
+class Line(_ParsedType):
     """
     Attributes:
         id (int): Line ID.
@@ -332,29 +552,18 @@ class Line(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.id = kwargs.get('lineId')
-        self.label = kwargs.get('label')
-        self.header_a = kwargs.get('headerA')
-        self.header_b = kwargs.get('headerB')
-        self.incidents = kwargs.get('incidents')
+    _fields = (
+        Field('lineId', 'id'),
+        Field('label', 'label'),
+        Field('headerA', 'header_a'),
+        Field('headerB', 'header_b'),
+        Field('incidents', 'incidents'),
+        Field(None, 'date', _line_date),
+        Field('dayType', 'day_types', _list_of('DayType'), [])
+    )
 
-        # Extended version returns a timestamp
-        if 'date' in kwargs.keys():
-            # Extended
-            self.date = datetime.datetime.fromtimestamp(
-                kwargs.get('date', 0) / 1e3)
 
-        elif 'string' in kwargs.keys():
-            # Basic
-            self.date = kwargs.get('string', '').replace('\\', '').strip()
-
-        self.day_types = [DayType(**a) for a in kwargs.get('dayType', [])]
-
-        self._json = kwargs
-
-
-class LineInfo(object):
+class LineInfo(_ParsedType):
     """
     Attributes:
         day_type (string): Day type. May be:
@@ -375,33 +584,26 @@ class LineInfo(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.line = int(kwargs.get('name'))
-        self.label = kwargs.get('label')
-        self.header_a = kwargs.get('headerA')
-        self.header_b = kwargs.get('headerB')
-        self.start_time = kwargs.get('startTime')
-        self.end_time = kwargs.get('stopTime')
-        self.minimum_frequency = int(kwargs.get('minimumFrequency', '-1'))
-        self.maximum_frequency = int(kwargs.get('maximumFrequency', '-1'))
-
-        self.day_type = DAY_TYPES.get(kwargs.get('typeDay'), 'Labour')
-
-        direction = kwargs.get('direction', 'A')
-        if direction == 'A':
-            self.direction = 'forward'
-        elif direction == 'B':
-            self.direction = 'backward'
-
-        self._json = kwargs
-
-
-class ListLineInfo(object):
+    _fields = (
+        Field('name', 'line', int),
+        Field('label', 'label'),
+        Field('headerA', 'header_a'),
+        Field('headerB', 'header_b'),
+        Field('startTime', 'start_time'),
+        Field('stopTime', 'end_time'),
+        Field('minimumFrequency', 'minimum_frequency', int, '-1'),
+        Field('maximumFrequency', 'maximum_frequency', int, '-1'),
+        Field('typeDay', 'day_type', _lookup(DAY_TYPES, 'Labour')),
+        Field('direction', 'direction', _lookup(HEADER_DIRECTIONS), 'A')
+    )
+
+
+class ListLineInfo(_ParsedType):
     """
     Attributes:
         group (int): Group number.
-        start_date (string): Date in which line started service (DD/MM/YYYY).
-        end_date (string): Date in which line ended service (DD/MM/YYYY).
+        start_date (date): Date in which line started service.
+        end_date (date): Date in which line ended service.
         line (int): Line number.
         label (string): Label of the line.
         header_a (string): Name of the end of the line A.
@@ -410,19 +612,18 @@ class ListLineInfo(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.group = int(kwargs.get('groupNumber', '0'))
-        self.start_date = kwargs.get('dateFirst', '').replace('\\', '').strip()
-        self.end_date = kwargs.get('dateEnd', '').replace('\\', '').strip()
-        self.line = int(kwargs.get('line', '0'))
-        self.label = kwargs.get('label')
-        self.header_a = kwargs.get('nameA', '').strip()
-        self.header_b = kwargs.get('nameB', '').strip()
-
-        self._json = kwargs
+    _fields = (
+        Field('groupNumber', 'group', int, '0'),
+        Field('dateFirst', 'start_date', util.parse_date, ''),
+        Field('dateEnd', 'end_date', util.parse_date, ''),
+        Field('line', 'line', int, '0'),
+        Field('label', 'label'),
+        Field('nameA', 'header_a', _strip, ''),
+        Field('nameB', 'header_b', _strip, '')
+    )
 
 
-class NodeLinesItem(object):
+class NodeLinesItem(_ParsedType):
     """
     Attributes:
 
@@ -435,26 +636,16 @@ class NodeLinesItem(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.id = kwargs.get('node')
-        self.name = kwargs.get('name')
-        self.latitude = kwargs.get('latitude')
-        self.longitude = kwargs.get('longitude')
+    _fields = (
+        Field('node', 'id'),
+        Field('name', 'name'),
+        Field('latitude', 'latitude'),
+        Field('longitude', 'longitude'),
+        Field('lines', 'lines', _node_lines)
+    )
 
-        lines = kwargs.get('lines')
-        self.lines = []
 
-        for line in lines:
-            if line:
-                elements = line.replace('\\', '').strip().split('/')
-                # 1 = forward, 2 = backward
-                direction = 'forward' if elements[1] == '1' else 'backward'
-                self.lines.append((int(elements[0]), direction))
-
-        self._json = kwargs
-
-
-class Parking(object):
+class Parking(_ParsedType):
     """
     Attributes:
         id (int): Parking ID. Parkings are identified with (family, id).
@@ -477,27 +668,26 @@ class Parking(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.id = kwargs.get('id')
-        self.name = kwargs.get('name')
-        self.address = kwargs.get('address')
-        self.type = kwargs.get('type')
-        self.administrative_area = kwargs.get('administrativeArea')
-        self.area_code = int(kwargs.get('areaCode', '-1'))
-        self.category = kwargs.get('category')
-        self.country = kwargs.get('country')
-        self.family = kwargs.get('family')
-        self.family_code = kwargs.get('familyCode')
-        self.nickname = kwargs.get('nickName')
-        self.state = kwargs.get('state')
-        self.town = kwargs.get('town')
-        self.latitude = float(kwargs.get('latitude', '0.0'))
-        self.longitude = float(kwargs.get('longitude', '0.0'))
-
-        self._json = kwargs
-
-
-class ParkingAccess(object):
+    _fields = (
+        Field('id', 'id'),
+        Field('name', 'name'),
+        Field('address', 'address'),
+        Field('type', 'type'),
+        Field('administrativeArea', 'administrative_area'),
+        Field('areaCode', 'area_code', int, '-1'),
+        Field('category', 'category'),
+        Field('country', 'country'),
+        Field('family', 'family'),
+        Field('familyCode', 'family_code'),
+        Field('nickName', 'nickname'),
+        Field('state', 'state'),
+        Field('town', 'town'),
+        Field('latitude', 'latitude', float, '0.0'),
+        Field('longitude', 'longitude', float, '0.0')
+    )
+
+
+class ParkingAccess(_ParsedType):
     """
     Attributes:
         name (str): Name of the access.
@@ -510,17 +700,17 @@ class ParkingAccess(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.name = kwargs.get('name')
-        self.address = kwargs.get('address')
-        self.code = kwargs.get('code')
-        self.url_icon = kwargs.get('url_icon')
-        self.latitude = float(kwargs.get('latitude', '0.0'))
-        self.longitude = float(kwargs.get('longitude', '0.0'))
+    _fields = (
+        Field('name', 'name'),
+        Field('address', 'address'),
+        Field('code', 'code'),
+        Field('url_icon', 'url_icon'),
+        Field('latitude', 'latitude', float, '0.0'),
+        Field('longitude', 'longitude', float, '0.0')
+    )
 
-        self._json = kwargs
 
-class ParkingDetails(object):
+class ParkingDetails(_ParsedType):
     """
     Attributes:
         id (int): ID of the parking.
@@ -550,42 +740,34 @@ class ParkingDetails(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        general = kwargs.get('general', {})
-
-        self.id = kwargs.get('id')
-        self.name = kwargs.get('name')
-        self.schedule = kwargs.get('schedule')
-        self.address = general.get('address')
-        self.administrative_area = general.get('administrativeArea')
-        self.area_code = general.get('areaCode')
-        self.category = general.get('category')
-        self.category_code = general.get('categoryCode')
-        self.type = general.get('type')
-        self.type_code = general.get('typeCode')
-        self.country = general.get('country')
-        self.family = kwargs.get('family')
-        self.family_code = kwargs.get('familyCode')
-        self.nickname = general.get('nickName')
-        self.state = general.get('state')
-        self.town = general.get('town')
-        self.latitude = float(general.get('latitude', '0.0'))
-        self.longitude = float(general.get('longitude', '0.0'))
-
-        accesses = kwargs.get('lstAccess', [])
-        features = kwargs.get('lstFeatures', [])
-        occupation = kwargs.get('lstOccupation', [])
-        rates = kwargs.get('lstRates', [])
-
-        self.accesses = [ParkingAccess(**a) for a in accesses]
-        self.features = [ParkingFeature(**a) for a in features]
-        self.occupation = [ParkingOccupation(**a) for a in occupation]
-        self.rates = [ParkingRate(**a) for a in rates]
-
-        self._json = kwargs
-
-
-class ParkingFeature(object):
+    _fields = (
+        Field('id', 'id'),
+        Field('name', 'name'),
+        Field('schedule', 'schedule'),
+        Field(('general', 'address'), 'address'),
+        Field(('general', 'administrativeArea'), 'administrative_area'),
+        Field(('general', 'areaCode'), 'area_code'),
+        Field(('general', 'category'), 'category'),
+        Field(('general', 'categoryCode'), 'category_code'),
+        Field(('general', 'type'), 'type'),
+        Field(('general', 'typeCode'), 'type_code'),
+        Field(('general', 'country'), 'country'),
+        Field('family', 'family'),
+        Field('familyCode', 'family_code'),
+        Field(('general', 'nickName'), 'nickname'),
+        Field(('general', 'state'), 'state'),
+        Field(('general', 'town'), 'town'),
+        Field(('general', 'latitude'), 'latitude', float, '0.0'),
+        Field(('general', 'longitude'), 'longitude', float, '0.0'),
+        Field('lstAccess', 'accesses', _list_of('ParkingAccess'), []),
+        Field('lstFeatures', 'features', _list_of('ParkingFeature'), []),
+        Field('lstOccupation', 'occupation', _list_of('ParkingOccupation'),
+            []),
+        Field('lstRates', 'rates', _list_of('ParkingRate'), [])
+    )
+
+
+class ParkingFeature(_ParsedType):
     """
     Attributes:
         name (str): Name of the feature.
@@ -599,18 +781,17 @@ class ParkingFeature(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.name = kwargs.get('name')
-        self.code = kwargs.get('nameCode')
-        self.description = kwargs.get('description')
-        self.field = kwargs.get('nameFieldTranslated')
-        self.field_spanish = kwargs.get('nameField')
-        self.url_icon = kwargs.get('urlIcon')
-
-        self._json = kwargs
+    _fields = (
+        Field('name', 'name'),
+        Field('nameCode', 'code'),
+        Field('description', 'description'),
+        Field('nameFieldTranslated', 'field'),
+        Field('nameField', 'field_spanish'),
+        Field('urlIcon', 'url_icon')
+    )
 
 
-class ParkingOccupation(object):
+class ParkingOccupation(_ParsedType):
     """
     Attributes:
         type (str): Type of slot.
@@ -622,17 +803,16 @@ class ParkingOccupation(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.type = kwargs.get('name')
-        self.code = kwargs.get('code')
-        self.free = kwargs.get('free')
-        self.moment = kwargs.get('moment')
-        self.renewal_index = kwargs.get('renewal_index')
-
-        self._json = kwargs
+    _fields = (
+        Field('name', 'type'),
+        Field('code', 'code'),
+        Field('free', 'free'),
+        Field('moment', 'moment'),
+        Field('renewal_index', 'renewal_index')
+    )
 
 
-class ParkingPoi(object):
+class ParkingPoi(_ParsedType):
     """
     Attributes:
         id (int): Parking ID. Parkings are identified with (family, id).
@@ -663,32 +843,31 @@ class ParkingPoi(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.id = kwargs.get('id')
-        self.name = kwargs.get('name')
-        self.address = kwargs.get('address')
-        self.address_number = kwargs.get('addressNumber')
-        self.type = PARKING_POI_TYPES.get(kwargs.get('type', ''), 'zone')
-        self.administrative_area = kwargs.get('administrativeArea')
-        self.area_code = int(kwargs.get('areaCode', '-1'))
-        self.category = kwargs.get('category')
-        self.country = kwargs.get('country')
-        self.email = kwargs.get('email')
-        self.family = kwargs.get('family')
-        self.family_code = kwargs.get('familyCode')
-        self.fax = kwargs.get('fax')
-        self.url_icon = kwargs.get('neutralIcon')
-        self.nickname = kwargs.get('nickName')
-        self.state = kwargs.get('state')
-        self.telephone = kwargs.get('telephone')
-        self.town = kwargs.get('town')
-        self.latitude = float(kwargs.get('latitude', '0.0'))
-        self.longitude = float(kwargs.get('longitude', '0.0'))
-
-        self._json = kwargs
-
-
-class ParkingPoiType(object):
+    _fields = (
+        Field('id', 'id'),
+        Field('name', 'name'),
+        Field('address', 'address'),
+        Field('addressNumber', 'address_number'),
+        Field('type', 'type', _lookup(PARKING_POI_TYPES, 'zone'), ''),
+        Field('administrativeArea', 'administrative_area'),
+        Field('areaCode', 'area_code', int, '-1'),
+        Field('category', 'category'),
+        Field('country', 'country'),
+        Field('email', 'email'),
+        Field('family', 'family'),
+        Field('familyCode', 'family_code'),
+        Field('fax', 'fax'),
+        Field('neutralIcon', 'url_icon'),
+        Field('nickName', 'nickname'),
+        Field('state', 'state'),
+        Field('telephone', 'telephone'),
+        Field('town', 'town'),
+        Field('latitude', 'latitude', float, '0.0'),
+        Field('longitude', 'longitude', float, '0.0')
+    )
+
+
+class ParkingPoiType(_ParsedType):
     """
     Attributes:
         name (str): Name of the POI type.
@@ -701,19 +880,19 @@ class ParkingPoiType(object):
 
         _json (dict): Original API response.
     """
-    def __init__(self, **kwargs):
-        self.name = kwargs.get('type')
-        self.code = kwargs.get('typeCode')
-        self.category = kwargs.get('category')
-        self.category_code = kwargs.get('categoryCode')
-        self.family = kwargs.get('family')
-        self.family_code = kwargs.get('familyCode')
-        self.url_icon = kwargs.get('neutralIcon')
 
-        self._json = kwargs
+    _fields = (
+        Field('type', 'name'),
+        Field('typeCode', 'code'),
+        Field('category', 'category'),
+        Field('categoryCode', 'category_code'),
+        Field('family', 'family'),
+        Field('familyCode', 'family_code'),
+        Field('neutralIcon', 'url_icon')
+    )
 
 
-class ParkingRate(object):
+class ParkingRate(_ParsedType):
     """
     Attributes:
         description (str): Rate description.
@@ -727,23 +906,23 @@ class ParkingRate(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.description = kwargs.get('description')
-        self.start_minutes = kwargs.get('minutesStayInitiation')
-        self.end_minutes = kwargs.get('minutesStayEnd')
-        self.type = kwargs.get('periodPricing')
-        self.rate = kwargs.get('rate')
-        self.schedule_start = kwargs.get('scheduleInitial')
-        self.schedule_end = kwargs.get('scheduleEnd')
+    _fields = (
+        Field('description', 'description'),
+        Field('minutesStayInitiation', 'start_minutes'),
+        Field('minutesStayEnd', 'end_minutes'),
+        Field('periodPricing', 'type'),
+        Field('rate', 'rate'),
+        Field('scheduleInitial', 'schedule_start'),
+        Field('scheduleEnd', 'schedule_end')
+    )
 
-        self._json = kwargs
 
-
-class Poi(object):
+class Poi(_ParsedType):
     """
     Attributes:
         id (int): POI ID.
         poi_type (string): POI type.
+        type_id (int): Code of the POI type (see ``POI_TYPES``).
         name (string): POI name.
         address (string): POI address.
         street_number (int): Street number of the POI.
@@ -754,21 +933,21 @@ class Poi(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        attrs = kwargs.get('attributes', {})
-        self.id = attrs.get('poiId')
-        self.poi_type = POI_TYPES.get(attrs.get('poiType', -1), '')
-        self.name = attrs.get('name')
-        self.address = attrs.get('address')
-        self.street_number = attrs.get('streetNumber')
-        self.phone_number = attrs.get('phoneNumber')
-        self.latitude = attrs.get('latitude')
-        self.longitude = attrs.get('longitude')
-
-        self._json = kwargs
-
-
-class PoiDetails(object):
+    _fields = (
+        Field(('attributes', 'poiId'), 'id'),
+        Field(('attributes', 'poiType'), 'poi_type', _lookup(POI_TYPES, ''),
+            -1),
+        Field(('attributes', 'poiType'), 'type_id', _poi_type_id, -1),
+        Field(('attributes', 'name'), 'name'),
+        Field(('attributes', 'address'), 'address'),
+        Field(('attributes', 'streetNumber'), 'street_number'),
+        Field(('attributes', 'phoneNumber'), 'phone_number'),
+        Field(('attributes', 'latitude'), 'latitude'),
+        Field(('attributes', 'longitude'), 'longitude')
+    )
+
+
+class PoiDetails(_ParsedType):
     """
     Attributes:
         id (int): ID of the POI.
@@ -801,40 +980,35 @@ class PoiDetails(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        info = kwargs.get('poiDetailInfo', {})
-
-        self.id = kwargs.get('id')
-        self.name = info.get('nameTranslated')
-        self.name_spanish = kwargs.get('name')
-        self.description = info.get('description')
-        self.schedule = info.get('schedule')
-        self.address = kwargs.get('address')
-        self.administrative_area = kwargs.get('administrativeArea')
-        self.area_code = kwargs.get('areaCode')
-        self.category = kwargs.get('category')
-        self.category_code = kwargs.get('categoryCode')
-        self.type = kwargs.get('type')
-        self.type_code = kwargs.get('typeCode')
-        self.country = kwargs.get('country')
-        self.email = kwargs.get('email')
-        self.telephone = kwargs.get('telephone')
-        self.fax = kwargs.get('fax')
-        self.url_icon = kwargs.get('icon')
-        self.state = kwargs.get('state')
-        self.town = kwargs.get('town')
-        self.services_payment = info.get('servicesPayment')
-        self.web = info.get('web')
-        self.latitude = kwargs.get('latitude')
-        self.longitude = kwargs.get('longitude')
-
-        detail_images = kwargs.get('poiDetailImages', [])
-        self.images = [PoiImage(**a) for a in detail_images]
-
-        self._json = kwargs
-
-
-class PoiImage(object):
+    _fields = (
+        Field('id', 'id'),
+        Field(('poiDetailInfo', 'nameTranslated'), 'name'),
+        Field('name', 'name_spanish'),
+        Field(('poiDetailInfo', 'description'), 'description'),
+        Field(('poiDetailInfo', 'schedule'), 'schedule'),
+        Field('address', 'address'),
+        Field('administrativeArea', 'administrative_area'),
+        Field('areaCode', 'area_code'),
+        Field('category', 'category'),
+        Field('categoryCode', 'category_code'),
+        Field('type', 'type'),
+        Field('typeCode', 'type_code'),
+        Field('country', 'country'),
+        Field('email', 'email'),
+        Field('telephone', 'telephone'),
+        Field('fax', 'fax'),
+        Field('icon', 'url_icon'),
+        Field('state', 'state'),
+        Field('town', 'town'),
+        Field(('poiDetailInfo', 'servicesPayment'), 'services_payment'),
+        Field(('poiDetailInfo', 'web'), 'web'),
+        Field('latitude', 'latitude'),
+        Field('longitude', 'longitude'),
+        Field('poiDetailImages', 'images', _list_of('PoiImage'), [])
+    )
+
+
+class PoiImage(_ParsedType):
     """
     Attributes:
         description (str): Description of the image, if any.
@@ -843,14 +1017,13 @@ class PoiImage(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.description = kwargs.get('description')
-        self.url = kwargs.get('urlImage')
-
-        self._json = kwargs
+    _fields = (
+        Field('description', 'description'),
+        Field('urlImage', 'url')
+    )
 
 
-class PoiType(object):
+class PoiType(_ParsedType):
     """
     Attributes:
         id (int): Type ID.
@@ -859,16 +1032,13 @@ class PoiType(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        attrs = kwargs.get('attributes', {})
-
-        self.id = attrs.get('type')
-        self.name = attrs.get('name')
-
-        self._json = kwargs
+    _fields = (
+        Field(('attributes', 'type'), 'id'),
+        Field(('attributes', 'name'), 'name')
+    )
 
 
-class RouteLinesItem(object):
+class RouteLinesItem(_ParsedType):
     """
     Attributes:
         id (int): Node ID.
@@ -887,22 +1057,19 @@ class RouteLinesItem(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.id = kwargs.get('node')
-        self.line = kwargs.get('line')
-        self.distance_orig = kwargs.get('distance')
-        self.distance_prev = kwargs.get('distancePreviousStop')
-        self.name = kwargs.get('name')
-        self.latitude = kwargs.get('latitude')
-        self.longitude = kwargs.get('longitude')
+    _fields = (
+        Field('node', 'id'),
+        Field('line', 'line'),
+        Field('distance', 'distance_orig'),
+        Field('distancePreviousStop', 'distance_prev'),
+        Field('name', 'name'),
+        Field('latitude', 'latitude'),
+        Field('longitude', 'longitude'),
+        Field('secDetail', 'node_type', _lookup(SEC_DETAILS, 'forward_stop'))
+    )
 
-        sec_detail = kwargs.get('secDetail')
-        self.node_type = SEC_DETAILS.get(sec_detail, 'forward_stop')
 
-        self._json = kwargs
-
-
-class Site(object):
+class Site(_ParsedType):
     """
     Attributes:
         id (int): Site ID.
@@ -927,35 +1094,25 @@ class Site(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.id = int(kwargs.get('siteId', '0'))
-        self.name = kwargs.get('description')
-        self.longitude = kwargs.get('longitude')
-        self.latitude = kwargs.get('latitude')
-
-        site_type = kwargs.get('site_type', '')
-        if site_type == 'C':
-            self.site_type = 'street'
-        elif site_type == 'P':
-            self.site_type = 'poi'
-
-        # Street
-        self.street_type = kwargs.get('streetType')
-        self.number_type = kwargs.get('numberType')
-        self.street_number = int(kwargs.get('streetNumber', '-1'))
-        self.zip_code = int(kwargs.get('zipCode', '-1'))
-
-        # POI
-        self.poi_type = POI_TYPES.get(int(kwargs.get('poiType', '-1')), '')
-        self.poi_address = kwargs.get('poiAddress')
-        self.poi_street_number = int(kwargs.get('poiStreetNumber', '-1'))
-        self.poi_direction = kwargs.get('poiDirection')
-        self.poi_phone_number = kwargs.get('poiPhoneNumber')
-
-        self._json = kwargs
-
-
-class Stop(object):
+    _fields = (
+        Field('siteId', 'id', int, '0'),
+        Field('description', 'name'),
+        Field('longitude', 'longitude'),
+        Field('latitude', 'latitude'),
+        Field('site_type', 'site_type', _lookup(SITE_TYPES), ''),
+        Field('streetType', 'street_type'),
+        Field('numberType', 'number_type'),
+        Field('streetNumber', 'street_number', int, '-1'),
+        Field('zipCode', 'zip_code', int, '-1'),
+        Field('poiType', 'poi_type', _poi_type, '-1'),
+        Field('poiAddress', 'poi_address'),
+        Field('poiStreetNumber', 'poi_street_number', int, '-1'),
+        Field('poiDirection', 'poi_direction'),
+        Field('poiPhoneNumber', 'poi_phone_number')
+    )
+
+
+class Stop(_ParsedType):
     """
     Attributes:
         id (int): Stop ID.
@@ -968,26 +1125,17 @@ class Stop(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.id = int(kwargs.get('stopId'))
-        self.name = kwargs.get('name')
-        self.address = kwargs.get('postalAddress')
-        self.longitude = kwargs.get('longitude')
-        self.latitude = kwargs.get('latitude')
-
-        if 'line' in kwargs:
-            if isinstance(kwargs.get('line'), list):
-                # Several lines
-                self.lines = [LineInfo(**a) for a in kwargs.get('line')]
-
-            else:
-                # Single line
-                self.lines = [LineInfo(**kwargs.get('line'))]
+    _fields = (
+        Field('stopId', 'id', int),
+        Field('name', 'name'),
+        Field('postalAddress', 'address'),
+        Field('longitude', 'longitude'),
+        Field('latitude', 'latitude'),
+        Field('line', 'lines', _list_of('LineInfo'))
+    )
 
-        self._json = kwargs
 
-
-class Street(object):
+class Street(_ParsedType):
     """
     Attributes:
         name (string): Name of the street.
@@ -999,58 +1147,50 @@ class Street(object):
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        attrs = kwargs.get('attributes', {})
-        self.name = attrs.get('streetName')
-        self.street_type = attrs.get('streetType')
-        self.street_number = int(attrs.get('number', '-1'))
-        self.latitude = attrs.get('latitude')
-        self.longitude = attrs.get('longitude')
-
-        self._json = kwargs
+    _fields = (
+        Field(('attributes', 'streetName'), 'name'),
+        Field(('attributes', 'streetType'), 'street_type'),
+        Field(('attributes', 'number'), 'street_number', int, '-1'),
+        Field(('attributes', 'latitude'), 'latitude'),
+        Field(('attributes', 'longitude'), 'longitude')
+    )
 
 
-class TimesLinesItem(object):
+class TimesLinesItem(_ParsedType):
     """
     Attributes:
-        start_date (string): Date in which line started service (DD/MM/YYYY).
-        end_date (string): Date in which line ended service (DD/MM/YYYY).
+        start_date (date): Date in which line started service.
+        end_date (date): Date in which line ended service.
         line (int): Line number.
         day_type (string): Day type. May be:
             - labour (LA)
             - friday (F)
             - saturday (SA)
             - festive (FE)
-        first_forward (string): Date and time of first bus forward (A-B).
-            (DD/MM/YYYY H:mm:ss)
-        first_backward (string): Date and time of first bus backward (B-A).
-            (DD/MM/YYYY H:mm:ss)
-        last_forward (string): Date and time of last bus forward (A-B).
-            (DD/MM/YYYY H:mm:ss)
-        last_backward (string): Date and time of last bus backward (B-A).
-            (DD/MM/YYYY H:mm:ss)
+        first_forward (datetime): Date and time of first bus forward (A-B).
+        first_backward (datetime): Date and time of first bus backward (B-A).
+        last_forward (datetime): Date and time of last bus forward (A-B).
+        last_backward (datetime): Date and time of last bus backward (B-A).
 
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.start_date = kwargs.get('dateFirst', '').replace('\\', '').strip()
-        self.end_date = kwargs.get('dateEnd', '').replace('\\', '').strip()
-        self.line = int(kwargs.get('line', '0'))
-        self.first_forward = kwargs.get('timeFirstA').replace('\\', '').strip()
-        self.first_backward = kwargs.get('timeFirstB').replace('\\', '').strip()
-        self.last_forward = kwargs.get('timeEndA').replace('\\', '').strip()
-        self.last_backward = kwargs.get('timeEndB').replace('\\', '').strip()
-
-        self.day_type = DAY_TYPES.get(kwargs.get('typeId'), 'Labour')
+    _fields = (
+        Field('dateFirst', 'start_date', util.parse_date, ''),
+        Field('dateEnd', 'end_date', util.parse_date, ''),
+        Field('line', 'line', int, '0'),
+        Field('timeFirstA', 'first_forward', util.parse_datetime),
+        Field('timeFirstB', 'first_backward', util.parse_datetime),
+        Field('timeEndA', 'last_forward', util.parse_datetime),
+        Field('timeEndB', 'last_backward', util.parse_datetime),
+        Field('typeId', 'day_type', _lookup(DAY_TYPES, 'Labour'))
+    )
 
-        self._json = kwargs
 
-
-class TimetableLinesItem(object):
+class TimetableLinesItem(_ParsedType):
     """
     Attributes:
-        date (string): Date for the timetable (DD/MM/YYYY).
+        date (date): Date for the timetable.
         day_type (string): Day type. May be:
             - labour (LA)
             - friday (F)
@@ -1059,25 +1199,105 @@ class TimetableLinesItem(object):
         line (int): Line number
         direction (string) - forward or backward
         trip (int) - trip number.
-        start_time (string): Starting time (HH:mm:ss).
-        end_time (string): Ending time (HH:mm:ss).
+        start_time (timedelta): Starting time since the start of the
+            service day (may exceed 24 hours for trips after midnight).
+        end_time (timedelta): Ending time since the start of the service
+            day.
 
         _json (dict): Original API response.
     """
 
-    def __init__(self, **kwargs):
-        self.date = kwargs.get('date', '').replace('\\', '').strip()
-        self.line = int(kwargs.get('line', '0'))
-        self.start_time = kwargs.get('timeFirst', '').replace('\\', '').strip()
-        self.end_time = kwargs.get('timeEnd', '').replace('\\', '').strip()
+    _fields = (
+        Field('date', 'date', util.parse_date, ''),
+        Field('line', 'line', int, '0'),
+        Field('timeFirst', 'start_time', util.parse_time, ''),
+        Field('timeEnd', 'end_time', util.parse_time, ''),
+        Field('typeDay', 'day_type', _lookup(DAY_TYPES, 'Labour')),
+        Field('direction', 'direction', _direction)
+    )
+
+
+# Compile the parsers of each type
+for _type in _ParsedType.__subclasses__():
+    _parse, _type.__init__, _from_json = compile_parser(_type._fields, _type)
+    _type._parse = staticmethod(_parse)
+    _type.from_json = staticmethod(_from_json)
+    _type._attributes = tuple(f.name for f in _type._fields)
+
+del _type, _parse, _from_json
+
+
+# Row types generated for each class, see ``row_type()``
+_ROW_TYPES = {}
+
+
+def row_type(item_type):
+    """Obtain the immutable row type for one of the types in this file.
+
+    The row type is a ``namedtuple`` generated from the field spec of the
+    class and cached for later calls.
+
+    Args:
+        item_type (type): Class of the item.
+
+    Returns:
+        Named tuple type with the attributes of the class.
+    """
+    if item_type not in _ROW_TYPES:
+        _ROW_TYPES[item_type] = collections.namedtuple(
+            item_type.__name__ + 'Row', item_type._attributes)
+
+    return _ROW_TYPES[item_type]
+
+def parse_row(item_type, kwargs):
+    """Parse an API response directly to the row type of a class.
+
+    This uses the compiled parser of the class without creating an instance
+    of it. Nested items are converted to rows as well.
+
+    Args:
+        item_type (type): Class of the item.
+        kwargs (dict): API response.
+
+    Returns:
+        Named tuple with the parsed values.
+    """
+    return _make_row(item_type, item_type._parse(kwargs))
+
+def to_row(item):
+    """Convert a parsed item to its immutable row type.
+
+    Nested items (such as the ``day_types`` of a ``Line``) are converted as
+    well, and lists are converted to tuples.
+
+    Args:
+        item: Object of one of the types in this file.
+
+    Returns:
+        Named tuple with the values of the item.
+    """
+    return _make_row(type(item), item.__dict__)
+
+def _make_row(item_type, attributes):
+    """Build the row of a class from a dict of parsed attributes."""
+    values = []
+
+    for name in item_type._attributes:
+        value = attributes.get(name)
+
+        if isinstance(value, list):
+            value = tuple(_row_value(v) for v in value)
+
+        else:
+            value = _row_value(value)
 
-        self.day_type = DAY_TYPES.get(kwargs.get('typeDay'), 'Labour')
+        values.append(value)
 
-        direction = int(kwargs.get('direction'))
-        if direction == 1:
-            self.direction = 'forward'
+    return row_type(item_type)(*values)
 
-        elif direction == 2:
-            self.direction = 'backward'
+def _row_value(value):
+    """Convert the value if it is one of the types in this file."""
+    if isinstance(value, _ParsedType):
+        return to_row(value)
 
-        self._json = kwargs
+    return value
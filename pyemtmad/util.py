@@ -20,11 +20,21 @@
 This file contains some utility functions used in the API interface.
 """
 
+import datetime
+import functools
 import ssl
 import six
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.poolmanager import PoolManager
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Types of the values shared by ``intern_values()``
+_SHARED_TYPES = six.string_types + six.integer_types + (float,)
+
 
 class ParkingAdapter(HTTPAdapter):
     """Custom HTTP adapter for parking API, as it uses TLSv1."""
@@ -36,6 +46,21 @@ class ParkingAdapter(HTTPAdapter):
                                        ssl_version=ssl.PROTOCOL_TLSv1)
 
 
+def require_numpy(feature='this feature'):
+    """Raise an error if NumPy is not available.
+
+    NumPy is an optional dependency (``pip install pyemtmad[numpy]``) of the
+    columnar results and of the modules built on them.
+
+    Args:
+        feature (str): Description of what requires NumPy, for the message.
+
+    Raises:
+        ImportError: If NumPy cannot be imported.
+    """
+    if np is None:
+        raise ImportError('NumPy is required for %s' % feature)
+
 def check_result(data, key=''):
     """Check the result of an API response.
 
@@ -68,6 +93,114 @@ def check_result(data, key=''):
 
     return False
 
+def memoize(function=None, maxsize=1024):
+    """Cache the results of a function that takes a single argument.
+
+    This is meant for parsers of values that repeat many times within a
+    response, such as dates and times, so that each distinct value is only
+    parsed once. The cache is emptied when it reaches ``maxsize`` entries,
+    so its size is bounded even in long-running processes.
+
+    May be used as ``@memoize`` or ``@memoize(maxsize=...)``.
+
+    Args:
+        function: Function to decorate. Its argument must be hashable.
+        maxsize (int): Maximum number of cached results.
+
+    Returns:
+        Decorated function. The cache is available in its ``cache``
+        attribute.
+    """
+    if function is None:
+        return functools.partial(memoize, maxsize=maxsize)
+
+    cache = {}
+
+    @functools.wraps(function)
+    def wrapper(value):
+        try:
+            return cache[value]
+
+        except KeyError:
+            if len(cache) >= maxsize:
+                cache.clear()
+
+            result = cache[value] = function(value)
+            return result
+
+    wrapper.cache = cache
+    return wrapper
+
+@memoize
+def parse_date(string):
+    """Parse a date string returned by the API.
+
+    The string may contain escaped slashes and a time part, which is ignored.
+
+    Args:
+        string (str): Date in the format *DD/MM/YYYY*.
+
+    Returns:
+        datetime.date: Parsed date or None if the string is not valid.
+    """
+    try:
+        date = string.replace('\\', '').strip().split(' ')[0]
+        day, month, year = date.split('/')
+        return datetime.date(int(year), int(month), int(day))
+
+    except (AttributeError, ValueError):
+        return None
+
+@memoize
+def parse_datetime(string):
+    """Parse a date and time string returned by the API.
+
+    Args:
+        string (str): Date in the format *DD/MM/YYYY H:mm:ss*.
+
+    Returns:
+        datetime.datetime: Parsed date or None if the string is not valid.
+    """
+    try:
+        parts = string.replace('\\', '').strip().split(' ')
+        date = parse_date(parts[0])
+        offset = parse_time(parts[1]) if len(parts) > 1 \
+            else datetime.timedelta()
+
+        return datetime.datetime.combine(date, datetime.time()) + offset
+
+    except (AttributeError, TypeError):
+        return None
+
+@memoize
+def parse_time(string):
+    """Parse a time string returned by the API.
+
+    Service days extend past midnight, so times such as *25:10:00* are
+    valid. They are kept as the time elapsed since the start (midnight) of
+    the service day instead of being wrapped, which preserves the order of
+    the trips.
+
+    Args:
+        string (str): Time in the format *HH:mm:ss* or *HH:mm*.
+
+    Returns:
+        datetime.timedelta: Time since the start of the service day, or
+        None if the string is not valid.
+    """
+    try:
+        fields = [int(f) for f in string.replace('\\', '').strip().split(':')]
+        hour, minute = fields[0], fields[1]
+        second = fields[2] if len(fields) > 2 else 0
+
+        if not (0 <= minute < 60 and 0 <= second < 60) or hour < 0:
+            return None
+
+        return datetime.timedelta(hours=hour, minutes=minute, seconds=second)
+
+    except (AttributeError, IndexError, ValueError):
+        return None
+
 def date_string(day, month, year):
     """Build a date string using the provided day, month, year numbers.
 
@@ -135,6 +268,40 @@ def ints_to_string(ints):
 
     return '|'.join(six.u(str(l)) for l in ints)
 
+def intern_values(data, pool=None):
+    """Make repeated strings and numbers in a response share the same object.
+
+    Decoded JSON contains a separate object for every occurrence of a value,
+    even though names, labels and coordinates repeat across thousands of
+    items in some responses (each stop appears in the route of every line
+    that serves it). This replaces every string and number in the (nested)
+    data with the first equal one found, in place.
+
+    Args:
+        data: Response data (dict, list or value).
+        pool (dict): Values found so far. A new pool is used for each
+            response by default.
+
+    Returns:
+        The same data, with repeated values shared.
+    """
+    if pool is None:
+        pool = {}
+
+    if isinstance(data, dict):
+        for key, value in data.items():
+            data[key] = intern_values(value, pool)
+
+    elif isinstance(data, list):
+        for index, value in enumerate(data):
+            data[index] = intern_values(value, pool)
+
+    elif isinstance(data, _SHARED_TYPES):
+        # The type is part of the key so that 1 and 1.0 are not merged
+        return pool.setdefault((type(data), data), data)
+
+    return data
+
 def language_code(code):
     """Generate the ``cultureInfo`` language code for the API.
 
@@ -0,0 +1,472 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""This file contains a scheduler that polls the arrivals of several stops.
+
+Instead of polling every stop at a fixed rate, the next request for a stop is
+scheduled from the time left for its nearest bus: stops with buses about to
+arrive are polled often and stops whose next bus is far away are polled
+rarely. All the requests share a global budget.
+"""
+
+import collections
+import heapq
+import threading
+import time
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+# Value of ``Arrival.time_left`` when 20 or more minutes remain
+TIME_LEFT_SENTINEL = 999999
+
+# Seconds assumed for the sentinel value
+_SENTINEL_SECONDS = 20 * 60
+
+
+def _time_left(arrival):
+    """Obtain the seconds left for an arrival, or None if unknown."""
+    if isinstance(arrival, dict):
+        value = arrival.get('busTimeLeft')
+
+    else:
+        value = getattr(arrival, 'time_left', None)
+
+    try:
+        value = int(float(value))
+
+    except (TypeError, ValueError):
+        return None
+
+    if value >= TIME_LEFT_SENTINEL:
+        return _SENTINEL_SECONDS
+
+    return max(value, 0)
+
+
+class StopUpdate(object):
+    """Result of polling a stop.
+
+    Attributes:
+        stop_id (int): ID of the stop.
+        arrivals (list[Arrival]): Arrivals of the stop, or None in case of
+            error.
+        error (str): Error message, or None.
+        polled_at (double): Timestamp of the request.
+        next_poll (double): Timestamp of the next scheduled request.
+    """
+
+    def __init__(self, stop_id, arrivals, error, polled_at, next_poll):
+        self.stop_id = stop_id
+        self.arrivals = arrivals
+        self.error = error
+        self.polled_at = polled_at
+        self.next_poll = next_poll
+
+    def __repr__(self):
+        return '<StopUpdate %s %s>' % (
+            self.stop_id,
+            self.error if self.error else '%d arrivals' % len(self.arrivals))
+
+    @property
+    def nearest(self):
+        """Seconds left for the nearest bus, or None if unknown.
+
+        The sentinel for 20+ minutes is counted as 20 minutes.
+        """
+        values = [
+            t for t in (_time_left(a) for a in self.arrivals or [])
+            if t is not None
+        ]
+
+        return min(values) if values else None
+
+
+class StopWatcher(object):
+    """Adaptive poller of the arrivals of a set of stops.
+
+    The next request for a stop is scheduled after a fraction (``lead``) of
+    the time left for its nearest bus, bounded by ``min_interval`` and
+    ``max_interval``. Stops without arrivals are polled every
+    ``max_interval`` seconds and failed requests (including those that
+    raise an exception) are retried after ``min_interval`` seconds.
+
+    No more than ``budget`` requests are performed in ``period`` seconds.
+    When the budget is exhausted, due stops wait in order of urgency.
+
+    Updates are delivered to the callbacks registered with
+    ``add_callback()`` and to the asynchronous iterators obtained from
+    ``updates()``. Polling happens in ``poll()``, which can be called
+    periodically or from the background thread started with ``start()``.
+    An exception raised by a callback does not stop the delivery to the
+    other ones nor the polling; it is stored in ``last_error``.
+
+    Attributes:
+        wrapper (Wrapper): Wrapper used to perform the requests.
+        budget (int): Maximum number of requests per period.
+        period (double): Length (in seconds) of the budget period.
+        min_interval (double): Minimum seconds between polls of a stop.
+        max_interval (double): Maximum seconds between polls of a stop.
+        lead (double): Fraction of the time left after which a stop is
+            polled again.
+        lang (str): Language code of the requests.
+        requests (int): Number of requests performed.
+        last_error (Exception): Last exception raised by a callback or by
+            the background thread, or None.
+    """
+
+    def __init__(self, wrapper, stops=(), budget=60, period=60,
+                 min_interval=10, max_interval=300, lead=0.5, lang='es'):
+        self.wrapper = wrapper
+        self.budget = budget
+        self.period = float(period)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.lead = lead
+        self.lang = lang
+        self.requests = 0
+        self.last_error = None
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self._watched = set()
+
+        # Scheduled time of each stop, the heap may contain outdated entries
+        self._due = {}
+        self._heap = []
+
+        # Token bucket of the request budget
+        self._tokens = float(budget)
+        self._refilled = time.time()
+
+        self._callbacks = []
+        self._iterators = []
+
+        for stop in stops:
+            self.watch(stop)
+
+    def __len__(self):
+        """Number of watched stops."""
+        return len(self._watched)
+
+    def __contains__(self, stop_id):
+        return int(stop_id) in self._watched
+
+    def watch(self, stop_id, when=None):
+        """Start watching a stop.
+
+        Args:
+            stop_id (int): ID of the stop.
+            when (double): Optional, timestamp of the first poll (now by
+                default).
+        """
+        stop_id = int(stop_id)
+
+        with self._lock:
+            self._watched.add(stop_id)
+
+        self._schedule(stop_id, time.time() if when is None else when)
+        self._wake.set()
+
+    def unwatch(self, stop_id):
+        """Stop watching a stop."""
+        with self._lock:
+            self._watched.discard(int(stop_id))
+            self._due.pop(int(stop_id), None)
+
+    def add_callback(self, callback):
+        """Register a function that receives each ``StopUpdate``."""
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        """Unregister a function added with ``add_callback()``."""
+        self._callbacks.remove(callback)
+
+    def updates(self, loop=None):
+        """Obtain an asynchronous iterator of the updates.
+
+        The iterator must be created and consumed in the event loop, and
+        receives the updates produced after its creation until ``stop()`` is
+        called::
+
+            async for update in watcher.updates():
+                ...
+
+        Args:
+            loop: Event loop of the consumer (the current one by default).
+
+        Returns:
+            Asynchronous iterator of ``StopUpdate`` objects.
+        """
+        if asyncio is None:
+            raise ImportError('asyncio is required for asynchronous updates')
+
+        iterator = _UpdateIterator(self, loop or asyncio.get_event_loop())
+
+        with self._lock:
+            self._iterators.append(iterator)
+
+        return iterator
+
+    def next_poll(self):
+        """Obtain the timestamp of the next request, or None if idle.
+
+        Includes the wait for the budget if it is exhausted.
+        """
+        with self._lock:
+            self._discard_outdated()
+
+            if not self._heap:
+                return None
+
+            due = self._heap[0][0]
+            now = time.time()
+            self._refill(now)
+
+            if self._tokens < 1:
+                due = max(due, now + (1 - self._tokens) * self._rate())
+
+            return due
+
+    def poll(self, now=None):
+        """Poll the stops that are due, within the budget.
+
+        Args:
+            now (double): Optional, current timestamp.
+
+        Returns:
+            list[StopUpdate]: Updates of the polled stops.
+        """
+        now = time.time() if now is None else now
+        updates = []
+
+        while True:
+            with self._lock:
+                self._discard_outdated()
+
+                if not self._heap or self._heap[0][0] > now:
+                    break
+
+                self._refill(now)
+                if self._tokens < 1:
+                    break
+
+                self._tokens -= 1
+                _, stop_id = heapq.heappop(self._heap)
+                del self._due[stop_id]
+
+            updates.append(self._poll_stop(stop_id, now))
+
+        return updates
+
+    def start(self):
+        """Start polling in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background thread and end the asynchronous iterators."""
+        self._stopped.set()
+        self._wake.set()
+
+        if self._thread is not None and \
+                self._thread is not threading.current_thread():
+            self._thread.join()
+
+        self._thread = None
+
+        with self._lock:
+            iterators, self._iterators = self._iterators, []
+
+        for iterator in iterators:
+            iterator._push(None)
+
+    def _run(self):
+        """Poll the stops until stopped."""
+        while not self._stopped.is_set():
+            self._wake.clear()
+
+            try:
+                self.poll()
+
+                due = self.next_poll()
+                timeout = None if due is None else max(due - time.time(), 0)
+
+            except Exception as error:
+                # Keep polling, retry after min_interval
+                self.last_error = error
+                timeout = self.min_interval
+
+            self._wake.wait(timeout)
+
+    def _poll_stop(self, stop_id, now):
+        """Request the arrivals of a stop and schedule the next request."""
+        try:
+            status, result = self.wrapper.geo.get_arrive_stop(
+                stop_number=stop_id, lang=self.lang)
+
+        except Exception as error:
+            # Connection errors and invalid responses are failed requests
+            status, result = False, str(error) or repr(error)
+
+        self.requests += 1
+
+        if status:
+            update = StopUpdate(stop_id, result, None, now, None)
+            nearest = update.nearest
+
+            if nearest is None:
+                delay = self.max_interval
+
+            else:
+                delay = min(
+                    max(nearest * self.lead, self.min_interval),
+                    self.max_interval)
+
+        else:
+            update = StopUpdate(stop_id, None, result, now, None)
+            delay = self.min_interval
+
+        update.next_poll = now + delay
+        self._schedule(stop_id, update.next_poll)
+        self._deliver(update)
+
+        return update
+
+    def _schedule(self, stop_id, when):
+        """Set the time of the next request of a stop, if still watched."""
+        with self._lock:
+            if stop_id not in self._watched:
+                return
+
+            self._due[stop_id] = when
+            heapq.heappush(self._heap, (when, stop_id))
+
+    def _deliver(self, update):
+        """Send an update to the callbacks and iterators."""
+        for callback in list(self._callbacks):
+            try:
+                callback(update)
+
+            except Exception as error:
+                self.last_error = error
+
+        with self._lock:
+            iterators = list(self._iterators)
+
+        for iterator in iterators:
+            if not iterator._push(update):
+                # The event loop of the iterator was closed
+                with self._lock:
+                    if iterator in self._iterators:
+                        self._iterators.remove(iterator)
+
+    def _discard_outdated(self):
+        """Remove the heap entries of unwatched or rescheduled stops."""
+        heap = self._heap
+
+        while heap and self._due.get(heap[0][1]) != heap[0][0]:
+            heapq.heappop(heap)
+
+    def _rate(self):
+        """Requests per second allowed by the budget."""
+        return self.budget / self.period
+
+    def _refill(self, now):
+        """Add the tokens accumulated since the last refill."""
+        elapsed = max(now - self._refilled, 0)
+        self._tokens = min(
+            self._tokens + elapsed * self._rate(), float(self.budget))
+        self._refilled = now
+
+
+class _UpdateIterator(object):
+    """Asynchronous iterator of the updates of a ``StopWatcher``."""
+
+    def __init__(self, watcher, loop):
+        self._watcher = watcher
+        self._loop = loop
+        self._pending = collections.deque()
+        self._waiter = None
+        self._ended = False
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        future = self._loop.create_future()
+
+        if self._ended:
+            self._resolve(future, None)
+
+        elif self._pending:
+            self._resolve(future, self._pending.popleft())
+
+        else:
+            self._waiter = future
+
+        return future
+
+    def close(self):
+        """Stop receiving updates."""
+        with self._watcher._lock:
+            if self in self._watcher._iterators:
+                self._watcher._iterators.remove(self)
+
+        self._push(None)
+
+    def _push(self, update):
+        """Queue an update from any thread (None ends the iteration).
+
+        Returns:
+            bool: False if the event loop is closed.
+        """
+        try:
+            self._loop.call_soon_threadsafe(self._receive, update)
+
+        except RuntimeError:
+            return False
+
+        return True
+
+    def _receive(self, update):
+        waiter, self._waiter = self._waiter, None
+
+        if waiter is not None and not waiter.done():
+            self._resolve(waiter, update)
+
+        else:
+            self._pending.append(update)
+
+    def _resolve(self, future, update):
+        if update is None:
+            self._ended = True
+            future.set_exception(StopAsyncIteration())
+
+        else:
+            future.set_result(update)
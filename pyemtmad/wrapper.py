@@ -22,6 +22,7 @@ See http://opendata.emtmadrid.es/Servicios-web
 """
 
 import requests
+from pyemtmad import types as emtype
 from pyemtmad.api.bus import BusApi
 from pyemtmad.api.geo import GeoApi
 from pyemtmad.api.parking import ParkingApi
@@ -75,11 +76,15 @@ ENDPOINTS_PARKING = {
     'list_types_poi'          : 'listTypesPOIs/{id_client},{passkey},{lang}'
 }
 
+# Available result modes
+RESULT_MODES = ('objects', 'dicts', 'namedtuples')
+
 
 class Wrapper(object):
     """Interface for the JSON API of the EMT services."""
 
-    def __init__(self, emt_id='', emt_pass=''):
+    def __init__(self, emt_id='', emt_pass='', result_mode='objects',
+                 geo_cache=None):
         """Initialize the interface attributes.
 
         Initialization may also be performed at a later point by manually
@@ -88,7 +93,19 @@ class Wrapper(object):
         Args:
             emt_id (str): ID given by the server upon registration
             emt_pass (str): Token given by the server upon registration
+            result_mode (str): How to return parsed responses. May be:
+                - objects: instances of the types in ``pyemtmad.types``
+                - dicts: response items as returned by the API
+                - namedtuples: immutable rows (see ``types.row_type()``)
+            geo_cache (GeoCache): Optional cache for the endpoints that search
+                around a point (see ``pyemtmad.geocache``).
         """
+        if result_mode not in RESULT_MODES:
+            raise ValueError('Unknown result mode: %s' % result_mode)
+
+        self.result_mode = result_mode
+        self.geo_cache = geo_cache
+
         if emt_id and emt_pass:
             self.initialize(emt_id, emt_pass)
 
@@ -110,6 +127,25 @@ class Wrapper(object):
         self.geo = GeoApi(self)
         self.parking = ParkingApi(self)
 
+    def parse_values(self, item_type, values):
+        """Parse the items of a response according to the result mode.
+
+        Args:
+            item_type (type): Class of the items in ``pyemtmad.types``.
+            values (list[dict]): Response items.
+
+        Returns:
+            List of parsed items.
+        """
+        if self.result_mode == 'dicts':
+            return values
+
+        elif self.result_mode == 'namedtuples':
+            return [emtype.parse_row(item_type, a) for a in values]
+
+        from_json = item_type.from_json
+        return [from_json(a) for a in values]
+
     def request_openbus(self, service, endpoint, **kwargs):
         """Make a request to the given endpoint of the ``openbus`` server.
 
@@ -44,6 +44,10 @@ setup(
             'six >= 1.10.0',
             'requests >= 2.9.1'
             ],
+        extras_require={
+            'arrow': ['pyarrow >= 1.0.0'],
+            'numpy': ['numpy >= 1.10.0']
+            },
 
         keywords='madrid transport travel bus geo open data api'
         )
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Export of the bus network to Parquet."""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+try:
+    import numpy as np
+    import pyarrow.parquet as pq
+    from pyemtmad.export import NetworkExporter
+except ImportError:
+    np = None
+
+ROUTE = [
+    {'line': '27', 'node': '1', 'secDetail': '10', 'distance': '0',
+     'distancePreviousStop': '0', 'name': 'A', 'latitude': '40.41',
+     'longitude': '-3.69'},
+    {'line': '27', 'node': '2', 'secDetail': '10', 'distance': '350',
+     'distancePreviousStop': '350', 'name': 'B', 'latitude': '40.42',
+     'longitude': '-3.69'}
+]
+
+NODES = [
+    {'node': '1', 'name': 'A', 'latitude': '40.41', 'longitude': '-3.69',
+     'lines': ['27/1', ' 5\\/2 ']},
+    {'node': '2', 'name': 'B', 'latitude': '40.42', 'longitude': '-3.69',
+     'lines': None},
+    {'node': '3', 'name': 'C', 'latitude': '40.43', 'longitude': '-3.69',
+     'lines': ['27/2']}
+]
+
+STOPS = [
+    {'stopId': '1', 'name': 'A', 'postalAddress': 'Calle A, 1',
+     'latitude': '40.41', 'longitude': '-3.69'},
+    {'stopId': '2', 'name': 'B', 'postalAddress': 'Calle B, 2',
+     'latitude': '40.42', 'longitude': '-3.69'}
+]
+
+TIMETABLE = [
+    {'date': '19/10/2026', 'line': '27', 'typeDay': 'LA', 'direction': '1',
+     'timeFirst': '19/10/2026 06:00', 'timeEnd': '19/10/2026 23:30'}
+]
+
+
+class FakeWrapper(object):
+    """Wrapper that answers the requests of the exporter with fixed data."""
+
+    def __init__(self, failing=()):
+        self.failing = failing
+
+    def request_openbus(self, service, endpoint, **params):
+        if endpoint in self.failing:
+            return {'resultCode': 1, 'resultDescription': 'ERROR'}
+
+        if endpoint == 'get_stops_line':
+            return {'stop': STOPS}
+
+        values = {
+            'get_list_lines': [{'line': '27'}],
+            'get_route_lines': ROUTE,
+            'get_nodes_lines': NODES,
+            'get_timetable_lines': TIMETABLE
+        }[endpoint]
+
+        return {'resultCode': 0, 'resultValues': values}
+
+
+@unittest.skipIf(np is None, 'NumPy and PyArrow are required for the export')
+class NetworkExporterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, name):
+        path = os.path.join(self.directory, name + '.parquet')
+        return pq.read_table(path).to_pydict()
+
+    def test_export(self):
+        rows = NetworkExporter(FakeWrapper()).export(
+            self.directory, 19, 10, 2026)
+
+        self.assertEqual(rows, {
+            'route_lines': 2, 'nodes_lines': 3, 'stops_line': 4,
+            'timetable_lines': 1})
+
+        route = self.read('route_lines')
+        self.assertEqual(route['node'], [1, 2])
+        self.assertEqual(route['distance_orig'], [0.0, 350.0])
+
+        nodes = self.read('nodes_lines')
+        self.assertEqual(nodes['lines'], [[27, 5], [], [27]])
+        self.assertEqual(nodes['directions'], [[1, 2], [], [2]])
+
+        stops = self.read('stops_line')
+        self.assertEqual(stops['direction'], [1, 1, 2, 2])
+        self.assertEqual(stops['position'], [0, 1, 0, 1])
+        self.assertEqual(stops['address'][0], 'Calle A, 1')
+
+        timetable = self.read('timetable_lines')
+        self.assertEqual(timetable['line'], [27])
+        self.assertEqual(timetable['day_type'], ['Labour'])
+
+    def test_failed_request(self):
+        for endpoint in ('get_route_lines', 'get_nodes_lines',
+                         'get_stops_line', 'get_timetable_lines'):
+            exporter = NetworkExporter(FakeWrapper(failing=(endpoint,)))
+
+            with self.assertRaises(RuntimeError):
+                exporter.export(self.directory, 19, 10, 2026, lines=[27])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Files of the arrival history."""
+
+import io
+import unittest
+
+try:
+    import numpy as np
+    from pyemtmad import history
+except ImportError:
+    np = None
+
+
+ARRIVALS = [
+    {'lineId': '27', 'busId': 5, 'busTimeLeft': 300, 'busDistance': 1200,
+     'latitude': 40.4, 'longitude': -3.7, 'busPositionType': 1},
+    {'lineId': 'N1', 'busId': 8, 'busTimeLeft': 60, 'busDistance': 250,
+     'latitude': 40.41, 'longitude': -3.71, 'busPositionType': 2}
+]
+
+
+@unittest.skipIf(np is None, 'NumPy is required for the arrival history')
+class ArrivalHistoryTest(unittest.TestCase):
+
+    def _saved(self, history):
+        archive = io.BytesIO()
+        history.save(archive)
+        archive.seek(0)
+
+        return archive
+
+    def test_save_and_load(self):
+        saved = history.ArrivalHistory(capacity=10)
+        saved.record(72, ARRIVALS, observed_at=100.0)
+        saved.record(72, ARRIVALS[:1], observed_at=130.0)
+
+        loaded = history.ArrivalHistory.load(self._saved(saved))
+
+        for line_id in (None, '27', 'N1'):
+            np.testing.assert_array_equal(
+                loaded.window(72, line_id), saved.window(72, line_id))
+
+        self.assertEqual(
+            loaded.passages(72, '27')[0].tolist(),
+            saved.passages(72, '27')[0].tolist())
+
+    def test_other_format_version(self):
+        archive = self._saved(history.ArrivalHistory())
+        with np.load(archive) as data:
+            arrays = dict((k, data[k]) for k in data.files)
+
+        for version in (None, history.FORMAT_VERSION + 1):
+            if version is None:
+                arrays.pop('version')
+
+            else:
+                arrays['version'] = np.array([version])
+
+            archive = io.BytesIO()
+            np.savez_compressed(archive, **arrays)
+            archive.seek(0)
+
+            with self.assertRaises(ValueError):
+                history.ArrivalHistory.load(archive)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Journeys of the planner compared with a brute force search."""
+
+import datetime
+import random
+import unittest
+
+from pyemtmad import types as emtype
+
+try:
+    import numpy as np
+    from pyemtmad.graph import TransitGraph
+    from pyemtmad.planner import Planner, Timetable
+except ImportError:
+    np = None
+
+
+def _graph(rng, lines=20, stops=150, stops_per_route=12):
+    """Build a network of random routes over a pool of stops."""
+    values = []
+
+    for line in range(1, lines + 1):
+        route = rng.sample(range(1, stops + 1), stops_per_route)
+
+        for sec_detail, nodes in ((10, route), (20, route[::-1])):
+            for order, node in enumerate(nodes):
+                values.append({
+                    'line': line, 'secDetail': sec_detail,
+                    'orderDetail': order + 1, 'node': node,
+                    'distance': order * 400.0, 'name': 'Stop %d' % node,
+                    'latitude': 40.4 + node * 1e-4, 'longitude': -3.7
+                })
+
+    return TransitGraph.build(
+        [emtype.RouteLinesItem.from_json(v) for v in values])
+
+def _earliest_arrival(timetable, source, target, departure):
+    """Earliest arrival at a stop scanning every connection in order."""
+    graph = timetable.graph
+    connections = []
+
+    for route, times in enumerate(timetable.stop_times):
+        stops = graph.route_stop_indexes(route).tolist()
+
+        for trip, row in enumerate(times.tolist()):
+            for i in range(len(stops) - 1):
+                connections.append((
+                    row[i], row[i + 1], stops[i], stops[i + 1],
+                    (route, trip)))
+
+    connections.sort()
+    best = {source: departure}
+    boarded = set()
+
+    for leaves, arrives, start, end, trip in connections:
+        if leaves < departure:
+            continue
+
+        if trip in boarded or best.get(start, leaves + 1) <= leaves:
+            boarded.add(trip)
+
+            if arrives < best.get(end, arrives + 1):
+                best[end] = arrives
+
+    return best.get(target)
+
+
+@unittest.skipIf(np is None, 'NumPy is required for the journey planner')
+class PlannerTest(unittest.TestCase):
+
+    def test_matches_brute_force(self):
+        rng = random.Random(7)
+        graph = _graph(rng)
+        timetable = Timetable(graph)
+
+        for line in range(1, 21):
+            for direction in ('forward', 'backward'):
+                offset = rng.randint(0, 600)
+                duration = rng.randint(1200, 2400)
+
+                for trip in range(30):
+                    start = 6 * 3600 + offset + trip * 900
+                    timetable.add_trip(
+                        line, direction, start, start + duration)
+
+        planner = Planner(timetable.freeze())
+        stops = graph.stop_ids.tolist()
+
+        for _ in range(100):
+            origin, destination = rng.sample(stops, 2)
+            departure = rng.randint(6 * 3600, 12 * 3600)
+
+            journey = planner.plan(
+                origin, destination, departure, max_transfers=20)
+            expected = _earliest_arrival(
+                timetable, graph.stop_index(origin),
+                graph.stop_index(destination), departure)
+
+            self.assertEqual(
+                None if journey is None else journey.arrival, expected)
+
+            if journey is not None:
+                # Legs are chained in time and space
+                stop, time = origin, departure
+                for leg in journey.legs:
+                    self.assertEqual(leg.from_stop, stop)
+                    self.assertGreaterEqual(leg.departure, time)
+                    stop, time = leg.to_stop, leg.arrival
+
+                self.assertEqual((stop, time), (destination, expected))
+
+    def test_timetable_across_midnight(self):
+        graph = _graph(random.Random(1), lines=1)
+        stops = graph.route_stop_indexes(graph.route_index(1)).tolist()
+        items = [
+            emtype.TimetableLinesItem.from_json({
+                'date': '01/01/2016', 'line': '1', 'timeFirst': first,
+                'timeEnd': end, 'typeDay': 'LA', 'direction': '1'
+            })
+            for first, end in (('23:30:00', '24:20:00'),
+                               ('24:40:00', '25:30:00'))
+        ]
+
+        planner = Planner(Timetable.from_timetable(graph, items))
+        origin = graph.stop_ids[stops[0]]
+        destination = graph.stop_ids[stops[-1]]
+
+        # Last bus of the day and first one after midnight
+        journey = planner.plan(
+            origin, destination, datetime.time(23, 0))
+        self.assertEqual(journey.arrival, 24 * 3600 + 20 * 60)
+
+        journey = planner.plan(
+            origin, destination, datetime.timedelta(hours=24, minutes=10))
+        self.assertEqual(journey.arrival, 25 * 3600 + 30 * 60)
+
+        self.assertIsNone(planner.plan(
+            origin, destination, datetime.timedelta(hours=25)))
+
+    def test_times_across_midnight(self):
+        graph = _graph(random.Random(1), lines=1)
+        item = emtype.TimesLinesItem.from_json({
+            'dateFirst': '01/01/2016', 'dateEnd': '31/12/2016', 'line': '1',
+            'timeFirstA': '01/01/2016 23:00:00',
+            'timeFirstB': '01/01/2016 23:00:00',
+            'timeEndA': '02/01/2016 00:30:00', 'timeEndB': None,
+            'typeId': 'LA'
+        })
+
+        timetable = Timetable.from_times(graph, [item], headway=1800)
+        departures = timetable.stop_times[
+            graph.route_index(1, 'forward')][:, 0].tolist()
+
+        self.assertEqual(departures, [82800, 84600, 86400, 88200])
+        self.assertEqual(
+            len(timetable.stop_times[graph.route_index(1, 'backward')]), 0)
+
+    def test_trip_ending_before_start(self):
+        timetable = Timetable(_graph(random.Random(1), lines=1))
+
+        with self.assertRaises(ValueError):
+            timetable.add_trip(1, 'forward', 3600, 60)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Round trip of the binary serialization of parsed types."""
+
+import json
+import unittest
+import zlib
+
+from pyemtmad import serialize
+from pyemtmad import types as emtype
+
+ROUTE = {
+    'line': '027', 'secDetail': 10, 'orderDetail': 1, 'node': 72,
+    'distance': 350, 'distancePreviousStop': 350, 'name': 'Cibeles',
+    'latitude': 40.419, 'longitude': -3.693
+}
+
+TIMETABLE = {
+    'date': '01\\/01\\/2016', 'line': '27', 'timeFirst': '23:50:00',
+    'timeEnd': '25:10:00', 'typeDay': 'LA', 'direction': '1'
+}
+
+TIMES = {
+    'dateFirst': '01/01/2016', 'dateEnd': '31/12/2016', 'line': '27',
+    'timeFirstA': '01/01/1900 06:00:00', 'timeFirstB': '01/01/1900 06:10:00',
+    'timeEndA': '01/01/1900 25:30:00', 'timeEndB': None, 'typeId': 'LA'
+}
+
+NODE = {
+    'node': 72, 'name': 'Cibeles', 'latitude': 40.419, 'longitude': -3.693,
+    'lines': ['27\\/1', '5\\/2']
+}
+
+DIRECTION = {
+    'startTime': '06:00', 'endTime': '23:30', 'minimumFrequency': '4',
+    'maximumFrequency': '12', 'frequencyDescription': 'x'
+}
+
+LINE = {
+    'lineId': '27', 'label': '27', 'headerA': 'EMBAJADORES',
+    'headerB': 'PLAZA CASTILLA', 'incidents': 'N', 'date': 1451606400123,
+    'dayType': [
+        {'dayTypeId': 'LA', 'direction1': DIRECTION, 'direction2': DIRECTION}
+    ]
+}
+
+ARRIVAL = {
+    'stopId': 72, 'lineId': 'N1', 'isHead': 'False', 'destination': 'X',
+    'busId': 5, 'busTimeLeft': 100, 'busDistance': 10, 'longitude': -3.7,
+    'latitude': 40.4, 'busPositionType': 1
+}
+
+
+def _items():
+    return [
+        emtype.TimetableLinesItem.from_json(TIMETABLE),
+        emtype.RouteLinesItem.from_json(ROUTE),
+        emtype.Line.from_json(LINE),
+        emtype.NodeLinesItem.from_json(NODE),
+        emtype.TimesLinesItem.from_json(TIMES),
+        emtype.Arrival.from_json(ARRIVAL),
+        emtype.RouteLinesItem.from_json(dict(ROUTE, node=73, name='Sol'))
+    ]
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def assert_same(self, items, loaded):
+        self.assertEqual(
+            [type(i) for i in items], [type(i) for i in loaded])
+
+        for item, other in zip(items, loaded):
+            self.assertEqual(item._json, other._json)
+            self.assertEqual(emtype.to_row(item), emtype.to_row(other))
+
+    def test_round_trip(self):
+        items = _items()
+        self.assert_same(items, serialize.loads(serialize.dumps(items)))
+
+    def test_single_item(self):
+        item = emtype.TimetableLinesItem.from_json(TIMETABLE)
+        loaded = serialize.from_bytes(serialize.to_bytes(item))
+
+        self.assertEqual(item.__dict__, loaded.__dict__)
+
+    def test_stored_values_are_used(self):
+        items = [emtype.RouteLinesItem.from_json(ROUTE)]
+        loaded = serialize.loads(serialize.dumps(items))[0]
+
+        # Attributes share the values of the response instead of parsing it
+        self.assertIs(loaded.name, loaded._json['name'])
+
+    def test_changed_parser_parses_again(self):
+        items = _items()
+        data = serialize.dumps(items)
+
+        document = json.loads(zlib.decompress(data[4:]).decode('utf-8'))
+        for block in document['blocks']:
+            block['signature'] = 'changed'
+
+        data = data[:4] + zlib.compress(json.dumps(document).encode('utf-8'))
+        self.assert_same(items, serialize.loads(data))
+
+    def test_equal_values_of_other_types(self):
+        # 1 == 1.0 == True, the parsed line must not take the response type
+        items = [
+            emtype.TimesLinesItem.from_json(dict(TIMES, line=line))
+            for line in (1.0, True, 1)
+        ]
+        loaded = serialize.loads(serialize.dumps(items))
+
+        self.assert_same(items, loaded)
+        self.assertEqual([type(i.line) for i in loaded], [int] * 3)
+        self.assertEqual(
+            [type(i._json['line']) for i in loaded], [float, bool, int])
+
+    def test_invalid_data(self):
+        data = serialize.dumps(_items())
+
+        for length in range(len(data)):
+            self.assertRaises(ValueError, serialize.loads, data[:length])
+
+        self.assertRaises(ValueError, serialize.loads, b'EMT\x09')
+        self.assertRaises(TypeError, serialize.dumps, [ROUTE])
+
+
+if __name__ == '__main__':
+    unittest.main()
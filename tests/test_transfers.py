@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Incremental updates of the walking transfer table."""
+
+import random
+import unittest
+
+try:
+    import numpy as np
+    from pyemtmad.transfers import TransferIndex
+except ImportError:
+    np = None
+
+
+def _stops(rng, count):
+    """Random stops in a small area, some of them without coordinates."""
+    stop_ids = rng.sample(range(1, 10 * count), count)
+    latitude = [40.4 + rng.uniform(0, 0.02) for _ in stop_ids]
+    longitude = [-3.7 + rng.uniform(0, 0.02) for _ in stop_ids]
+
+    for index in rng.sample(range(count), count // 20):
+        latitude[index] = longitude[index] = float('nan')
+
+    return stop_ids, latitude, longitude
+
+
+@unittest.skipIf(np is None, 'NumPy is required for the transfer table')
+class TransferIndexTest(unittest.TestCase):
+
+    def assertSameTable(self, table, expected):
+        np.testing.assert_array_equal(table.stop_ids, expected.stop_ids)
+        np.testing.assert_array_equal(table.offsets, expected.offsets)
+        np.testing.assert_array_equal(table.targets, expected.targets)
+        np.testing.assert_array_equal(table.distances, expected.distances)
+        np.testing.assert_array_equal(table.durations, expected.durations)
+
+    def test_update_matches_rebuild(self):
+        rng = random.Random(3)
+        stop_ids, latitude, longitude = _stops(rng, 300)
+        table = TransferIndex(stop_ids, latitude, longitude)
+
+        for _ in range(5):
+            # Move, remove, add and lose or recover the coordinates of stops
+            for index in rng.sample(range(len(stop_ids)), 10):
+                latitude[index] += rng.uniform(-0.002, 0.002)
+
+            for index in sorted(rng.sample(range(len(stop_ids)), 5),
+                                reverse=True):
+                del stop_ids[index], latitude[index], longitude[index]
+
+            new_ids, new_latitude, new_longitude = _stops(rng, 10)
+            stop_ids += [i + 10000 for i in new_ids]
+            latitude += new_latitude
+            longitude += new_longitude
+
+            for index in rng.sample(range(len(stop_ids)), 5):
+                latitude[index] = longitude[index] = float('nan')
+
+            for index in rng.sample(range(len(stop_ids)), 5):
+                latitude[index] = 40.4 + rng.uniform(0, 0.02)
+                longitude[index] = -3.7 + rng.uniform(0, 0.02)
+
+            table.update(stop_ids, latitude, longitude)
+            self.assertSameTable(
+                table, TransferIndex(stop_ids, latitude, longitude))
+
+    def test_update_without_changes(self):
+        stop_ids, latitude, longitude = _stops(random.Random(5), 300)
+        table = TransferIndex(stop_ids, latitude, longitude)
+
+        self.assertEqual(table.update(stop_ids, latitude, longitude), 0)
+        self.assertSameTable(
+            table, TransferIndex(stop_ids, latitude, longitude))
+
+
+if __name__ == '__main__':
+    unittest.main()
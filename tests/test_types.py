@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+# pyemtmad, EMT API wrapper - https://github.com/rmed/pyemtmad
+# Copyright (C) 2016  Rafael Medina García <rafamedgar@gmail.com>
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+"""Parity of the compiled parsers with the original hand-written ones.
+
+``data/parsed_types.json`` contains a response for every type (and an empty
+one where the original parser accepted it) together with the attributes
+that the hand-written classes obtained from it, as ``repr()`` strings.
+"""
+
+import copy
+import datetime
+import json
+import os
+import unittest
+
+from pyemtmad import types as emtype
+
+CASES = os.path.join(os.path.dirname(__file__), 'data', 'parsed_types.json')
+
+
+def _load_cases():
+    with open(CASES) as f:
+        return json.load(f)
+
+def _attributes(row):
+    """Obtain the ``repr()`` of the values of a row, by attribute."""
+    return dict((k, repr(v)) for k, v in row._asdict().items())
+
+
+class ParserParityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cases = _load_cases()
+
+    def test_cases_cover_every_type(self):
+        self.assertEqual(
+            set(c['type'] for c in self.cases),
+            set(t.__name__ for t in emtype._ParsedType.__subclasses__()))
+
+    def test_from_json(self):
+        for case in self.cases:
+            item_type = getattr(emtype, case['type'])
+            row = emtype.to_row(
+                item_type.from_json(copy.deepcopy(case['response'])))
+
+            self.assert_attributes(case, _attributes(row))
+
+    def test_init(self):
+        for case in self.cases:
+            item_type = getattr(emtype, case['type'])
+            item = item_type(**copy.deepcopy(case['response']))
+
+            self.assert_attributes(case, _attributes(emtype.to_row(item)))
+            self.assertEqual(item._json, case['response'])
+
+    def test_parse_row(self):
+        for case in self.cases:
+            item_type = getattr(emtype, case['type'])
+            row = emtype.parse_row(item_type, copy.deepcopy(case['response']))
+
+            self.assert_attributes(case, _attributes(row))
+
+    def test_times_past_midnight(self):
+        item = emtype.TimetableLinesItem.from_json({
+            'date': '01/02/2016', 'line': '27', 'timeFirst': '23:50:00',
+            'timeEnd': '25:10:00', 'typeDay': 'LA', 'direction': '1'
+        })
+
+        self.assertEqual(
+            item.end_time - item.start_time, datetime.timedelta(minutes=80))
+
+    def assert_attributes(self, case, attributes):
+        # Attributes added after the original parsers are not compared
+        for name, value in case['attributes'].items():
+            self.assertEqual(
+                attributes[name], value, '%s.%s' % (case['type'], name))
+
+
+if __name__ == '__main__':
+    unittest.main()